@@ -1,19 +1,32 @@
 import streamlit as st
-import json
+import streamlit.components.v1 as components
+import os
 import re
 import time
 import random
-from datetime import datetime, timedelta
-from openai import OpenAI
-
-# ============== API CLIENT SETUP ==============
-@st.cache_resource
-def get_openai_client():
-    """Initialize OpenAI client for Pollinations API"""
-    return OpenAI(
-        api_key="pollinations",
-        base_url="https://text.pollinations.ai/openai",
-    )
+import uuid
+import functools
+from collections import namedtuple
+from concurrent.futures import wait
+from datetime import datetime
+from progress_store import ADDITIVE_FIELDS, LATEST_FIELDS, ProgressStore
+from near_dup import NearDuplicateIndex
+from question_bank import item_text
+from quiz_stats import StudyStats
+from render_stats import RenderStats
+from spaced_repetition import GRADES, ReviewDeck
+from study_items import AnswerSheet, normalize_items
+from progression import ACHIEVEMENTS, level_for, milestone_achievements, next_streak
+from theme_assets import ThemeAssets
+from study_ai import (
+    FLASHCARD_BATCH_SIZE, GENERATION_SHARING, MAX_FLASHCARDS,
+    StreamInterrupted, call_ai_text, stream_ai_text, stream_study_guide,
+    generate_multiple_choice_quiz, generate_true_false_quiz, generate_fill_blank_quiz,
+    generate_flashcards, generate_hints, generate_explanations, subject_context_for,
+    get_ai_call_stats, get_circuit_breaker, get_generation_cache, get_generation_executor, get_item_stats,
+    get_parse_stats, get_question_bank, get_single_flight, get_subrequest_executor, get_transport_stats,
+    start_prewarm,
+)
 
 # ============== SESSION STATE INITIALIZATION ==============
 def init_session_state():
@@ -22,32 +35,42 @@ def init_session_state():
         'study_mode': None,
         'quiz_type': 'multiple_choice',
         'current_topic': None,
-        # Quiz states
+        # Quiz states: generated items as study_items records, and the AnswerSheet for the current quiz
         'quiz_data': None,
-        'user_answers': {},
         'quiz_submitted': False,
         'tf_data': None,
         'fib_data': None,
-        'fib_answers': {},
+        'answers': None,
+        # Grading: id of the current submission and the results graded so far
+        'submission_id': None,
+        'grade_ledger': {},
+        # Every question/card this student has been served, to avoid serving rewordings of them
+        'seen_items': NearDuplicateIndex(),
         # Flashcard states
         'flashcards_data': None,
-        'flipped_cards': set(),
+        # One flag per card, and the review caption of each card (by index) rated while flipped
+        'flipped_cards': bytearray(),
+        'reviewed_cards': {},
         'matching_pairs': None,
         'matched_pairs': set(),
         'matching_selected': None,
+        # Spaced repetition: every card the student is learning, and whether the review card shows its answer
+        'review_deck': None,
+        'review_flipped': False,
         # Study guide
         'study_guide_data': None,
         # Timer
         'timed_mode': False,
         'timer_duration': 60,
-        'timer_start': None,
+        # Epoch seconds after which answers no longer count, fixed when the quiz is generated
+        'quiz_deadline': None,
         'timer_expired': False,
         # Progress & Gamification
         'xp': 0,
         'total_quizzes': 0,
         'total_correct': 0,
         'total_questions': 0,
-        'quiz_history': [],
+        'study_stats': None,
         'achievements': set(),
         'study_streak': 0,
         'last_study_date': None,
@@ -59,6 +82,9 @@ def init_session_state():
         'chat_messages': [],
         'show_hints': {},
         'explanations': {},
+        # Background batched hint/explanation requests
+        'hints_future': None,
+        'explanations_future': None,
     }
     for key, value in defaults.items():
         if key not in st.session_state:
@@ -72,616 +98,439 @@ st.set_page_config(
     page_icon="📚",
     layout="wide"
 )
+run_started = time.perf_counter()
 
-# ============== THEME CSS ==============
-def get_theme_css():
-    if st.session_state.theme == 'dark':
-        return """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@400;500;600;700&family=JetBrains+Mono:wght@400;500&display=swap');
-        
-        .stApp { 
-            background: linear-gradient(135deg, #0a0a0f 0%, #1a1a2e 50%, #0f0f1a 100%);
-            font-family: 'Space Grotesk', sans-serif;
-        }
-        .main-header { 
-            text-align: center; 
-            color: #ffffff !important; 
-            padding: 20px;
-            font-size: 3rem;
-            font-weight: 700;
-            background: linear-gradient(135deg, #6366f1, #a855f7, #ec4899);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-        }
-        .subtitle { 
-            text-align: center; 
-            color: #94a3b8 !important; 
-            font-size: 1.1rem; 
-            margin-bottom: 2rem;
-            letter-spacing: 0.5px;
-        }
-        .stMarkdown, .stMarkdown p, .stMarkdown div, .stMarkdown span,
-        .stMarkdown h1, .stMarkdown h2, .stMarkdown h3, .stMarkdown h4, .stMarkdown h5, .stMarkdown h6,
-        p, span, div, label { color: #e2e8f0 !important; }
-        
-        [data-testid="stSidebar"] { 
-            background: linear-gradient(180deg, #1e1e2e 0%, #2d2d44 100%);
-            border-right: 1px solid rgba(99, 102, 241, 0.2);
-        }
-        [data-testid="stSidebar"] * { color: #e2e8f0 !important; }
-        
-        .mode-card {
-            background: linear-gradient(135deg, rgba(30, 30, 46, 0.8) 0%, rgba(45, 45, 68, 0.8) 100%);
-            backdrop-filter: blur(10px);
-            border-radius: 20px; 
-            padding: 30px; 
-            text-align: center;
-            border: 1px solid rgba(99, 102, 241, 0.3);
-            min-height: 200px;
-            display: flex; 
-            flex-direction: column; 
-            justify-content: center; 
-            align-items: center;
-            margin-bottom: 10px; 
-            transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-            position: relative;
-            overflow: hidden;
-        }
-        .mode-card::before {
-            content: '';
-            position: absolute;
-            top: 0;
-            left: 0;
-            right: 0;
-            bottom: 0;
-            background: linear-gradient(135deg, rgba(99, 102, 241, 0.1) 0%, rgba(168, 85, 247, 0.1) 100%);
-            opacity: 0;
-            transition: opacity 0.4s ease;
-        }
-        .mode-card:hover {
-            border-color: #6366f1;
-            transform: translateY(-5px);
-            box-shadow: 0 20px 40px rgba(99, 102, 241, 0.3);
-        }
-        .mode-card:hover::before { opacity: 1; }
-        .mode-icon { font-size: 48px; margin-bottom: 15px; filter: drop-shadow(0 4px 8px rgba(0,0,0,0.3)); }
-        .mode-title { font-size: 1.3rem; font-weight: 600; color: #ffffff !important; margin-bottom: 10px; }
-        .mode-description { font-size: 0.9rem; color: #94a3b8 !important; line-height: 1.5; }
-        
-        .flashcard {
-            background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%);
-            border-radius: 16px; 
-            padding: 30px; 
-            min-height: 180px;
-            display: flex; 
-            flex-direction: column; 
-            justify-content: center; 
-            align-items: center;
-            text-align: center; 
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);
-            border: 1px solid rgba(61, 122, 181, 0.5);
-            margin-bottom: 15px;
-            transition: all 0.3s ease;
-        }
-        .flashcard:hover { transform: scale(1.02); }
-        .flashcard-back {
-            background: linear-gradient(135deg, #1a4731 0%, #2d7a4f 100%);
-            border-color: rgba(61, 181, 106, 0.5);
-        }
-        .flashcard-label { 
-            font-size: 0.7rem; 
-            text-transform: uppercase; 
-            letter-spacing: 3px; 
-            margin-bottom: 15px; 
-            opacity: 0.7;
-            color: #a0c4e8 !important;
-            font-weight: 500;
-        }
-        .flashcard-content { 
-            font-size: 1.2rem; 
-            font-weight: 500; 
-            color: #ffffff !important; 
-            line-height: 1.6;
-        }
-        
-        .quiz-question {
-            background: linear-gradient(135deg, rgba(45, 45, 68, 0.9) 0%, rgba(61, 61, 92, 0.9) 100%);
-            border-radius: 16px; 
-            padding: 25px; 
-            margin: 20px 0;
-            border-left: 4px solid #6366f1;
-            box-shadow: 0 4px 20px rgba(0, 0, 0, 0.2);
-        }
-        .quiz-question h4 { color: #ffffff !important; margin-bottom: 15px; font-weight: 600; }
-        .correct-answer { 
-            background: linear-gradient(135deg, rgba(26, 71, 49, 0.9) 0%, rgba(45, 122, 79, 0.9) 100%) !important;
-            border-left-color: #22c55e !important;
-        }
-        .incorrect-answer { 
-            background: linear-gradient(135deg, rgba(74, 26, 26, 0.9) 0%, rgba(122, 45, 45, 0.9) 100%) !important;
-            border-left-color: #ef4444 !important;
-        }
-        
-        .results-box {
-            background: linear-gradient(135deg, rgba(30, 30, 46, 0.95) 0%, rgba(45, 45, 68, 0.95) 100%);
-            border-radius: 20px; 
-            padding: 40px; 
-            text-align: center; 
-            margin: 30px 0;
-            border: 2px solid #6366f1;
-            box-shadow: 0 10px 40px rgba(99, 102, 241, 0.3);
-        }
-        .score-display { 
-            font-size: 4rem; 
-            font-weight: 700;
-            background: linear-gradient(135deg, #6366f1, #a855f7);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-            margin: 15px 0;
-        }
-        
-        .stat-card { 
-            background: linear-gradient(135deg, rgba(30, 30, 46, 0.8) 0%, rgba(45, 45, 68, 0.8) 100%);
-            border-radius: 16px; 
-            padding: 25px; 
-            text-align: center;
-            border: 1px solid rgba(99, 102, 241, 0.2);
-            transition: all 0.3s ease;
-        }
-        .stat-card:hover { border-color: rgba(99, 102, 241, 0.5); }
-        .stat-card h3 { color: #ffffff !important; font-size: 1.1rem; margin-bottom: 5px; }
-        .stat-card p { color: #94a3b8 !important; font-size: 0.9rem; }
-        
-        .timer-display { 
-            font-size: 2.5rem; 
-            font-weight: 700;
-            font-family: 'JetBrains Mono', monospace;
-            color: #ef4444 !important; 
-            text-align: center; 
-            padding: 15px;
-            background: rgba(239, 68, 68, 0.1);
-            border-radius: 12px;
-            margin: 15px 0;
-            border: 1px solid rgba(239, 68, 68, 0.3);
-        }
-        
-        .hint-box { 
-            background: linear-gradient(135deg, rgba(61, 61, 0, 0.8) 0%, rgba(90, 90, 0, 0.8) 100%);
-            border-radius: 12px; 
-            padding: 20px; 
-            margin: 15px 0;
-            border-left: 4px solid #fbbf24;
-        }
-        .explanation-box { 
-            background: linear-gradient(135deg, rgba(26, 58, 74, 0.8) 0%, rgba(45, 90, 106, 0.8) 100%);
-            border-radius: 12px; 
-            padding: 20px; 
-            margin: 15px 0;
-            border-left: 4px solid #38bdf8;
-        }
-        
-        .achievement { 
-            background: linear-gradient(135deg, rgba(74, 63, 0, 0.9) 0%, rgba(107, 90, 0, 0.9) 100%);
-            border-radius: 12px; 
-            padding: 15px 20px; 
-            margin: 8px;
-            display: inline-block;
-            border: 1px solid #fbbf24;
-            transition: all 0.3s ease;
-        }
-        .achievement:hover { transform: scale(1.05); }
-        
-        .footer { text-align: center; color: #64748b !important; padding: 30px; }
-        .footer p { color: #64748b !important; }
-        
-        .stButton > button { 
-            background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-            color: white !important;
-            border: none;
-            border-radius: 10px;
-            padding: 12px 24px;
-            font-weight: 600;
-            font-family: 'Space Grotesk', sans-serif;
-            transition: all 0.3s ease;
-        }
-        .stButton > button:hover { 
-            transform: translateY(-2px);
-            box-shadow: 0 8px 25px rgba(99, 102, 241, 0.4);
-        }
-        
-        .chat-message { 
-            padding: 18px; 
-            border-radius: 12px; 
-            margin: 12px 0;
-            line-height: 1.6;
-        }
-        .chat-user { 
-            background: linear-gradient(135deg, #1e3a5f 0%, #2d5a87 100%);
-            margin-left: 15%;
-        }
-        .chat-ai { 
-            background: linear-gradient(135deg, #2d2d44 0%, #3d3d5c 100%);
-            margin-right: 15%;
-        }
-        </style>
-        """
-    else:
-        return """
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Space+Grotesk:wght@400;500;600;700&family=JetBrains+Mono:wght@400;500&display=swap');
-        
-        .stApp { 
-            background: linear-gradient(135deg, #f8fafc 0%, #e2e8f0 100%);
-            font-family: 'Space Grotesk', sans-serif;
-        }
-        .main-header { 
-            text-align: center; 
-            padding: 20px;
-            font-size: 3rem;
-            font-weight: 700;
-            background: linear-gradient(135deg, #4f46e5, #7c3aed, #db2777);
-            -webkit-background-clip: text;
-            -webkit-text-fill-color: transparent;
-            background-clip: text;
-        }
-        .subtitle { text-align: center; color: #64748b !important; font-size: 1.1rem; margin-bottom: 2rem; }
-        .stMarkdown, .stMarkdown p, .stMarkdown div, .stMarkdown span, p, span, div, label { color: #1e293b !important; }
-        [data-testid="stSidebar"] { background: linear-gradient(180deg, #f1f5f9 0%, #e2e8f0 100%); }
-        [data-testid="stSidebar"] * { color: #1e293b !important; }
-        .mode-card { 
-            background: linear-gradient(135deg, #ffffff 0%, #f8fafc 100%);
-            border-radius: 20px; 
-            padding: 30px; 
-            text-align: center;
-            border: 1px solid #e2e8f0;
-            min-height: 200px; 
-            margin-bottom: 10px;
-            transition: all 0.3s ease;
-        }
-        .mode-card:hover { border-color: #6366f1; box-shadow: 0 10px 30px rgba(99, 102, 241, 0.15); }
-        .mode-title { color: #1e293b !important; }
-        .mode-description { color: #64748b !important; }
-        .flashcard { background: linear-gradient(135deg, #dbeafe 0%, #bfdbfe 100%); border-color: #3b82f6; }
-        .flashcard-back { background: linear-gradient(135deg, #dcfce7 0%, #bbf7d0 100%); border-color: #22c55e; }
-        .flashcard-label { color: #1d4ed8 !important; }
-        .flashcard-content { color: #1e293b !important; }
-        .quiz-question { background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%); }
-        .quiz-question h4 { color: #1e293b !important; }
-        .results-box { background: linear-gradient(135deg, #ffffff 0%, #f8fafc 100%); border-color: #6366f1; }
-        .stat-card { background: linear-gradient(135deg, #ffffff 0%, #f8fafc 100%); border-color: #e2e8f0; }
-        .stat-card h3 { color: #1e293b !important; }
-        .footer p { color: #64748b !important; }
-        </style>
-        """
-
-st.markdown(get_theme_css(), unsafe_allow_html=True)
-
-# ============== AI API FUNCTIONS ==============
-def repair_truncated_json(content, expected_key="flashcards"):
-    """Attempt to repair truncated JSON by closing open structures"""
-    try:
-        # First try parsing as-is
-        return json.loads(content)
-    except json.JSONDecodeError:
-        pass
-    
-    # Try to repair common truncation issues
-    repaired = content.strip()
-    
-    # Remove trailing incomplete strings (ending mid-quote)
-    if repaired.count('"') % 2 == 1:
-        # Odd number of quotes - find last complete entry
-        last_complete = repaired.rfind('"},')
-        if last_complete > 0:
-            repaired = repaired[:last_complete + 2]
-        else:
-            last_complete = repaired.rfind('"}')
-            if last_complete > 0:
-                repaired = repaired[:last_complete + 2]
-    
-    # Close open structures
-    open_braces = repaired.count('{') - repaired.count('}')
-    open_brackets = repaired.count('[') - repaired.count(']')
-    
-    # Remove any trailing comma
-    repaired = repaired.rstrip().rstrip(',')
-    
-    # Add closing brackets and braces
-    repaired += ']' * open_brackets
-    repaired += '}' * open_braces
-    
-    try:
-        return json.loads(repaired)
-    except json.JSONDecodeError:
-        return None
-
-def call_ai_json(prompt, system_msg, max_retries=3, max_tokens=2000):
-    """Call AI API and expect JSON response"""
-    client = get_openai_client()
-    
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="openai",
-                messages=[
-                    {"role": "system", "content": system_msg},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7,
-                max_tokens=max_tokens,
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Clean up common JSON formatting issues
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.startswith("```"):
-                content = content[3:]
-            if content.endswith("```"):
-                content = content[:-3]
-            content = content.strip()
-            
-            # Try to parse JSON
-            try:
-                data = json.loads(content)
-                return data
-            except json.JSONDecodeError:
-                # Try to repair truncated JSON
-                data = repair_truncated_json(content)
-                if data:
-                    return data
-                raise json.JSONDecodeError("Could not repair JSON", content, 0)
-            
-        except json.JSONDecodeError:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            return None
-            
-        except Exception:
-            if attempt < max_retries - 1:
-                time.sleep(1)
-                continue
-            return None
-    
-    return None
+# ============== PROGRESS PERSISTENCE ==============
+PROGRESS_PATH = os.environ.get("STUDYBUZZ_PROGRESS_PATH", os.path.join(".studybuzz", "progress.sqlite3"))
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get("STUDYBUZZ_PROGRESS_FLUSH_INTERVAL", 5))
+# Quiz results kept in each session's history; rollups cover everything ever taken
+HISTORY_CAPACITY = int(os.environ.get("STUDYBUZZ_HISTORY_CAPACITY", 500))
 
-def call_ai_text(prompt, system_msg="You are a helpful educational assistant."):
-    """Call AI API and expect text response"""
-    client = get_openai_client()
-    
-    try:
-        response = client.chat.completions.create(
-            model="openai",
-            messages=[
-                {"role": "system", "content": system_msg},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-        )
-        
-        content = response.choices[0].message.content.strip()
-        return content
-        
-    except Exception:
-        return None
-
-# ============== QUIZ GENERATION FUNCTIONS ==============
-def generate_multiple_choice_quiz(topic, num_questions, difficulty, subject_context):
-    """Generate multiple choice quiz with structured JSON"""
-    system_msg = """You are a quiz generator. Output ONLY a valid JSON object with no additional text.
-Format:
-{
-    "questions": [
-        {
-            "question": "Question text here",
-            "options": {
-                "A": "First option",
-                "B": "Second option", 
-                "C": "Third option",
-                "D": "Fourth option"
-            },
-            "correct": "A"
-        }
-    ]
-}
-Ensure all questions are educational and appropriate. The "correct" field must be A, B, C, or D."""
+@st.cache_resource(show_spinner=False)
+def get_progress_store():
+    """Process-wide write-behind progress store shared by every session"""
+    return ProgressStore(PROGRESS_PATH, flush_interval=PROGRESS_FLUSH_INTERVAL)
 
-    prompt = f"""Create a {difficulty} difficulty quiz about "{topic}" {subject_context} with exactly {num_questions} multiple choice questions.
-Each question should have 4 options (A, B, C, D) with one correct answer.
-Make questions educational and engaging."""
+def get_user_id():
+    """Stable per-device id, kept in the URL so a reload or bookmark finds the same progress"""
+    user_id = st.query_params.get("uid", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", user_id):
+        user_id = uuid.uuid4().hex
+        st.query_params["uid"] = user_id
+    return user_id
 
-    data = call_ai_json(prompt, system_msg)
-    
-    if data and "questions" in data:
-        return data["questions"]
-    return None
-
-def generate_true_false_quiz(topic, num_questions, difficulty, subject_context):
-    """Generate true/false quiz with structured JSON"""
-    system_msg = """You are a quiz generator. Output ONLY a valid JSON object with no additional text.
-Format:
-{
-    "questions": [
-        {
-            "statement": "A statement that is either true or false",
-            "answer": true
-        }
-    ]
-}
-The "answer" field must be a boolean (true or false, not strings)."""
-
-    prompt = f"""Create a {difficulty} difficulty true/false quiz about "{topic}" {subject_context} with exactly {num_questions} statements.
-Mix true and false statements roughly equally.
-Make statements clear and educational."""
-
-    data = call_ai_json(prompt, system_msg)
-    
-    if data and "questions" in data:
-        return data["questions"]
-    return None
+def progress_snapshot():
+    return {
+        **{field: st.session_state[field] for field in ADDITIVE_FIELDS + LATEST_FIELDS},
+        'achievements': set(st.session_state.achievements),
+        'history_length': st.session_state.study_stats.history.appended,
+    }
 
-def generate_fill_blank_quiz(topic, num_questions, difficulty, subject_context):
-    """Generate fill-in-the-blank quiz with structured JSON"""
-    system_msg = """You are a quiz generator. Output ONLY a valid JSON object with no additional text.
-Format:
-{
-    "questions": [
-        {
-            "sentence": "The process of _____ converts sunlight into energy.",
-            "answer": "photosynthesis"
-        }
-    ]
-}
-Use _____ (5 underscores) to mark the blank. Keep answers to 1-3 words."""
+def load_progress():
+    """Load saved progress into the session once; later reruns never read the disk"""
+    if 'user_id' in st.session_state:
+        return
+    user_id = get_user_id()
+    progress = get_progress_store().load(user_id, history_limit=HISTORY_CAPACITY)
+    for key in ADDITIVE_FIELDS + LATEST_FIELDS + ('achievements',):
+        st.session_state[key] = progress[key]
+    stats = StudyStats(HISTORY_CAPACITY)
+    stats.load(progress['quiz_history'], progress['rollups'])
+    st.session_state.study_stats = stats
+    deck = ReviewDeck()
+    for card in progress['cards']:
+        deck.add(**card, dirty=False)
+    st.session_state.review_deck = deck
+    st.session_state.user_id = user_id
+    st.session_state.progress_baseline = progress_snapshot()
 
-    prompt = f"""Create a {difficulty} difficulty fill-in-the-blank quiz about "{topic}" {subject_context} with exactly {num_questions} sentences.
-Each sentence should have exactly one blank marked with _____.
-Keep answers concise (1-3 words)."""
+def sync_progress():
+    """Buffer whatever changed since the last sync in the progress store (no disk I/O)"""
+    baseline = st.session_state.progress_baseline
+    current = progress_snapshot()
+    deltas = {field: current[field] - baseline[field] for field in ADDITIVE_FIELDS
+              if current[field] != baseline[field]}
+    fields = {field: current[field] for field in LATEST_FIELDS if current[field] != baseline[field]}
+    achievements = current['achievements'] - baseline['achievements']
+    history = st.session_state.study_stats.history.since(baseline['history_length'])
+    # Card reviews since the last sync go out as one batch, however many cards were graded
+    cards = st.session_state.review_deck.take_dirty()
+    if deltas or fields or achievements or history or cards:
+        get_progress_store().record(st.session_state.user_id, deltas=deltas, fields=fields,
+                                    achievements=achievements, history=history, cards=cards)
+    st.session_state.progress_baseline = current
 
-    data = call_ai_json(prompt, system_msg)
-    
-    if data and "questions" in data:
-        return data["questions"]
-    return None
+def save_progress_now():
+    """Sync progress and ask the background writer to flush it right away"""
+    sync_progress()
+    get_progress_store().request_flush()
 
-def generate_flashcards(topic, num_cards, subject_context):
-    """Generate flashcards with structured JSON"""
-    # Limit to 8 cards max to prevent truncation
-    actual_num = min(num_cards, 8)
-    
-    system_msg = """You are a flashcard generator. Output ONLY valid JSON, no other text.
-CRITICAL: Keep responses SHORT to avoid truncation.
-- Front: Maximum 8 words
-- Back: Maximum 15 words
+load_progress()
+# Pick up changes from a previous run that ended early in st.rerun()
+sync_progress()
 
-Format:
-{"flashcards":[{"front":"Term","back":"Short definition"}]}"""
+# ============== THEME CSS ==============
+@st.cache_resource(show_spinner=False)
+def get_theme_assets():
+    """Theme stylesheets, minified and published as static files once per process"""
+    return ThemeAssets(static_serving=st.get_option("server.enableStaticServing"))
 
-    prompt = f"""Create exactly {actual_num} flashcards about "{topic}" {subject_context}.
-IMPORTANT: Keep each card very brief!
-- Front: 1-8 words only
-- Back: 1-15 words only
-Output valid JSON only."""
+st.markdown(get_theme_assets().tag(st.session_state.theme), unsafe_allow_html=True)
 
-    data = call_ai_json(prompt, system_msg)
+def render_stream(placeholder, chunks, html_template=None, on_chunk=None):
+    """Render streamed text into a placeholder as it arrives and return the full text ("" if it failed)"""
+    text = ""
+    try:
+        for chunk in chunks:
+            text += chunk
+            if html_template:
+                placeholder.markdown(html_template.format(text=text + " ▌"), unsafe_allow_html=True)
+            else:
+                placeholder.markdown(text + " ▌")
+            if on_chunk:
+                on_chunk()
+    except StreamInterrupted:
+        # A cut-off answer is not shown or kept as if it were complete
+        placeholder.empty()
+        return ""
     
-    if data and "flashcards" in data:
-        return data["flashcards"]
-    return None
-
-def generate_study_guide(topic, subject_context):
-    """Generate comprehensive study guide as text"""
-    system_msg = """You are an educational content creator. Create comprehensive, well-organized study guides.
-Use clear headings, bullet points, and organized sections.
-Make content engaging and easy to understand."""
-
-    prompt = f"""Create a comprehensive study guide about "{topic}" {subject_context}.
-
-Include these sections:
-1. **Overview** - A brief 2-3 sentence introduction
-2. **Key Concepts** - 5 main ideas with clear explanations
-3. **Important Terms** - Definitions of key vocabulary
-4. **Common Misconceptions** - What people often get wrong
-5. **Study Tips** - How to effectively learn this material
-6. **Related Topics** - What to explore next
-
-Make it engaging and suitable for students."""
+    if html_template:
+        placeholder.markdown(html_template.format(text=text), unsafe_allow_html=True)
+    else:
+        placeholder.markdown(text)
+    return text.strip()
 
-    return call_ai_text(prompt, system_msg)
+def prefetched(future_key, index, timeout=20):
+    """Look up a background-batched result (hint or explanation), waiting briefly if still in flight"""
+    future = st.session_state.get(future_key)
+    if future is None:
+        return None
+    try:
+        return future.result(timeout=timeout).get(index)
+    except Exception:
+        return None
 
 # ============== HELPER FUNCTIONS ==============
-ACHIEVEMENTS = {
-    'first_quiz': {'name': '🎯 First Quiz', 'desc': 'Complete your first quiz', 'xp': 50},
-    'perfect_score': {'name': '⭐ Perfect Score', 'desc': 'Get 100% on a quiz', 'xp': 100},
-    'quiz_master': {'name': '🏆 Quiz Master', 'desc': 'Complete 10 quizzes', 'xp': 200},
-    'streak_3': {'name': '🔥 On Fire', 'desc': '3 day study streak', 'xp': 150},
-    'streak_7': {'name': '💪 Dedicated', 'desc': '7 day study streak', 'xp': 300},
-    'flash_50': {'name': '🎴 Card Shark', 'desc': 'Flip 50 flashcards', 'xp': 100},
-    'speed_demon': {'name': '⚡ Speed Demon', 'desc': 'Complete timed quiz with 80%+', 'xp': 150},
-    'explorer': {'name': '🧭 Explorer', 'desc': 'Try all study modes', 'xp': 100},
-}
+def item_preview_text(item):
+    """One-line preview of a generated question or flashcard"""
+    if isinstance(item, dict):
+        for field in ('question', 'statement', 'sentence', 'front'):
+            if item.get(field):
+                return str(item[field])
+    return "..."
 
 def add_xp(amount):
     st.session_state.xp += amount
 
 def check_achievements():
-    new_achievements = []
-    
-    if st.session_state.total_quizzes >= 1 and 'first_quiz' not in st.session_state.achievements:
-        st.session_state.achievements.add('first_quiz')
-        new_achievements.append('first_quiz')
-        add_xp(ACHIEVEMENTS['first_quiz']['xp'])
-    
-    if st.session_state.total_quizzes >= 10 and 'quiz_master' not in st.session_state.achievements:
-        st.session_state.achievements.add('quiz_master')
-        new_achievements.append('quiz_master')
-        add_xp(ACHIEVEMENTS['quiz_master']['xp'])
-    
-    if st.session_state.study_streak >= 3 and 'streak_3' not in st.session_state.achievements:
-        st.session_state.achievements.add('streak_3')
-        new_achievements.append('streak_3')
-        add_xp(ACHIEVEMENTS['streak_3']['xp'])
-    
-    if st.session_state.study_streak >= 7 and 'streak_7' not in st.session_state.achievements:
-        st.session_state.achievements.add('streak_7')
-        new_achievements.append('streak_7')
-        add_xp(ACHIEVEMENTS['streak_7']['xp'])
-    
+    new_achievements = milestone_achievements(st.session_state, st.session_state.achievements)
+    for achievement in new_achievements:
+        st.session_state.achievements.add(achievement)
+        add_xp(ACHIEVEMENTS[achievement]['xp'])
     return new_achievements
 
 def update_streak():
     today = datetime.now().date()
-    if st.session_state.last_study_date:
-        last_date = st.session_state.last_study_date
-        if isinstance(last_date, str):
-            last_date = datetime.fromisoformat(last_date).date()
-        
-        if today == last_date:
-            return
-        elif today - last_date == timedelta(days=1):
-            st.session_state.study_streak += 1
-        else:
-            st.session_state.study_streak = 1
-    else:
-        st.session_state.study_streak = 1
-    
+    st.session_state.study_streak = next_streak(st.session_state.study_streak,
+                                                st.session_state.last_study_date, today)
     st.session_state.last_study_date = today.isoformat()
 
 def get_level():
-    xp = st.session_state.xp
-    level = 1
-    xp_needed = 100
-    while xp >= xp_needed:
-        xp -= xp_needed
-        level += 1
-        xp_needed = int(xp_needed * 1.5)
-    return level, xp, xp_needed
+    return level_for(st.session_state.xp)
 
 def reset_study_data():
-    keys_to_reset = ['quiz_data', 'user_answers', 'quiz_submitted', 'tf_data', 
-                     'fib_data', 'fib_answers', 'flashcards_data', 'flipped_cards', 
+    keys_to_reset = ['quiz_data', 'answers', 'quiz_submitted', 'tf_data', 
+                     'fib_data', 'flashcards_data', 'flipped_cards', 'reviewed_cards',
                      'matching_pairs', 'matched_pairs', 'matching_selected', 'study_guide_data',
-                     'timer_start', 'timer_expired', 'chat_messages', 'show_hints', 'explanations']
+                     'quiz_deadline', 'timer_expired', 'chat_messages', 'show_hints', 'explanations',
+                     'hints_future', 'explanations_future', 'submission_id']
     for key in keys_to_reset:
-        if key in ['flipped_cards', 'matched_pairs', 'achievements']:
+        if key in ['matched_pairs', 'achievements']:
             st.session_state[key] = set()
-        elif key in ['user_answers', 'fib_answers', 'show_hints', 'explanations']:
+        elif key == 'flipped_cards':
+            st.session_state[key] = bytearray()
+        elif key in ['show_hints', 'explanations', 'reviewed_cards']:
             st.session_state[key] = {}
         elif key == 'chat_messages':
             st.session_state[key] = []
         else:
             st.session_state[key] = None
 
+# Session keys holding generated items, and the study_items kind each is stored as
+ITEM_KINDS = {
+    'quiz_data': 'multiple_choice',
+    'tf_data': 'true_false',
+    'fib_data': 'fill_blank',
+    'flashcards_data': 'flashcards',
+}
+
+def add_to_review_deck(cards):
+    """Schedule generated flashcards for spaced review (cards already in the deck keep their schedule)"""
+    deck = st.session_state.review_deck
+    for card in cards:
+        deck.add(card.key, st.session_state.current_topic, card.front, card.back)
+
+def due_label(due):
+    """Human-friendly time until a card is due again"""
+    seconds = due - time.time()
+    if seconds < 3600:
+        return f"in {max(1, round(seconds / 60))} min"
+    if round(seconds / 3600) < 24:
+        return f"in {round(seconds / 3600)} h"
+    days = round(seconds / 86400)
+    return f"in {days} day{'s' if days != 1 else ''}"
+
+REVIEW_BUTTONS = {'again': "🔁 Again", 'hard': "😓 Hard", 'good': "🙂 Good", 'easy': "😎 Easy"}
+
+def rate_card(card_key, grade, card_index=None):
+    """Reschedule a card; ``card_index`` is the flip card it was rated on, None on the review page"""
+    due = st.session_state.review_deck.review(card_key, grade)
+    if card_index is None:
+        st.session_state.review_flipped = False
+        add_xp(2)
+    else:
+        st.session_state.reviewed_cards[card_index] = f"{REVIEW_BUTTONS[grade]} · next review {due_label(due)}"
+    sync_progress()
+
+def review_buttons(card_key, key_prefix, card_index=None):
+    """Again/Hard/Good/Easy buttons for a card"""
+    cols = st.columns(len(GRADES))
+    for col, grade in zip(cols, GRADES):
+        with col:
+            st.button(REVIEW_BUTTONS[grade], key=f"{key_prefix}_{grade}", use_container_width=True,
+                      on_click=rate_card, args=(card_key, grade, card_index))
+
 def go_home():
     st.session_state.page = "home"
     st.session_state.study_mode = None
     reset_study_data()
 
+# ============== GRADING ==============
+# Immutable result of grading one submission; `marks` holds one bool per question
+# and `late` counts answers rejected because they were given after the timed-mode deadline
+GradeResult = namedtuple('GradeResult', ['submission_id', 'quiz_type', 'correct', 'total',
+                                         'percentage', 'xp_earned', 'marks', 'late'])
+
+# Radio labels of the true/false answer encodings
+TRUE_FALSE_LABELS = ("False", "True")
+# How close a misspelled fill-in-the-blank answer must be to count (1 accepts only exact matches);
+# unset uses grading.FUZZY_THRESHOLD
+FUZZY_MATCH = os.environ.get("STUDYBUZZ_FUZZY_MATCH")
+
+def submit_quiz():
+    """Close the quiz for answers under a new submission id"""
+    st.session_state.submission_id = uuid.uuid4().hex
+    st.session_state.quiz_submitted = True
+
+def grade_submission(quiz_type, questions, answers):
+    """Grade the current submission (an AnswerSheet) and award its stats and XP exactly once.
+
+    The result is stored in the session's grade ledger under the submission id;
+    later reruns of the results page read it back instead of grading again.
+    """
+    if st.session_state.submission_id is None:
+        st.session_state.submission_id = uuid.uuid4().hex
+    submission_id = st.session_state.submission_id
+    ledger = st.session_state.grade_ledger
+    if submission_id in ledger:
+        return ledger[submission_id]
+    
+    late = 0
+    if st.session_state.timed_mode and st.session_state.quiz_deadline:
+        answers, late = answers.on_time(st.session_state.quiz_deadline + TIMER_GRACE)
+    
+    # Imported on first use, like the AI client: NumPy would add ~100 ms to every cold start
+    from grading import FUZZY_THRESHOLD, AnswerKey, grade_batch, quiz_xp
+    
+    # The same engine grades whole classes; here the class is one student
+    key = AnswerKey(questions)
+    grades = grade_batch(key, key.responses([answers]), float(FUZZY_MATCH or FUZZY_THRESHOLD))
+    marks = tuple(bool(mark) for mark in grades.marks[0])
+    correct_count = int(grades.scores[0])
+    score_pct = (correct_count / len(questions)) * 100
+    
+    st.session_state.total_quizzes += 1
+    st.session_state.total_correct += correct_count
+    st.session_state.total_questions += len(questions)
+    st.session_state.study_stats.record(st.session_state.current_topic, st.session_state.subject,
+                                        correct_count, len(questions), quiz_type)
+    
+    # XP reward
+    xp_earned = quiz_xp(correct_count, len(questions))
+    if score_pct == 100:
+        if 'perfect_score' not in st.session_state.achievements:
+            st.session_state.achievements.add('perfect_score')
+            add_xp(ACHIEVEMENTS['perfect_score']['xp'])
+            st.toast("🏆 Achievement: Perfect Score!")
+    
+    if st.session_state.timed_mode and score_pct >= 80:
+        if 'speed_demon' not in st.session_state.achievements:
+            st.session_state.achievements.add('speed_demon')
+            add_xp(ACHIEVEMENTS['speed_demon']['xp'])
+            st.toast("🏆 Achievement: Speed Demon!")
+    
+    add_xp(xp_earned)
+    
+    result = GradeResult(submission_id, quiz_type, correct_count, len(questions), score_pct, xp_earned, marks, late)
+    ledger[submission_id] = result
+    save_progress_now()
+    return result
+
+# ============== TIMED MODE ==============
+# Seconds after the deadline an answer still counts, to cover the trip from browser to server
+TIMER_GRACE = float(os.environ.get("STUDYBUZZ_TIMER_GRACE", 2))
+
+COUNTDOWN_HTML = """
+<div id="countdown" style="font-size: 2.5rem; font-weight: 700; font-family: 'Space Grotesk', sans-serif;
+    font-variant-numeric: tabular-nums; color: #ef4444; text-align: center; padding: 15px; background: rgba(239, 68, 68, 0.1);
+    border-radius: 12px; border: 1px solid rgba(239, 68, 68, 0.3);"></div>
+<script>
+// Counts down in the browser; the server only enforces the deadline when answers are graded
+const end = Date.now() + %d;
+const display = document.getElementById("countdown");
+function tick() {
+    const left = Math.max(0, Math.ceil((end - Date.now()) / 1000));
+    if (left > 0) {
+        const mins = String(Math.floor(left / 60)).padStart(2, "0");
+        const secs = String(left %% 60).padStart(2, "0");
+        display.textContent = "⏱️ " + mins + ":" + secs;
+        setTimeout(tick, (end - Date.now()) %% 1000 || 1000);
+    } else {
+        display.style.fontSize = "1.3rem";
+        display.textContent = "⏰ Time's up! Answers changed now won't count.";
+    }
+}
+tick();
+</script>
+"""
+
+def start_quiz_timer():
+    """Fix the deadline for the current quiz attempt"""
+    st.session_state.quiz_deadline = time.time() + st.session_state.timer_duration
+    st.session_state.timer_expired = False
+
+def record_answer(i, value):
+    """Store an answer, noting when it last changed so late changes can be rejected"""
+    st.session_state.answers.set(i, value, time.time())
+
+def show_late_answers(result):
+    if result.late:
+        st.warning(f"⏰ {result.late} answer{'s' if result.late != 1 else ''} given after time ran out did not count.")
+
+# ============== INTERACTIVE FRAGMENTS ==============
+# Clicks inside a fragment rerun only that fragment, not the whole page with its quiz and study guide.
+# State changes go in on_click callbacks so the fragment renders them without another rerun, and
+# callbacks that change saved progress sync it themselves since the end-of-script sync does not run.
+
+@st.cache_resource
+def get_render_stats():
+    """Process-wide server render times of full page runs and fragment reruns"""
+    return RenderStats()
+
+def interactive_fragment(func):
+    """st.fragment that records how long each of its reruns takes to render"""
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            get_render_stats().record('fragment', (time.perf_counter() - started) * 1000)
+    return st.fragment(timed)
+
+@interactive_fragment
+def hint_box(i, q):
+    if st.button(f"💡 Hint", key=f"hint_{i}"):
+        if i not in st.session_state.show_hints:
+            hint = prefetched('hints_future', i)
+            if not hint:
+                hint = call_ai_text(f"Give a brief hint (1 sentence) for this question without revealing the answer: {q.question}")
+            st.session_state.show_hints[i] = hint or "Think about the key concepts related to this topic."
+    
+    if i in st.session_state.show_hints:
+        st.markdown(f"<div class='hint-box'>💡 {st.session_state.show_hints[i]}</div>", unsafe_allow_html=True)
+
+def select_term(i, term):
+    st.session_state.matching_selected = ('term', i, term)
+
+def match_definition(pairs, defn):
+    if st.session_state.matching_selected and st.session_state.matching_selected[0] == 'term':
+        term_idx = st.session_state.matching_selected[1]
+        if pairs[term_idx].back == defn:
+            st.session_state.matched_pairs.add(term_idx)
+            add_xp(5)
+            sync_progress()
+            st.toast("✅ Correct match!")
+        else:
+            st.toast("❌ Try again!")
+        st.session_state.matching_selected = None
+
+@interactive_fragment
+def matching_game(pairs):
+    st.markdown("### Match the terms with their definitions!")
+    
+    # Create shuffled lists
+    terms = [p.front for p in pairs]
+    definitions = [p.back for p in pairs]
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.markdown("**Terms:**")
+        for i, term in enumerate(terms):
+            matched = i in st.session_state.matched_pairs
+            if matched:
+                st.markdown(f"<div class='matching-card matched'>✅ {term}</div>", unsafe_allow_html=True)
+            else:
+                st.button(term, key=f"term_{i}", on_click=select_term, args=(i, term))
+    
+    with col2:
+        st.markdown("**Definitions:**")
+        for i, defn in enumerate(definitions):
+            matched = i in st.session_state.matched_pairs
+            if matched:
+                st.markdown(f"<div class='matching-card matched'>✅ {defn[:50]}...</div>", unsafe_allow_html=True)
+            else:
+                st.button(defn[:50] + "...", key=f"def_{i}", on_click=match_definition, args=(pairs, defn))
+    
+    if len(st.session_state.matched_pairs) == len(pairs):
+        st.balloons()
+        st.success("🎉 All matched! Great job!")
+
+def set_flipped(idx, flipped):
+    st.session_state.flipped_cards[idx] = flipped
+
+def reset_flips():
+    st.session_state.flipped_cards = bytearray(len(st.session_state.flipped_cards))
+
+@interactive_fragment
+def flip_cards(cards):
+    total_cards = len(cards)
+    flipped = st.session_state.flipped_cards
+    if len(flipped) < total_cards:
+        # Large decks arrive batch by batch
+        flipped.extend(bytes(total_cards - len(flipped)))
+    flipped_count = flipped.count(1)
+    
+    st.progress(flipped_count / total_cards)
+    st.markdown(f"**Progress: {flipped_count}/{total_cards} cards**")
+    
+    st.button("🔄 Reset All", on_click=reset_flips)
+    
+    cols = st.columns(2)
+    for idx, card in enumerate(cards):
+        with cols[idx % 2]:
+            if not flipped[idx]:
+                st.markdown(f"<div class='flashcard'><div class='flashcard-label'>Term</div><div class='flashcard-content'>{card.front}</div></div>", unsafe_allow_html=True)
+                st.button("🔄 Flip", key=f"flip_{idx}", on_click=set_flipped, args=(idx, 1))
+            else:
+                st.markdown(f"<div class='flashcard flashcard-back'><div class='flashcard-label'>Definition</div><div class='flashcard-content'>{card.back}</div></div>", unsafe_allow_html=True)
+                st.button("↩️ Back", key=f"unflip_{idx}", on_click=set_flipped, args=(idx, 0))
+                if idx in st.session_state.reviewed_cards:
+                    st.caption(st.session_state.reviewed_cards[idx])
+                elif card.key in st.session_state.review_deck:
+                    review_buttons(card.key, f"rate_{idx}", idx)
+
 # ============== HOME PAGE ==============
 if st.session_state.page == "home":
     st.markdown("<h1 class='main-header'>📚 AI Study Buddy</h1>", unsafe_allow_html=True)
@@ -753,6 +602,15 @@ if st.session_state.page == "home":
             st.session_state.page = "statistics"
             st.rerun()
     
+    deck = st.session_state.review_deck
+    due_today = deck.due_today()
+    st.markdown(f"""<div class='mode-card'><div class='mode-icon'>🧠</div><div class='mode-title'>Spaced Review</div>
+    <div class='mode-description'>{due_today} of {len(deck)} cards due today. Review each card right before you would forget it!</div></div>""", unsafe_allow_html=True)
+    if st.button("Start Review", key="review_btn", use_container_width=True, disabled=not len(deck)):
+        st.session_state.page = "review"
+        st.session_state.review_flipped = False
+        st.rerun()
+    
     # Sidebar settings
     with st.sidebar:
         st.header("⚙️ Settings")
@@ -822,11 +680,145 @@ elif st.session_state.page == "statistics":
     st.markdown("---")
     st.markdown("### 📈 Recent Quiz History")
     
-    if st.session_state.quiz_history:
-        for i, quiz in enumerate(reversed(st.session_state.quiz_history[-10:])):
+    study_stats = st.session_state.study_stats
+    if len(study_stats.history):
+        for quiz in study_stats.history.recent(10):
             st.markdown(f"**{quiz['topic']}** - {quiz['score']}/{quiz['total']} ({quiz['percentage']:.0f}%) - {quiz['date']}")
+        
+        st.markdown("---")
+        st.markdown("### 🗂️ By Topic")
+        st.dataframe(study_stats.breakdown('topic', limit=20), use_container_width=True, hide_index=True)
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("### 📚 By Subject")
+            st.dataframe(study_stats.breakdown('subject'), use_container_width=True, hide_index=True)
+        with col2:
+            st.markdown("### 📅 Daily Accuracy")
+            days = sorted(study_stats.rollups['day'].items())[-30:]
+            st.bar_chart({'Day': [day for day, _ in days], 'Accuracy (%)': [r.accuracy for _, r in days]}, x='Day')
     else:
         st.info("No quiz history yet. Complete a quiz to see your progress!")
+    
+    st.markdown("---")
+    st.markdown("### ⚡ Generation Cache & AI Calls")
+    cache_stats = get_generation_cache().stats()
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Cache Hits", cache_stats['hits'])
+    with col2:
+        st.metric("Cache Misses", cache_stats['misses'])
+    with col3:
+        st.metric("Hit Rate", f"{cache_stats['hit_rate'] * 100:.1f}%")
+    with col4:
+        st.metric("Cached Items", cache_stats['entries'])
+    with col5:
+        st.metric("Coalesced Requests", get_single_flight().snapshot()['coalesced'])
+    
+    bank_stats = get_question_bank().stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Bank Items", bank_stats['items'])
+    with col2:
+        st.metric("Served from Bank", bank_stats['hits'])
+    with col3:
+        st.metric("Bank Hit Rate", f"{bank_stats['hit_rate'] * 100:.1f}%")
+    with col4:
+        st.metric("Near-Duplicates Dropped", bank_stats['near_duplicates'])
+    
+    call_stats = get_ai_call_stats().snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("AI Calls", call_stats['calls'])
+    with col2:
+        st.metric("Avg Attempts", f"{call_stats['avg_attempts']:.2f}")
+    with col3:
+        st.metric("Failed Calls", call_stats['failures'])
+    with col4:
+        st.metric("Provider Circuit", get_circuit_breaker().state.title())
+    if call_stats['attempts_per_call']:
+        st.caption("Attempts per AI call: " + " · ".join(
+            f"{attempts} attempt{'s' if attempts != 1 else ''}: {calls} call{'s' if calls != 1 else ''}"
+            for attempts, calls in call_stats['attempts_per_call'].items()))
+    
+    parse_stats = get_parse_stats().snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("JSON Responses", parse_stats['total'])
+    with col2:
+        st.metric("Truncated", parse_stats['truncated'])
+    with col3:
+        st.metric("Salvaged/Repaired", f"{parse_stats['repair_rate'] * 100:.1f}%")
+    with col4:
+        st.metric("Unparseable", parse_stats['failed'])
+    
+    item_stats = get_item_stats().snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Items Checked", item_stats['total'])
+    with col2:
+        st.metric("Items Repaired", item_stats['repaired'])
+    with col3:
+        st.metric("Items Dropped", item_stats['dropped'])
+    with col4:
+        st.metric("Top-Up Requests", item_stats['top_ups'])
+    
+    transport_stats = get_transport_stats().snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("HTTP Requests", transport_stats['requests'])
+    with col2:
+        st.metric("Connection Reuse", f"{transport_stats['reuse_rate'] * 100:.0f}%")
+    with col3:
+        st.metric("Peak In-Flight", f"{transport_stats['peak_in_flight']}/{transport_stats['max_connections']}")
+    with col4:
+        st.metric("Pool-Saturated Requests", transport_stats['saturated_requests'])
+    
+    render_stats = get_render_stats().snapshot()
+    page_render = render_stats.get('page', {'runs': 0, 'p50': 0.0})
+    fragment_render = render_stats.get('fragment', {'runs': 0, 'p50': 0.0})
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Page Runs", page_render['runs'])
+    with col2:
+        st.metric("Page Render (p50)", f"{page_render['p50']:.0f} ms")
+    with col3:
+        st.metric("Fragment Reruns", fragment_render['runs'])
+    with col4:
+        st.metric("Fragment Render (p50)", f"{fragment_render['p50']:.0f} ms")
+
+# ============== REVIEW PAGE ==============
+elif st.session_state.page == "review":
+    st.markdown("<h1 class='main-header'>🧠 Spaced Review</h1>", unsafe_allow_html=True)
+    
+    with st.sidebar:
+        if st.button("← Back to Home", use_container_width=True):
+            go_home()
+            st.rerun()
+    
+    deck = st.session_state.review_deck
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Due Today", deck.due_today())
+    with col2:
+        st.metric("Cards in Deck", len(deck))
+    
+    card_key = deck.next_due()
+    if card_key is None:
+        st.success("🎉 All caught up! Come back later for your next review.")
+    else:
+        card = deck.card(card_key)
+        if card['topic']:
+            st.caption(f"📖 {card['topic']}")
+        if not st.session_state.review_flipped:
+            st.markdown(f"<div class='flashcard'><div class='flashcard-label'>Term</div><div class='flashcard-content'>{card['front']}</div></div>", unsafe_allow_html=True)
+            if st.button("🔄 Show Answer", key="review_flip", use_container_width=True):
+                st.session_state.review_flipped = True
+                st.rerun()
+        else:
+            st.markdown(f"<div class='flashcard flashcard-back'><div class='flashcard-label'>Definition</div><div class='flashcard-content'>{card['back']}</div></div>", unsafe_allow_html=True)
+            st.markdown("**How well did you remember it?**")
+            review_buttons(card_key, "review")
 
 # ============== STUDY PAGE ==============
 elif st.session_state.page == "study":
@@ -845,7 +837,7 @@ elif st.session_state.page == "study":
         if study_mode in ["Quiz", "All Three"]:
             st.session_state.quiz_type = st.selectbox("Quiz Type", ["Multiple Choice", "True/False", "Fill in the Blank"])
             difficulty = st.select_slider("Difficulty", options=["Easy", "Medium", "Hard"])
-            num_questions = st.slider("Questions", 3, 15, 5)
+            num_questions = st.slider("Questions", 3, 30, 5)
             st.session_state.timed_mode = st.checkbox("⏱️ Timed Mode")
             if st.session_state.timed_mode:
                 st.session_state.timer_duration = st.slider("Time (seconds)", 30, 300, 60)
@@ -854,13 +846,20 @@ elif st.session_state.page == "study":
             num_questions = 5
         
         if study_mode in ["Flashcards", "All Three"]:
-            num_flashcards = st.slider("Flashcards", 4, 8, 6)
-            st.caption("💡 Limited to 8 cards for reliable generation")
+            num_flashcards = st.slider("Flashcards", 4, MAX_FLASHCARDS, 6)
+            if num_flashcards > FLASHCARD_BATCH_SIZE:
+                st.caption(f"💡 Generated in parallel batches of {FLASHCARD_BATCH_SIZE}")
             flashcard_mode = st.selectbox("Flashcard Mode", ["Flip Cards", "Matching Game"])
         else:
             num_flashcards = 10
             flashcard_mode = "Flip Cards"
         
+        if study_mode != "Study Guide":
+            fresh_content = st.checkbox("🎲 Unique questions for me", value=GENERATION_SHARING == "resample",
+                                        help="Generate new questions instead of reusing ones made for the same topic")
+        else:
+            fresh_content = False
+        
         st.markdown("---")
         st.markdown(f"**Subject:** {st.session_state.subject}")
         st.markdown(f"**Level:** {st.session_state.grade_level}")
@@ -881,65 +880,127 @@ elif st.session_state.page == "study":
             st.session_state.current_topic = topic
             update_streak()
             
-            subject_context = f"for {st.session_state.grade_level} level {st.session_state.subject}" if st.session_state.subject != "General" else f"for {st.session_state.grade_level} students"
+            subject_context = subject_context_for(st.session_state.subject, st.session_state.grade_level)
             
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # Generate Quiz
+            # Each stage: (session key, label, generator, args, error message)
+            stages = []
             if study_mode in ["Quiz", "All Three"]:
                 quiz_type = st.session_state.quiz_type
-                status_text.text(f"Generating {quiz_type} quiz...")
-                
                 if quiz_type == "Multiple Choice":
-                    result = generate_multiple_choice_quiz(topic, num_questions, difficulty, subject_context)
-                    if result:
-                        st.session_state.quiz_data = result
-                        progress_bar.progress(33)
-                    else:
-                        st.error("Failed to generate multiple choice quiz. Please try again.")
-                
+                    stages.append(('quiz_data', "Multiple choice quiz", generate_multiple_choice_quiz,
+                                   (topic, num_questions, difficulty, subject_context),
+                                   "Failed to generate multiple choice quiz. Please try again."))
                 elif quiz_type == "True/False":
-                    result = generate_true_false_quiz(topic, num_questions, difficulty, subject_context)
-                    if result:
-                        st.session_state.tf_data = result
-                        progress_bar.progress(33)
-                    else:
-                        st.error("Failed to generate true/false quiz. Please try again.")
-                
+                    stages.append(('tf_data', "True/false quiz", generate_true_false_quiz,
+                                   (topic, num_questions, difficulty, subject_context),
+                                   "Failed to generate true/false quiz. Please try again."))
                 elif quiz_type == "Fill in the Blank":
-                    result = generate_fill_blank_quiz(topic, num_questions, difficulty, subject_context)
-                    if result:
-                        st.session_state.fib_data = result
-                        progress_bar.progress(33)
-                    else:
-                        st.error("Failed to generate fill-in-the-blank quiz. Please try again.")
-                
-                if st.session_state.timed_mode:
-                    st.session_state.timer_start = time.time()
-            
-            # Generate Flashcards
+                    stages.append(('fib_data', "Fill-in-the-blank quiz", generate_fill_blank_quiz,
+                                   (topic, num_questions, difficulty, subject_context),
+                                   "Failed to generate fill-in-the-blank quiz. Please try again."))
             if study_mode in ["Flashcards", "All Three"]:
-                status_text.text("Generating flashcards...")
-                cards = generate_flashcards(topic, num_flashcards, subject_context)
-                if cards:
-                    st.session_state.flashcards_data = cards
-                    if flashcard_mode == "Matching Game" and cards:
-                        random.shuffle(cards)
-                        st.session_state.matching_pairs = cards[:min(6, len(cards))]
-                    progress_bar.progress(66)
-                else:
-                    st.error("Failed to generate flashcards. Please try again.")
+                stages.append(('flashcards_data', "Flashcards", generate_flashcards,
+                               (topic, num_flashcards, subject_context),
+                               "Failed to generate flashcards. Please try again."))
+            # The study guide is streamed on the script thread instead of the pool
+            stream_guide = study_mode in ["Study Guide", "All Three"]
+            total_stages = len(stages) + (1 if stream_guide else 0)
+            
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+            labels = [stage[1] for stage in stages] + (["Study guide"] if stream_guide else [])
+            status_text.text(f"Generating {', '.join(label.lower() for label in labels)}...")
+            # Items stream into stage_items from the pool threads and are previewed here
+            stage_lines, stage_previews, stage_items, shown_items = {}, {}, {}, {}
+            for key, label, *_ in stages:
+                stage_lines[key] = st.empty()
+                stage_previews[key] = st.empty()
+                stage_items[key] = {}
+                stage_lines[key].caption(f"⏳ {label}...")
+            
+            # Run every pool stage at once; each one reports as it lands
+            executor = get_generation_executor()
+            seen_items = st.session_state.seen_items.copy()
+            futures = {executor.submit(func, *args, on_item=stage_items[key].__setitem__, share=not fresh_content,
+                                       seen=seen_items): (key, label, error_msg)
+                       for key, label, func, args, error_msg in stages}
+            finished = set()
             
-            # Generate Study Guide
-            if study_mode in ["Study Guide", "All Three"]:
-                status_text.text("Generating study guide...")
-                guide = generate_study_guide(topic, subject_context)
-                if guide:
-                    st.session_state.study_guide_data = guide
-                    progress_bar.progress(100)
+            def refresh_previews():
+                for key, items in stage_items.items():
+                    items = items.copy()
+                    if key in finished or len(items) == shown_items.get(key, 0):
+                        continue
+                    shown_items[key] = len(items)
+                    if key == 'flashcards_data':
+                        # Large decks land batch by batch; keep what has arrived so far
+                        st.session_state.flashcards_data = normalize_items('flashcards', [items[i] for i in sorted(items)])
+                    stage_previews[key].markdown("\n".join(
+                        f"{i + 1}. {item_preview_text(items[i])}" for i in sorted(items)))
+            
+            def finish_stage(key, label, error_msg, result):
+                if key in stage_lines:
+                    stage_previews[key].empty()
+                if key in ITEM_KINDS and result:
+                    for item in result:
+                        st.session_state.seen_items.add(item_text(item))
+                    result = normalize_items(ITEM_KINDS[key], result)
+                if result:
+                    st.session_state[key] = result
+                    if key == 'flashcards_data':
+                        add_to_review_deck(result)
+                    elif key in ITEM_KINDS:
+                        st.session_state.answers = AnswerSheet(len(result), text=key == 'fib_data')
+                    if key in stage_lines:
+                        stage_lines[key].caption(f"✅ {label} ready")
                 else:
-                    st.error("Failed to generate study guide. Please try again.")
+                    if key in stage_lines:
+                        stage_lines[key].empty()
+                    st.error(error_msg)
+                finished.add(key)
+                progress_bar.progress(int(len(finished) * 100 / total_stages))
+            
+            def finish_future(future):
+                key, label, error_msg = futures[future]
+                if key in finished:
+                    return
+                try:
+                    result = future.result()
+                except Exception:
+                    result = None
+                finish_stage(key, label, error_msg, result)
+            
+            def finish_done_futures():
+                refresh_previews()
+                for future in futures:
+                    if future.done():
+                        finish_future(future)
+            
+            if stream_guide:
+                guide = render_stream(st.empty(), stream_study_guide(topic, subject_context),
+                                      on_chunk=finish_done_futures)
+                finish_stage('study_guide_data', "Study guide",
+                             "Failed to generate study guide. Please try again.", guide)
+            
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, timeout=0.2)
+                refresh_previews()
+                for future in done:
+                    finish_future(future)
+            
+            if st.session_state.timed_mode and study_mode in ["Quiz", "All Three"]:
+                start_quiz_timer()
+            
+            # Fetch every hint in one background call so "Hint" clicks are instant
+            if st.session_state.quiz_data:
+                st.session_state.hints_future = get_subrequest_executor().submit(
+                    generate_hints, st.session_state.quiz_data)
+            
+            cards = st.session_state.flashcards_data
+            if cards and flashcard_mode == "Matching Game":
+                random.shuffle(cards)
+                st.session_state.matching_pairs = cards[:min(6, len(cards))]
             
             progress_bar.progress(100)
             status_text.text("✅ Study materials generated!")
@@ -959,18 +1020,13 @@ elif st.session_state.page == "study":
                 st.error("No content was generated. Please check your internet connection and try again.")
     
     # ============== DISPLAY TIMER ==============
-    if st.session_state.timed_mode and st.session_state.timer_start and not st.session_state.quiz_submitted:
-        elapsed = time.time() - st.session_state.timer_start
-        remaining = max(0, st.session_state.timer_duration - int(elapsed))
+    if st.session_state.timed_mode and st.session_state.quiz_deadline and not st.session_state.quiz_submitted:
+        remaining = st.session_state.quiz_deadline - time.time()
         
         if remaining > 0:
-            mins, secs = divmod(remaining, 60)
-            st.markdown(f"<div class='timer-display'>⏱️ {mins:02d}:{secs:02d}</div>", unsafe_allow_html=True)
+            components.html(COUNTDOWN_HTML % int(remaining * 1000), height=100)
         else:
-            st.session_state.timer_expired = True
             st.warning("⏰ Time's up! Submitting your quiz...")
-            st.session_state.quiz_submitted = True
-            st.rerun()
     
     # ============== DISPLAY MULTIPLE CHOICE QUIZ ==============
     if st.session_state.quiz_data and study_mode in ["Quiz", "All Three"]:
@@ -981,136 +1037,82 @@ elif st.session_state.page == "study":
         
         if not st.session_state.quiz_submitted:
             for i, q in enumerate(questions):
-                st.markdown(f"<div class='quiz-question'><h4>Q{i+1}: {q['question']}</h4></div>", unsafe_allow_html=True)
-                
-                # Hint button
-                if st.button(f"💡 Hint", key=f"hint_{i}"):
-                    if i not in st.session_state.show_hints:
-                        hint = call_ai_text(f"Give a brief hint (1 sentence) for this question without revealing the answer: {q['question']}")
-                        st.session_state.show_hints[i] = hint or "Think about the key concepts related to this topic."
-                    st.rerun()
-                
-                if i in st.session_state.show_hints:
-                    st.markdown(f"<div class='hint-box'>💡 {st.session_state.show_hints[i]}</div>", unsafe_allow_html=True)
+                st.markdown(f"<div class='quiz-question'><h4>Q{i+1}: {q.question}</h4></div>", unsafe_allow_html=True)
                 
-                # Handle both dict and list formats for options
-                if isinstance(q['options'], dict):
-                    options = [f"{letter}) {text}" for letter, text in sorted(q['options'].items())]
-                else:
-                    options = [f"{chr(65+j)}) {opt}" for j, opt in enumerate(q['options'])]
+                hint_box(i, q)
                 
-                selected = st.radio(f"Answer for Q{i+1}:", options, key=f"q_{i}", index=None, label_visibility="collapsed")
-                if selected:
-                    st.session_state.user_answers[i] = selected[0]
+                selected = st.radio(f"Answer for Q{i+1}:", range(len(q.options)), format_func=q.label,
+                                    key=f"q_{i}", index=None, label_visibility="collapsed")
+                if selected is not None:
+                    record_answer(i, selected)
             
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
-                answered = len(st.session_state.user_answers)
+                answered = st.session_state.answers.answered()
                 st.markdown(f"**Answered: {answered}/{len(questions)}**")
                 if st.button("📊 Submit Quiz", type="primary", use_container_width=True):
-                    st.session_state.quiz_submitted = True
+                    submit_quiz()
                     st.rerun()
         
         else:
+            result = grade_submission('multiple_choice', questions, st.session_state.answers)
+            # Explain every wrong answer in one background call, ready before "Explain Why" is clicked
+            if st.session_state.explanations_future is None:
+                st.session_state.explanations_future = get_subrequest_executor().submit(
+                    generate_explanations, questions, st.session_state.answers, result.marks)
+            
             # Show results
-            correct_count = 0
             for i, q in enumerate(questions):
-                user_answer = st.session_state.user_answers.get(i, "")
-                correct = q['correct']
-                is_correct = user_answer == correct
-                if is_correct:
-                    correct_count += 1
+                user_answer = st.session_state.answers.get(i)
+                is_correct = result.marks[i]
                 
                 status = "correct-answer" if is_correct else "incorrect-answer"
                 icon = "✅" if is_correct else "❌"
-                st.markdown(f"<div class='quiz-question {status}'><h4>{icon} Q{i+1}: {q['question']}</h4></div>", unsafe_allow_html=True)
+                st.markdown(f"<div class='quiz-question {status}'><h4>{icon} Q{i+1}: {q.question}</h4></div>", unsafe_allow_html=True)
                 
-                # Handle both dict and list formats
-                if isinstance(q['options'], dict):
-                    for letter, text in sorted(q['options'].items()):
-                        if letter == correct:
-                            st.markdown(f"✅ **{letter}) {text}** *(Correct)*")
-                        elif letter == user_answer and not is_correct:
-                            st.markdown(f"❌ ~~{letter}) {text}~~ *(Your Answer)*")
-                        else:
-                            st.markdown(f"{letter}) {text}")
-                else:
-                    for j, opt in enumerate(q['options']):
-                        letter = chr(65 + j)
-                        if letter == correct:
-                            st.markdown(f"✅ **{letter}) {opt}** *(Correct)*")
-                        elif letter == user_answer and not is_correct:
-                            st.markdown(f"❌ ~~{letter}) {opt}~~ *(Your Answer)*")
-                        else:
-                            st.markdown(f"{letter}) {opt}")
+                for j in range(len(q.options)):
+                    if j == q.correct:
+                        st.markdown(f"✅ **{q.label(j)}** *(Correct)*")
+                    elif j == user_answer and not is_correct:
+                        st.markdown(f"❌ ~~{q.label(j)}~~ *(Your Answer)*")
+                    else:
+                        st.markdown(q.label(j))
                 
                 # Explain wrong answer
                 if not is_correct:
                     if st.button(f"🤔 Explain Why", key=f"explain_{i}"):
                         if i not in st.session_state.explanations:
-                            if isinstance(q['options'], dict):
-                                correct_text = q['options'].get(correct, correct)
-                                user_text = q['options'].get(user_answer, 'not answered')
-                            else:
-                                correct_idx = ord(correct) - 65
-                                correct_text = q['options'][correct_idx] if correct_idx < len(q['options']) else correct
-                                user_idx = ord(user_answer) - 65 if user_answer else -1
-                                user_text = q['options'][user_idx] if 0 <= user_idx < len(q['options']) else 'not answered'
-                            
-                            exp = call_ai_text(f"Explain why the answer to '{q['question']}' is '{correct_text}' and not '{user_text}'. Keep it brief (2-3 sentences).")
+                            exp = prefetched('explanations_future', i)
+                            if not exp:
+                                correct_text = q.options[q.correct]
+                                user_text = q.option_text(user_answer, 'not answered')
+                                exp = call_ai_text(f"Explain why the answer to '{q.question}' is '{correct_text}' and not '{user_text}'. Keep it brief (2-3 sentences).")
                             st.session_state.explanations[i] = exp or "The correct answer is based on the fundamental concepts of this topic."
                         st.rerun()
                     
                     if i in st.session_state.explanations:
                         st.markdown(f"<div class='explanation-box'>📚 {st.session_state.explanations[i]}</div>", unsafe_allow_html=True)
             
-            # Update stats
-            st.session_state.total_quizzes += 1
-            st.session_state.total_correct += correct_count
-            st.session_state.total_questions += len(questions)
-            
-            score_pct = (correct_count / len(questions)) * 100
-            st.session_state.quiz_history.append({
-                'topic': st.session_state.current_topic,
-                'score': correct_count,
-                'total': len(questions),
-                'percentage': score_pct,
-                'date': datetime.now().strftime("%Y-%m-%d %H:%M")
-            })
-            
-            # XP reward
-            xp_earned = correct_count * 10
-            if score_pct == 100:
-                xp_earned += 50
-                if 'perfect_score' not in st.session_state.achievements:
-                    st.session_state.achievements.add('perfect_score')
-                    add_xp(ACHIEVEMENTS['perfect_score']['xp'])
-                    st.toast("🏆 Achievement: Perfect Score!")
-            
-            if st.session_state.timed_mode and score_pct >= 80:
-                if 'speed_demon' not in st.session_state.achievements:
-                    st.session_state.achievements.add('speed_demon')
-                    add_xp(ACHIEVEMENTS['speed_demon']['xp'])
-                    st.toast("🏆 Achievement: Speed Demon!")
-            
-            add_xp(xp_earned)
             
             st.markdown(f"""
             <div class='results-box'>
                 <h2>📊 Quiz Results</h2>
-                <div class='score-display'>{correct_count}/{len(questions)}</div>
-                <p style='font-size: 24px;'>{score_pct:.0f}%</p>
-                <p style='color: #6366f1;'>+{xp_earned} XP earned!</p>
+                <div class='score-display'>{result.correct}/{result.total}</div>
+                <p style='font-size: 24px;'>{result.percentage:.0f}%</p>
+                <p style='color: #6366f1;'>+{result.xp_earned} XP earned!</p>
             </div>
             """, unsafe_allow_html=True)
+            show_late_answers(result)
             
             if st.button("🔄 Retake Quiz", use_container_width=True):
-                st.session_state.user_answers = {}
+                st.session_state.answers = AnswerSheet(len(questions))
                 st.session_state.quiz_submitted = False
+                st.session_state.submission_id = None
                 st.session_state.show_hints = {}
                 st.session_state.explanations = {}
+                st.session_state.explanations_future = None
                 if st.session_state.timed_mode:
-                    st.session_state.timer_start = time.time()
+                    start_quiz_timer()
                 st.rerun()
     
     # ============== DISPLAY TRUE/FALSE QUIZ ==============
@@ -1122,31 +1124,27 @@ elif st.session_state.page == "study":
         
         if not st.session_state.quiz_submitted:
             for i, q in enumerate(questions):
-                st.markdown(f"<div class='quiz-question'><h4>Q{i+1}: {q['statement']}</h4></div>", unsafe_allow_html=True)
-                selected = st.radio(f"Answer:", ["True", "False"], key=f"tf_{i}", index=None, horizontal=True)
-                if selected:
-                    st.session_state.user_answers[i] = selected == "True"
+                st.markdown(f"<div class='quiz-question'><h4>Q{i+1}: {q.statement}</h4></div>", unsafe_allow_html=True)
+                selected = st.radio(f"Answer:", (1, 0), format_func=TRUE_FALSE_LABELS.__getitem__,
+                                    key=f"tf_{i}", index=None, horizontal=True)
+                if selected is not None:
+                    record_answer(i, selected)
             
             if st.button("📊 Submit Quiz", type="primary"):
-                st.session_state.quiz_submitted = True
+                submit_quiz()
                 st.rerun()
         
         else:
-            correct_count = 0
+            result = grade_submission('true_false', questions, st.session_state.answers)
             for i, q in enumerate(questions):
-                user_answer = st.session_state.user_answers.get(i)
-                is_correct = user_answer == q['answer']
-                if is_correct:
-                    correct_count += 1
+                is_correct = result.marks[i]
                 
                 status = "correct-answer" if is_correct else "incorrect-answer"
                 icon = "✅" if is_correct else "❌"
-                st.markdown(f"<div class='quiz-question {status}'><h4>{icon} {q['statement']}</h4><p>Correct Answer: {q['answer']}</p></div>", unsafe_allow_html=True)
-            
-            score_pct = (correct_count / len(questions)) * 100
-            add_xp(correct_count * 10)
+                st.markdown(f"<div class='quiz-question {status}'><h4>{icon} {q.statement}</h4><p>Correct Answer: {q.answer}</p></div>", unsafe_allow_html=True)
             
-            st.markdown(f"<div class='results-box'><h2>Score: {correct_count}/{len(questions)} ({score_pct:.0f}%)</h2></div>", unsafe_allow_html=True)
+            st.markdown(f"<div class='results-box'><h2>Score: {result.correct}/{result.total} ({result.percentage:.0f}%)</h2></div>", unsafe_allow_html=True)
+            show_late_answers(result)
     
     # ============== DISPLAY FILL IN THE BLANK ==============
     if st.session_state.fib_data and study_mode in ["Quiz", "All Three"]:
@@ -1157,30 +1155,31 @@ elif st.session_state.page == "study":
         
         if not st.session_state.quiz_submitted:
             for i, q in enumerate(questions):
-                st.markdown(f"**{i+1}. {q['sentence']}**")
+                st.markdown(f"**{i+1}. {q.sentence}**")
                 answer = st.text_input(f"Your answer:", key=f"fib_{i}", label_visibility="collapsed")
-                st.session_state.fib_answers[i] = answer
+                record_answer(i, answer)
             
             if st.button("📊 Submit Quiz", type="primary"):
-                st.session_state.quiz_submitted = True
+                submit_quiz()
                 st.rerun()
         
         else:
-            correct_count = 0
+            result = grade_submission('fill_blank', questions, st.session_state.answers)
             for i, q in enumerate(questions):
-                user_answer = st.session_state.fib_answers.get(i, "").strip().lower()
-                correct_answer = q['answer'].lower()
-                is_correct = user_answer == correct_answer
-                if is_correct:
-                    correct_count += 1
-                
-                icon = "✅" if is_correct else "❌"
-                st.markdown(f"{icon} **{q['sentence']}**")
-                st.markdown(f"Your answer: {st.session_state.fib_answers.get(i, 'No answer')} | Correct: **{q['answer']}**")
+                icon = "✅" if result.marks[i] else "❌"
+                st.markdown(f"{icon} **{q.sentence}**")
+                st.markdown(f"Your answer: {st.session_state.answers.get(i) or 'No answer'} | Correct: **{q.answer}**")
             
-            score_pct = (correct_count / len(questions)) * 100
-            add_xp(correct_count * 10)
-            st.markdown(f"<div class='results-box'><h2>Score: {correct_count}/{len(questions)} ({score_pct:.0f}%)</h2></div>", unsafe_allow_html=True)
+            st.markdown(f"<div class='results-box'><h2>Score: {result.correct}/{result.total} ({result.percentage:.0f}%)</h2></div>", unsafe_allow_html=True)
+            show_late_answers(result)
+    
+    # ============== ENFORCE DEADLINE ==============
+    # Checked after the answers above are recorded, so ones changed after time ran out are graded as late
+    if (st.session_state.timed_mode and st.session_state.quiz_deadline and not st.session_state.quiz_submitted
+            and time.time() > st.session_state.quiz_deadline):
+        st.session_state.timer_expired = True
+        submit_quiz()
+        st.rerun()
     
     # ============== DISPLAY FLASHCARDS ==============
     if st.session_state.flashcards_data and study_mode in ["Flashcards", "All Three"]:
@@ -1189,80 +1188,10 @@ elif st.session_state.page == "study":
         
         cards = st.session_state.flashcards_data
         
-        # Check which mode
         if st.session_state.matching_pairs:
-            # Matching Game
-            st.markdown("### Match the terms with their definitions!")
-            pairs = st.session_state.matching_pairs
-            
-            # Create shuffled lists
-            terms = [p['front'] for p in pairs]
-            definitions = [p['back'] for p in pairs]
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.markdown("**Terms:**")
-                for i, term in enumerate(terms):
-                    matched = i in st.session_state.matched_pairs
-                    if matched:
-                        st.markdown(f"<div class='matching-card matched'>✅ {term}</div>", unsafe_allow_html=True)
-                    else:
-                        if st.button(term, key=f"term_{i}"):
-                            st.session_state.matching_selected = ('term', i, term)
-                            st.rerun()
-            
-            with col2:
-                st.markdown("**Definitions:**")
-                for i, defn in enumerate(definitions):
-                    matched = i in st.session_state.matched_pairs
-                    if matched:
-                        st.markdown(f"<div class='matching-card matched'>✅ {defn[:50]}...</div>", unsafe_allow_html=True)
-                    else:
-                        if st.button(defn[:50] + "...", key=f"def_{i}"):
-                            if st.session_state.matching_selected and st.session_state.matching_selected[0] == 'term':
-                                term_idx = st.session_state.matching_selected[1]
-                                if pairs[term_idx]['back'] == defn:
-                                    st.session_state.matched_pairs.add(term_idx)
-                                    add_xp(5)
-                                    st.success("✅ Correct match!")
-                                else:
-                                    st.error("❌ Try again!")
-                                st.session_state.matching_selected = None
-                            st.rerun()
-            
-            if len(st.session_state.matched_pairs) == len(pairs):
-                st.balloons()
-                st.success("🎉 All matched! Great job!")
-        
+            matching_game(st.session_state.matching_pairs)
         else:
-            # Regular Flip Cards
-            total_cards = len(cards)
-            flipped_count = len(st.session_state.flipped_cards)
-            
-            st.progress(flipped_count / total_cards)
-            st.markdown(f"**Progress: {flipped_count}/{total_cards} cards**")
-            
-            if st.button("🔄 Reset All"):
-                st.session_state.flipped_cards = set()
-                st.rerun()
-            
-            cols = st.columns(2)
-            for idx, card in enumerate(cards):
-                with cols[idx % 2]:
-                    card_id = f"card_{idx}"
-                    is_flipped = card_id in st.session_state.flipped_cards
-                    
-                    if not is_flipped:
-                        st.markdown(f"<div class='flashcard'><div class='flashcard-label'>Term</div><div class='flashcard-content'>{card['front']}</div></div>", unsafe_allow_html=True)
-                        if st.button("🔄 Flip", key=f"flip_{idx}"):
-                            st.session_state.flipped_cards.add(card_id)
-                            st.rerun()
-                    else:
-                        st.markdown(f"<div class='flashcard flashcard-back'><div class='flashcard-label'>Definition</div><div class='flashcard-content'>{card['back']}</div></div>", unsafe_allow_html=True)
-                        if st.button("↩️ Back", key=f"unflip_{idx}"):
-                            st.session_state.flipped_cards.remove(card_id)
-                            st.rerun()
+            flip_cards(cards)
     
     # ============== DISPLAY STUDY GUIDE ==============
     if st.session_state.study_guide_data and study_mode in ["Study Guide", "All Three"]:
@@ -1282,25 +1211,58 @@ elif st.session_state.page == "study":
         if st.button("Send", key="chat_send"):
             if user_question:
                 st.session_state.chat_messages.append({'role': 'user', 'content': user_question})
+                st.markdown(f"<div class='chat-message chat-user'>{user_question}</div>", unsafe_allow_html=True)
                 
-                response = call_ai_text(
-                    f"The user is studying {st.session_state.current_topic}. Answer their question: {user_question}",
-                    "You are a helpful educational tutor. Give clear, concise answers to help students understand concepts."
+                response = render_stream(
+                    st.empty(),
+                    stream_ai_text(
+                        f"The user is studying {st.session_state.current_topic}. Answer their question: {user_question}",
+                        "You are a helpful educational tutor. Give clear, concise answers to help students understand concepts."
+                    ),
+                    html_template="<div class='chat-message chat-ai'>{text}</div>",
                 )
                 if response:
                     st.session_state.chat_messages.append({'role': 'ai', 'content': response})
-                
-                st.rerun()
+                    st.rerun()
+                st.error("Couldn't get an answer. Please try again.")
     
     # ============== RELATED TOPICS ==============
     if st.session_state.current_topic and (st.session_state.quiz_data or st.session_state.study_guide_data or st.session_state.flashcards_data or st.session_state.tf_data or st.session_state.fib_data):
         st.markdown("---")
         st.markdown("### 🔗 Related Topics to Explore")
         if st.button("Get Suggestions"):
-            related = call_ai_text(f"List 5 related topics to {st.session_state.current_topic} that a student might want to study next. Just list the topics, one per line.")
-            if related:
-                st.markdown(related)
+            if not render_stream(st.empty(), stream_ai_text(f"List 5 related topics to {st.session_state.current_topic} that a student might want to study next. Just list the topics, one per line.")):
+                st.error("Couldn't get suggestions. Please try again.")
     
     # Footer
     st.markdown("---")
     st.markdown("<div class='footer'><p>Made with ❤️ for students everywhere | Powered by Pollinations.AI 🌸</p></div>", unsafe_allow_html=True)
+
+# ============== SAVE PROGRESS ==============
+sync_progress()
+# Runs cut short by st.rerun() never get here, so they are not timed
+get_render_stats().record('page', (time.perf_counter() - run_started) * 1000)
+
+# ============== PRE-WARM ==============
+# Once the first page is out, import the AI client and connect to the provider in the background
+# while the student picks a topic; started here so it does not slow that first render
+start_prewarm()
+
+# ============== HEADLESS SERVICE ==============
+# With STUDYBUZZ_SERVICE_PORT set, the JSON API (service.py) runs inside this process so it
+# shares the app's AI client, generation cache and progress store
+SERVICE_PORT = int(os.environ.get("STUDYBUZZ_SERVICE_PORT", 0))
+
+@st.cache_resource(show_spinner=False)
+def start_service():
+    from service import start_in_background
+    return start_in_background(
+        get_progress_store(),
+        host=os.environ.get("STUDYBUZZ_SERVICE_HOST", "127.0.0.1"),
+        port=SERVICE_PORT,
+        workers=int(os.environ.get("STUDYBUZZ_SERVICE_WORKERS", 4)),
+        max_queued=int(os.environ.get("STUDYBUZZ_SERVICE_QUEUE", 100)),
+    )
+
+if SERVICE_PORT:
+    start_service()
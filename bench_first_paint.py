@@ -0,0 +1,150 @@
+"""Time-to-first-paint benchmark: cold page loads of the running app in headless Chromium.
+
+Starts stub_llm.py and `streamlit run app.py` on free ports, then loads the home page
+in a fresh browser context (empty cache) per run and reads the browser's own paint
+timings, plus when the app's header appears and when the theme font is ready:
+
+    pip install playwright && python -m playwright install chromium
+    python bench_first_paint.py --runs 5
+    python bench_first_paint.py --runs 5 --offline      # block every non-local request
+    python bench_first_paint.py --runs 5 --save bench_first_paint.json
+    python bench_first_paint.py --runs 5 --compare bench_first_paint.json --tolerance 0.25
+
+``--offline`` shows what a school network without internet access gets: the page
+must still paint without waiting on an external stylesheet or font. ``--compare``
+exits 1 when any median is slower than the saved one by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+METRICS = ('first_paint_ms', 'first_contentful_paint_ms', 'header_visible_ms', 'font_ready_ms')
+LOCAL_HOSTS = ("127.0.0.1", "localhost")
+
+# Runs in the page once the header is there; every time is relative to navigation start
+READ_TIMINGS = """async () => {
+    const paints = Object.fromEntries(performance.getEntriesByType('paint').map(e => [e.name, e.startTime]));
+    const headerVisible = performance.now();
+    await document.fonts.ready;
+    return {
+        first_paint_ms: paints['first-paint'] ?? null,
+        first_contentful_paint_ms: paints['first-contentful-paint'] ?? null,
+        header_visible_ms: headerVisible,
+        font_ready_ms: performance.now(),
+        font_loaded: document.fonts.check('16px "Space Grotesk"'),
+    };
+}"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_app(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/_stcore/health", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"app did not come up at {url}")
+
+
+def load_page(browser, url, offline):
+    """One cold page load; returns milliseconds per metric and whether the font loaded"""
+    context = browser.new_context()
+    if offline:
+        context.route("**/*", lambda route: route.continue_()
+                      if urlsplit(route.request.url).hostname in LOCAL_HOSTS else route.abort())
+    try:
+        page = context.new_page()
+        page.goto(url, wait_until="commit")
+        page.wait_for_selector(".main-header", timeout=60000)
+        return page.evaluate(READ_TIMINGS)
+    finally:
+        context.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold time to first paint of the app in a browser")
+    parser.add_argument("--runs", type=int, default=5, help="cold page loads to take the median of")
+    parser.add_argument("--offline", action="store_true", help="abort every request that is not to the app")
+    parser.add_argument("--save", help="write the medians to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check the medians against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args()
+
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        print("bench_first_paint.py needs Playwright: pip install playwright && python -m playwright install chromium")
+        return 2
+
+    stub_port, app_port = free_port(), free_port()
+    url = f"http://127.0.0.1:{app_port}"
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            STUDYBUZZ_AI_BASE_URL=f"http://127.0.0.1:{stub_port}/v1",
+            STUDYBUZZ_CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+            STUDYBUZZ_BANK_PATH=os.path.join(tmp, "bank.sqlite3"),
+            STUDYBUZZ_PROGRESS_PATH=os.path.join(tmp, "progress.sqlite3"),
+        )
+        stub = subprocess.Popen([sys.executable, os.path.join(HERE, "stub_llm.py"), "--port", str(stub_port)],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        app = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", os.path.join(HERE, "app.py"),
+             "--server.headless", "true", "--server.port", str(app_port),
+             "--browser.gatherUsageStats", "false"],
+            env=env, cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for_app(url)
+            with sync_playwright() as playwright:
+                browser = playwright.chromium.launch()
+                try:
+                    # One untimed load so the server's first script run is not counted
+                    load_page(browser, url, args.offline)
+                    samples = [load_page(browser, url, args.offline) for _ in range(args.runs)]
+                finally:
+                    browser.close()
+        finally:
+            for process in (app, stub):
+                process.terminate()
+                process.wait()
+
+    medians = {metric: round(statistics.median(sample[metric] for sample in samples), 1)
+               for metric in METRICS if all(sample[metric] is not None for sample in samples)}
+    font_loads = sum(sample['font_loaded'] for sample in samples)
+    print(f"{args.runs} cold page loads, {'offline' if args.offline else 'online'}, "
+          f"Space Grotesk loaded in {font_loads}/{args.runs}")
+    for metric in METRICS:
+        print(f"  {metric:<28}{medians[metric]:>10.1f}" if metric in medians else f"  {metric:<28}{'n/a':>10}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(medians, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [metric for metric in medians
+                       if metric in baseline and medians[metric] > baseline[metric] * (1 + args.tolerance)]
+        for metric in regressions:
+            print(f"REGRESSION {metric}: {medians[metric]:.1f} ms vs baseline {baseline[metric]:.1f} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
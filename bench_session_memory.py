@@ -0,0 +1,97 @@
+"""Per-session memory of generated study material: raw model output vs study_items records.
+
+Builds many sessions' worth of quizzes, flashcards and answers from stub_llm.py's
+payloads, once as the parsed JSON dicts generation returns and once normalized the
+way the app stores them, and reports the bytes each session holds with tracemalloc:
+
+    python bench_session_memory.py
+    python bench_session_memory.py --questions 20 --flashcards 60 --sessions 200
+"""
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from stub_llm import fake_completion
+from study_items import AnswerSheet, normalize_items
+
+# The system-prompt marker stub_llm.py keys each kind of payload on
+PAYLOADS = {
+    'multiple_choice': ('"options"', "questions"),
+    'true_false': ('"statement"', "questions"),
+    'fill_blank': ('"sentence"', "questions"),
+    'flashcards': ('"flashcards"', "flashcards"),
+}
+QUIZ_KINDS = ('multiple_choice', 'true_false', 'fill_blank')
+
+
+def generated(kind, count):
+    """Freshly parsed items, as a generation hands them to the app"""
+    marker, list_key = PAYLOADS[kind]
+    text = fake_completion([{'content': marker}, {'content': f"exactly {count}"}])
+    return json.loads(text)[list_key]
+
+
+def raw_session(kind, questions, cards, now):
+    """Session state as the app kept it before normalization: dicts keyed by "card_{idx}" strings"""
+    answers = {i: q['correct'] if kind == 'multiple_choice' else q['answer'] for i, q in enumerate(questions)}
+    return {
+        'questions': questions,
+        'answers': answers,
+        'answer_times': {i: now + i for i in answers},
+        'flashcards': cards,
+        'flipped_cards': {f"card_{idx}" for idx in range(0, len(cards), 2)},
+    }
+
+
+def compact_session(kind, questions, cards, now):
+    questions = normalize_items(kind, questions)
+    sheet = AnswerSheet(len(questions), text=kind == 'fill_blank')
+    for i, q in enumerate(questions):
+        sheet.set(i, q.answer if kind == 'fill_blank' else int(q.answer) if kind == 'true_false' else q.correct,
+                  now + i)
+    flipped = bytearray(len(cards))
+    flipped[::2] = b"\x01" * len(flipped[::2])
+    return {
+        'questions': questions,
+        'answers': sheet,
+        'flashcards': normalize_items('flashcards', cards),
+        'flipped_cards': flipped,
+    }
+
+
+def bytes_per_session(build, kind, args):
+    """Memory still held per session after generating and storing args.sessions of them"""
+    now = time.time()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    payloads = [(generated(kind, args.questions), generated('flashcards', args.flashcards))
+                for _ in range(args.sessions)]
+    sessions = [build(kind, questions, cards, now) for questions, cards in payloads]
+    # Once normalized, the parsed dicts are only referenced from here
+    del payloads
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del sessions
+    return held / args.sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-session memory of raw and compact study material")
+    parser.add_argument("--questions", type=int, default=10, help="quiz questions per session")
+    parser.add_argument("--flashcards", type=int, default=40, help="flashcards per session")
+    parser.add_argument("--sessions", type=int, default=100, help="sessions to average over")
+    args = parser.parse_args()
+
+    print(f"{args.questions} questions + {args.flashcards} flashcards per session, {args.sessions} sessions")
+    print(f"  {'quiz':<18}{'raw KB':>10}{'compact KB':>12}{'saved':>8}")
+    for kind in QUIZ_KINDS:
+        raw = bytes_per_session(raw_session, kind, args)
+        compact = bytes_per_session(compact_session, kind, args)
+        print(f"  {kind:<18}{raw / 1024:>10.1f}{compact / 1024:>12.1f}{1 - compact / raw:>8.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Cold-start benchmark: import time, first render and first generation in fresh processes.
+
+Starts stub_llm.py on a free port and, for each run, launches a new interpreter with
+empty cache, bank and progress files so nothing is warm:
+
+    python bench_startup.py --runs 5
+    python bench_startup.py --runs 5 --save bench_startup.json
+    python bench_startup.py --runs 5 --compare bench_startup.json --tolerance 0.25
+
+``--think`` waits between the first render and the first generation, like a student
+typing a topic, which is the window pre-warming works in. ``--compare`` exits 1 when
+any median is slower than the saved one by more than the tolerance.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+METRICS = ('import_ms', 'first_render_ms', 'first_generation_ms')
+
+
+def measure(think):
+    """One cold start in this (fresh) process; returns milliseconds per metric"""
+    started = time.perf_counter()
+    import streamlit.logger
+    import study_ai
+    imported = time.perf_counter()
+    streamlit.logger.set_log_level("error")
+
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(os.path.join(HERE, "app.py"), default_timeout=60)
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"first render failed: {app.exception[0].message}")
+    rendered = time.perf_counter()
+
+    time.sleep(think)
+    generation_started = time.perf_counter()
+    cards = study_ai.generate_flashcards("Photosynthesis", 6, "", share=False)
+    if not cards:
+        raise RuntimeError("first generation returned nothing")
+    generated = time.perf_counter()
+    return {
+        'import_ms': (imported - started) * 1000,
+        'first_render_ms': (rendered - imported) * 1000,
+        'first_generation_ms': (generated - generation_started) * 1000,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def run_cold(base_url, think, prewarm):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            STUDYBUZZ_AI_BASE_URL=base_url,
+            STUDYBUZZ_CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+            STUDYBUZZ_BANK_PATH=os.path.join(tmp, "bank.sqlite3"),
+            STUDYBUZZ_PROGRESS_PATH=os.path.join(tmp, "progress.sqlite3"),
+            STUDYBUZZ_PREWARM="1" if prewarm else "0",
+        )
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", "--think", str(think)],
+            env=env, cwd=tmp, capture_output=True, text=True, timeout=300,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"cold start failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import, render and generation times")
+    parser.add_argument("--runs", type=int, default=5, help="cold starts to take the median of")
+    parser.add_argument("--think", type=float, default=1.0, help="seconds between first render and first generation")
+    parser.add_argument("--no-prewarm", action="store_true", help="disable pre-warming (STUDYBUZZ_PREWARM=0)")
+    parser.add_argument("--save", help="write the medians to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check the medians against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.think)))
+        return 0
+
+    port = free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(HERE, "stub_llm.py"), "--port", str(port)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(0.5)
+        samples = [run_cold(f"http://127.0.0.1:{port}/v1", args.think, not args.no_prewarm)
+                   for _ in range(args.runs)]
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    medians = {metric: round(statistics.median(sample[metric] for sample in samples), 1) for metric in METRICS}
+    print(f"{args.runs} cold starts, prewarm {'off' if args.no_prewarm else 'on'}, think {args.think}s")
+    for metric in METRICS:
+        print(f"  {metric:<22}{medians[metric]:>10.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(medians, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [metric for metric in METRICS
+                       if metric in baseline and medians[metric] > baseline[metric] * (1 + args.tolerance)]
+        for metric in regressions:
+            print(f"REGRESSION {metric}: {medians[metric]:.1f} ms vs baseline {baseline[metric]:.1f} ms")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""Shared setup for the benchmark suite: import path, quiet Streamlit, and the repair-rate report"""
+import glob
+import json
+import os
+import sys
+
+import pytest
+import streamlit.logger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES = os.path.join(ROOT, "benchmarks", "baselines")
+sys.path.insert(0, ROOT)
+# study_ai's cached resources run outside `streamlit run` here, so its bare-mode warnings are just noise
+streamlit.logger.set_log_level("error")
+
+REPAIR_RATES = pytest.StashKey[dict]()
+
+
+def pytest_configure(config):
+    config.stash[REPAIR_RATES] = {}
+
+
+@pytest.fixture
+def repair_rates(request):
+    """Record a benchmark's recovery rates for the end-of-run report and the saved results"""
+    rates = request.config.stash[REPAIR_RATES]
+
+    def record(benchmark, name, result):
+        rates[name] = result
+        benchmark.extra_info.update(result)
+    return record
+
+
+@pytest.fixture(scope="session")
+def baseline_rates():
+    """Recovery rates saved with the newest committed baseline, by benchmark name"""
+    runs = sorted(glob.glob(os.path.join(BASELINES, "*", "*.json")), key=os.path.basename)
+    if not runs:
+        return {}
+    with open(runs[-1]) as f:
+        saved = json.load(f)
+    return {bench['name']: bench.get('extra_info', {}) for bench in saved.get('benchmarks', [])}
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    rates = config.stash.get(REPAIR_RATES, None)
+    if not rates:
+        return
+    terminalreporter.section("truncated JSON recovery")
+    terminalreporter.write_line(f"{'benchmark':<58}{'usable':>8}{'items':>8}{'garbled':>9}{'inputs':>8}")
+    for name, result in sorted(rates.items()):
+        terminalreporter.write_line(
+            f"{name:<58}{result['usable_rate']:>8.1%}{result['item_rate']:>8.1%}"
+            f"{result['garbled_items']:>9}{result['inputs']:>8}")
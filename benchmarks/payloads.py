@@ -0,0 +1,128 @@
+"""Realistic model completions, and every way they get cut off, for the parsing benchmarks"""
+import json
+import textwrap
+
+ITEMS = {
+    'multiple_choice': ('questions', [
+        {"question": "Which organelle is the main site of photosynthesis?",
+         "options": {"A": "Mitochondrion", "B": "Chloroplast", "C": "Ribosome", "D": "Golgi apparatus"},
+         "correct": "B"},
+        {"question": "What gas do plants take in for photosynthesis?",
+         "options": {"A": "Oxygen", "B": "Nitrogen", "C": "Carbon dioxide", "D": "Hydrogen"},
+         "correct": "C"},
+        {"question": "Which pigment absorbs most of the light used in photosynthesis?",
+         "options": {"A": "Chlorophyll", "B": "Carotene", "C": "Melanin", "D": "Hemoglobin"},
+         "correct": "A"},
+        {"question": "Where do the light-dependent reactions take place?",
+         "options": {"A": "Stroma", "B": "Cytoplasm", "C": "Thylakoid membranes", "D": "Nucleus"},
+         "correct": "C"},
+        {"question": "What is the main product of the Calvin cycle?",
+         "options": {"A": "ATP", "B": "Glucose (via G3P)", "C": "Water", "D": "Oxygen"},
+         "correct": "B"},
+        {"question": "Which molecule is split to release oxygen?",
+         "options": {"A": "Water", "B": "Glucose", "C": "NADPH", "D": "Carbon dioxide"},
+         "correct": "A"},
+        {"question": "Which factor does NOT directly limit the rate of photosynthesis?",
+         "options": {"A": "Light intensity", "B": "Temperature", "C": "CO2 concentration", "D": "Soil color"},
+         "correct": "D"},
+        {"question": "The \"energy currency\" made in the light reactions is:",
+         "options": {"A": "DNA", "B": "ATP", "C": "Starch", "D": "Cellulose"},
+         "correct": "B"},
+    ]),
+    'true_false': ('questions', [
+        {"statement": "Photosynthesis takes place in the chloroplasts of plant cells.", "answer": True},
+        {"statement": "Plants release carbon dioxide as the main product of photosynthesis.", "answer": False},
+        {"statement": "Chlorophyll reflects green light, which is why leaves look green.", "answer": True},
+        {"statement": "The Calvin cycle needs direct sunlight to run.", "answer": False},
+        {"statement": "Water molecules are split during the light-dependent reactions.", "answer": True},
+        {"statement": "Glucose is made in the thylakoid membranes.", "answer": False},
+        {"statement": "Stomata let carbon dioxide into the leaf.", "answer": True},
+        {"statement": "Photosynthesis only happens in plants, never in bacteria.", "answer": False},
+    ]),
+    'fill_blank': ('questions', [
+        {"sentence": "Photosynthesis converts light energy into _____ energy.", "answer": "chemical"},
+        {"sentence": "The green pigment in plants is called _____.", "answer": "chlorophyll"},
+        {"sentence": "Plants take in carbon dioxide through tiny pores called _____.", "answer": "stomata"},
+        {"sentence": "The light-independent reactions are also known as the _____ cycle.", "answer": "Calvin"},
+        {"sentence": "Oxygen is released when _____ molecules are split.", "answer": "water"},
+        {"sentence": "The fluid-filled space around the thylakoids is the _____.", "answer": "stroma"},
+        {"sentence": "Plants store extra glucose as _____.", "answer": "starch"},
+        {"sentence": "The energy carrier NADPH is made in the _____ reactions.", "answer": "light-dependent"},
+    ]),
+    'flashcards': ('flashcards', [
+        {"front": "Photosynthesis", "back": "The process plants use to turn light, water and CO2 into glucose and oxygen"},
+        {"front": "Chlorophyll", "back": "Green pigment that absorbs red and blue light"},
+        {"front": "Chloroplast", "back": "Organelle where photosynthesis happens"},
+        {"front": "Stomata", "back": "Pores in the leaf surface that let gases in and out"},
+        {"front": "Calvin cycle", "back": "Light-independent reactions that fix CO2 into sugar"},
+        {"front": "Thylakoid", "back": "Membrane sacs where the light reactions take place"},
+        {"front": "ATP", "back": "Molecule that carries energy within cells, the cell's \"energy currency\""},
+        {"front": "Stroma", "back": "Fluid around the thylakoids; site of the Calvin cycle"},
+    ]),
+}
+KINDS = tuple(ITEMS)
+# How far into the completion the model got, as shares of its full length
+CUT_POINTS = [i / 100 for i in range(5, 100)]
+
+
+def render(key, items, indent):
+    """A completion in one of the layouts models send, and the offset where each item ends"""
+    if indent:
+        text, separator, close = f'{{\n  "{key}": [\n', ",\n", "\n  ]\n}"
+        item_texts = [textwrap.indent(json.dumps(item, indent=2), "    ") for item in items]
+    else:
+        text, separator, close = f'{{"{key}": [', ", ", "]}"
+        item_texts = [json.dumps(item) for item in items]
+    ends = []
+    for i, item_text in enumerate(item_texts):
+        text += (separator if i else "") + item_text
+        ends.append(len(text))
+    return text + close, ends
+
+
+def completion(kind, indent=True, fenced=True):
+    """A whole completion, by default pretty-printed inside a ```json fence"""
+    key, items = ITEMS[kind]
+    text, _ = render(key, items, indent)
+    return f"```json\n{text}\n```" if fenced else text
+
+
+def truncations(kind):
+    """(text cut off mid-completion, how many items it still holds whole) for every cut point and layout"""
+    key, items = ITEMS[kind]
+    corpus = []
+    for indent in (False, True):
+        text, ends = render(key, items, indent)
+        for share in CUT_POINTS:
+            cut = int(len(text) * share)
+            corpus.append((text[:cut], sum(1 for end in ends if end <= cut)))
+    return corpus
+
+
+def recovery(kind, results, corpus):
+    """How well parsed results recovered the whole items their truncated inputs still held.
+
+    usable: share of inputs holding a whole item that came back with at least one;
+    items: share of all whole items that came back intact; garbled: items that came
+    back but differ from the original (cut-off items closed up by a repair).
+    """
+    key, items = ITEMS[kind]
+    usable = holding = whole = recovered = garbled = 0
+    for result, (_, complete) in zip(results, corpus):
+        got = result.get(key) if isinstance(result, dict) else None
+        got = got if isinstance(got, list) else []
+        intact = 0
+        while intact < len(got) and intact < len(items) and got[intact] == items[intact]:
+            intact += 1
+        garbled += len(got) - intact
+        whole += complete
+        recovered += min(intact, complete)
+        if complete:
+            holding += 1
+            usable += intact > 0
+    return {
+        'usable_rate': round(usable / holding, 4) if holding else 1.0,
+        'item_rate': round(recovered / whole, 4) if whole else 1.0,
+        'garbled_items': garbled,
+        'inputs': len(corpus),
+    }
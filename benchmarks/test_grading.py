@@ -0,0 +1,85 @@
+"""Grading a single submission (the app's path) and a whole class"""
+import random
+
+import numpy as np
+import pytest
+
+from grading import AnswerKey, grade_batch, item_analysis
+from payloads import ITEMS
+from study_items import UNANSWERED, AnswerSheet, normalize_items
+
+
+def make_key(kind, size):
+    _, items = ITEMS[kind]
+    return AnswerKey(normalize_items(kind, (items * (size // len(items) + 1))[:size]))
+
+
+def choice_responses(key, students, rng):
+    """Mostly right answers, some wrong ones and a few blanks"""
+    right = rng.random((students, key.size)) < 0.7
+    guesses = (rng.random((students, key.size)) * key.num_options).astype(np.int8)
+    responses = np.where(right, key.correct, guesses).astype(np.int8)
+    responses[rng.random((students, key.size)) < 0.05] = UNANSWERED
+    return responses
+
+
+def text_responses(key, students, seed):
+    """Right answers, typos of them, wrong words and blanks"""
+    rng = random.Random(seed)
+    answers = [ITEMS['fill_blank'][1][i % len(ITEMS['fill_blank'][1])]['answer'] for i in range(key.size)]
+    rows = []
+    for _ in range(students):
+        row = []
+        for answer in answers:
+            roll = rng.random()
+            if roll < 0.6:
+                row.append(answer.upper() if roll < 0.1 else answer)
+            elif roll < 0.75:
+                cut = rng.randrange(len(answer))
+                row.append(answer[:cut] + answer[cut + 1:])
+            elif roll < 0.95:
+                row.append(rng.choice(("glucose", "oxygen", "the nucleus", "light")))
+            else:
+                row.append(None)
+        rows.append(row)
+    return rows
+
+
+@pytest.mark.parametrize("kind", ['multiple_choice', 'true_false', 'fill_blank'])
+def test_grade_one_submission(benchmark, kind):
+    key = make_key(kind, 10)
+    sheet = AnswerSheet(key.size, text=key.text)
+    for i in range(key.size):
+        if key.text:
+            sheet.set(i, key.expected[i] if i % 3 else "wrong", 1.0)
+        else:
+            sheet.set(i, int(key.correct[i]) if i % 3 else 0, 1.0)
+
+    def grade():
+        return grade_batch(key, key.responses([sheet]))
+    grades = benchmark(grade)
+    assert grades.answered[0] == key.size
+
+
+@pytest.mark.parametrize("students,questions", [(30, 10), (1000, 30)])
+def test_grade_class_multiple_choice(benchmark, students, questions):
+    key = make_key('multiple_choice', questions)
+    responses = choice_responses(key, students, np.random.default_rng(0))
+    grades = benchmark(grade_batch, key, responses)
+    assert grades.marks.shape == (students, questions)
+
+
+@pytest.mark.parametrize("students,questions", [(30, 10), (300, 20)])
+def test_grade_class_fill_blank(benchmark, students, questions):
+    key = make_key('fill_blank', questions)
+    responses = text_responses(key, students, seed=0)
+    grades = benchmark(grade_batch, key, responses)
+    assert 0 < grades.scores.mean() < questions
+
+
+def test_item_analysis(benchmark):
+    key = make_key('multiple_choice', 30)
+    responses = choice_responses(key, 1000, np.random.default_rng(0))
+    grades = grade_batch(key, responses)
+    analysis = benchmark(item_analysis, key, responses, grades)
+    assert analysis.option_counts.sum() == responses.size
@@ -0,0 +1,40 @@
+"""Spotting reworded questions and flashcard fronts in a large index"""
+import pytest
+
+from near_dup import NearDuplicateIndex
+
+TOPICS = ("mitosis", "meiosis", "osmosis", "diffusion", "respiration", "transcription", "translation", "enzymes")
+
+
+def filled_index(size):
+    index = NearDuplicateIndex()
+    for i in range(size):
+        topic = TOPICS[i % len(TOPICS)]
+        index.add(f"Which organelle term{i} controls {topic} stage{i // len(TOPICS)} in plant cells?", key=i)
+    index.add("Which process lets green plants turn sunlight, water and carbon dioxide into glucose?", key="target")
+    return index
+
+
+@pytest.mark.parametrize("size", [100, 10000])
+def test_find_rewording(benchmark, size):
+    index = filled_index(size)
+    reworded = "Which process do green plants use to turn sunlight, water and carbon dioxide into glucose?"
+    found = benchmark(index.find, reworded)
+    assert found == "target"
+
+
+@pytest.mark.parametrize("first,second", [
+    ("Photosynthesis", "Photosynthesis equation"),
+    ("Cell membrane", "Cell membrane function"),
+    ("Mitochondria role", "Mitochondria role in respiration"),
+])
+def test_short_fronts_are_distinct(first, second):
+    index = NearDuplicateIndex()
+    assert index.add(first)
+    assert index.add(second)
+
+
+def test_short_front_repeat_is_duplicate():
+    index = NearDuplicateIndex()
+    assert index.add("What is photosynthesis?")
+    assert not index.add("Photosynthesis")
@@ -0,0 +1,59 @@
+"""Fence stripping, parsing and truncation repair of JSON completions"""
+import json
+
+import pytest
+
+from payloads import KINDS, completion, recovery, truncations
+from study_ai import parse_ai_json, repair_truncated_json
+
+
+def check_rates(name, result, baseline_rates):
+    """Fail when a recovery rate fell below the one saved with the committed baseline"""
+    saved = baseline_rates.get(name, {})
+    for rate in ('usable_rate', 'item_rate'):
+        if rate in saved:
+            assert result[rate] >= saved[rate], f"{rate} fell from {saved[rate]} to {result[rate]}"
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_parse_fenced_completion(benchmark, kind):
+    text = completion(kind)
+    data = benchmark(parse_ai_json, text)
+    assert data == json.loads(completion(kind, fenced=False))
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_parse_truncated_completion(benchmark, kind):
+    # Cut three quarters of the way through: salvaged without falling back to repair
+    text = completion(kind)
+    data = benchmark(parse_ai_json, text[:len(text) * 3 // 4])
+    assert data and all(isinstance(items, list) and items for items in data.values())
+
+
+def parse_all(corpus):
+    results = []
+    for text, _ in corpus:
+        try:
+            results.append(parse_ai_json(text, truncated=True))
+        except json.JSONDecodeError:
+            results.append(None)
+    return results
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_repair_truncated_json(benchmark, repair_rates, baseline_rates, kind):
+    corpus = truncations(kind)
+    key = 'flashcards' if kind == 'flashcards' else 'questions'
+    results = benchmark(lambda: [repair_truncated_json(text, key) for text, _ in corpus])
+    result = recovery(kind, results, corpus)
+    repair_rates(benchmark, f"repair_truncated_json[{kind}]", result)
+    check_rates(benchmark.name, result, baseline_rates)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_parse_truncated_corpus(benchmark, repair_rates, baseline_rates, kind):
+    corpus = truncations(kind)
+    results = benchmark(parse_all, corpus)
+    result = recovery(kind, results, corpus)
+    repair_rates(benchmark, f"parse_ai_json[{kind}]", result)
+    check_rates(benchmark.name, result, baseline_rates)
@@ -0,0 +1,38 @@
+"""Write-behind progress store: buffered changes survive a flush that cannot get the write lock"""
+import sqlite3
+
+import pytest
+
+from progress_store import ProgressStore
+
+USER = "0" * 32
+
+
+def test_flush_keeps_changes_when_database_is_locked(tmp_path):
+    path = str(tmp_path / "progress.sqlite3")
+    store = ProgressStore(path, flush_interval=3600)
+    store._conn.execute("PRAGMA busy_timeout = 50")
+    entry = {'topic': "Cells", 'score': 8, 'total': 10, 'percentage': 80.0, 'date': "2024-05-10 09:00"}
+    card = {'key': "k1", 'topic': "Cells", 'front': "Cell", 'back': "Unit of life", 'ease': 2.5,
+            'interval': 1, 'due': 0.0, 'reps': 1, 'lapses': 0}
+    store.record(USER, deltas={'xp': 80, 'total_quizzes': 1}, fields={'study_streak': 2},
+                 achievements={"first_quiz"}, history=[entry], cards=[card])
+
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            store.flush()
+        # Recorded while the first flush was failing; must land after the requeued history
+        store.record(USER, deltas={'xp': 20}, history=[dict(entry, score=2, percentage=20.0)])
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    store.flush()
+    progress = store.load(USER)
+    assert progress['xp'] == 100 and progress['total_quizzes'] == 1 and progress['study_streak'] == 2
+    assert progress['achievements'] == {"first_quiz"}
+    assert [h['score'] for h in progress['quiz_history']] == [8, 2]
+    assert [c['key'] for c in progress['cards']] == ["k1"]
+    assert sum(r.attempts for (scope, _), r in progress['rollups'].items() if scope == 'topic') == 2
@@ -0,0 +1,31 @@
+"""Leveling, milestone achievements and study streaks"""
+from datetime import date
+
+import pytest
+
+from progression import MILESTONES, level_for, milestone_achievements, next_streak
+
+
+@pytest.mark.parametrize("xp", [0, 10 ** 4, 10 ** 9, 10 ** 18, 10 ** 60], ids=["0", "1e4", "1e9", "1e18", "1e60"])
+def test_level_for(benchmark, xp):
+    level, into_level, needed = benchmark(level_for, xp)
+    assert 0 <= into_level < needed and level >= 1
+
+
+@pytest.mark.parametrize("earned", ["none", "all"])
+def test_milestone_achievements(benchmark, earned):
+    progress = {'total_quizzes': 12, 'study_streak': 8}
+    have = set() if earned == "none" else {achievement for achievement, _, _ in MILESTONES}
+    new = benchmark(milestone_achievements, progress, have)
+    assert len(new) == (len(MILESTONES) if earned == "none" else 0)
+
+
+@pytest.mark.parametrize("last_study_date,expected", [
+    (None, 1),
+    (date(2024, 5, 10), 5),
+    (date(2024, 5, 9), 6),
+    ("2024-05-09", 6),
+    (date(2024, 4, 1), 1),
+], ids=["first", "same-day", "next-day", "next-day-iso", "broken"])
+def test_next_streak(benchmark, last_study_date, expected):
+    assert benchmark(next_streak, 5, last_study_date, date(2024, 5, 10)) == expected
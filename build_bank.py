@@ -0,0 +1,93 @@
+"""Batch-generate quizzes and flashcards into the question bank ahead of time.
+
+Reads a CSV with ``subject,grade_level,topic,difficulty`` columns and generates
+every requested kind for each row on a worker pool, so students are served from
+the bank instead of waiting on the AI provider:
+
+    python build_bank.py topics.csv --questions 10 --flashcards 20 --rounds 3 --workers 8
+
+Each round asks for a fresh set, so several rounds give every student a
+different sample. Uses the same STUDYBUZZ_* settings as the app.
+"""
+import argparse
+import csv
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import streamlit.logger
+
+from study_ai import ITEM_KINDS as KINDS, generate_kind, get_question_bank, subject_context_for
+
+
+def read_topics(path):
+    """Rows of the topics CSV with blank cells filled from the app's defaults"""
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            topic = (row.get('topic') or "").strip()
+            if not topic:
+                continue
+            yield {
+                'subject': (row.get('subject') or "").strip() or "General",
+                'grade_level': (row.get('grade_level') or "").strip() or "High School",
+                'topic': topic,
+                'difficulty': (row.get('difficulty') or "").strip() or "Medium",
+            }
+
+
+def build_one(row, kind, num_questions, num_flashcards):
+    """Generate one fresh set for a topic row; the banked generator stores it"""
+    subject_context = subject_context_for(row['subject'], row['grade_level'])
+    count = num_flashcards if kind == 'flashcards' else num_questions
+    result = generate_kind(kind, row['topic'], count, row['difficulty'], subject_context, share=False)
+    return len(result or [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate study materials into the question bank")
+    parser.add_argument("topics", help="CSV file with subject,grade_level,topic,difficulty columns")
+    parser.add_argument("--kinds", default=",".join(KINDS), help=f"comma-separated subset of {','.join(KINDS)}")
+    parser.add_argument("--questions", type=int, default=10, help="questions per quiz set")
+    parser.add_argument("--flashcards", type=int, default=20, help="cards per flashcard set")
+    parser.add_argument("--rounds", type=int, default=1, help="fresh sets to generate per topic and kind")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent generations")
+    args = parser.parse_args()
+    # Running outside `streamlit run`, so its bare-mode warnings are just noise here
+    streamlit.logger.set_log_level("error")
+
+    kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+    unknown = set(kinds) - set(KINDS)
+    if unknown:
+        parser.error(f"unknown kinds: {', '.join(sorted(unknown))}")
+
+    rows = list(read_topics(args.topics))
+    jobs = [(row, kind) for row in rows for kind in kinds for _ in range(args.rounds)]
+    bank = get_question_bank()
+    before = bank.stats()['items']
+    print(f"Building {len(jobs)} sets for {len(rows)} topics with {args.workers} workers")
+
+    start = time.time()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(build_one, row, kind, args.questions, args.flashcards): (row, kind)
+                   for row, kind in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            row, kind = futures[future]
+            try:
+                items = future.result()
+            except Exception as exc:
+                items, error = 0, exc
+            else:
+                error = None if items else "no items generated"
+            if error:
+                failed += 1
+            status = f"{items} items" if not error else f"FAILED ({error})"
+            print(f"[{done}/{len(jobs)}] {row['topic']} / {row['difficulty']} / {kind}: {status}")
+
+    added = bank.stats()['items'] - before
+    print(f"Added {added} new items in {time.time() - start:.1f}s ({failed} failed sets)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
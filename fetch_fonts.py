@@ -0,0 +1,44 @@
+"""Download the app's font into static/fonts so it is served locally.
+
+    python fetch_fonts.py
+
+Space Grotesk is licensed under the SIL Open Font License. Run this once when
+building a deployment (or commit the file it downloads); the theme stylesheets
+only point at the file once it is there; until then the app uses an installed
+copy or the system sans-serif. Restart the app after fetching.
+"""
+import os
+import sys
+import urllib.request
+
+from theme_assets import STATIC_DIR
+
+FONTS = {
+    'SpaceGrotesk.ttf': "https://github.com/google/fonts/raw/main/ofl/spacegrotesk/SpaceGrotesk%5Bwght%5D.ttf",
+}
+
+
+def main():
+    font_dir = os.path.join(STATIC_DIR, "fonts")
+    os.makedirs(font_dir, exist_ok=True)
+    failed = 0
+    for name, url in FONTS.items():
+        path = os.path.join(font_dir, name)
+        if os.path.exists(path):
+            print(f"{name}: already present")
+            continue
+        try:
+            with urllib.request.urlopen(url, timeout=60) as response:
+                data = response.read()
+        except OSError as exc:
+            failed += 1
+            print(f"{name}: FAILED ({exc})")
+            continue
+        with open(path, "wb") as f:
+            f.write(data)
+        print(f"{name}: {len(data) // 1024} KB")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def normalize_text(value):
+    """Lowercase and collapse whitespace so trivially different inputs share a key"""
+    if value is None:
+        return ""
+    return " ".join(str(value).split()).lower()
+
+
+def make_key(generator, topic, difficulty, count, subject_context, prompt_version):
+    """Build a content address for one generation request"""
+    parts = [
+        normalize_text(generator),
+        normalize_text(topic),
+        normalize_text(difficulty),
+        "" if count is None else str(int(count)),
+        normalize_text(subject_context),
+        str(prompt_version),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """SQLite-backed cache for generated study materials with LRU/size eviction and TTLs"""
+
+    def __init__(self, path, max_entries=5000, max_bytes=50 * 1024 * 1024, default_ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                generator TEXT NOT NULL,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[1] is not None and row[1] <= now:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._bump("misses")
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._bump("hits")
+        return json.loads(row[0])
+
+    def set(self, key, generator, value, ttl=None):
+        """Store a JSON-serializable value and evict old entries if over budget"""
+        payload = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, generator, value, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, generator, payload, len(payload), now, expires_at, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        self._bump("evictions", evicted)
+
+    def _bump(self, name, amount=1):
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters").fetchall())
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get("evictions", 0),
+            'hit_rate': (hits / lookups) if lookups else 0.0,
+            'entries': entries,
+            'bytes': total,
+        }
+
+    def clear(self):
+        """Remove every cached entry (counters are kept)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
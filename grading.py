@@ -0,0 +1,145 @@
+import re
+import unicodedata
+from collections import namedtuple
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from study_items import UNANSWERED, FillBlank, MultipleChoice, TrueFalse
+
+# Similarity (0-1) at which a fill-in-the-blank answer with a typo still counts
+FUZZY_THRESHOLD = 0.85
+# Shorter answers must match exactly once normalized; one typo there is a different word
+FUZZY_MIN_LENGTH = 5
+# XP per correct answer, and the bonus for a perfect score
+XP_PER_CORRECT = 10
+PERFECT_SCORE_XP = 50
+_ARTICLES = re.compile(r"^(?:a|an|the)\s+")
+_NON_WORD = re.compile(r"[^\w\s]")
+
+# marks: bool (students x questions); scores: correct answers per student;
+# percentages: scores out of 100; answered: answered questions per student
+BatchGrades = namedtuple('BatchGrades', ['marks', 'scores', 'percentages', 'answered'])
+# Per question: difficulty is the share of students who got it right; discrimination is
+# the correlation between getting it right and the rest of the score (NaN when undefined);
+# option_counts[q, 0] counts blanks and [q, k] picks of option k-1 (None for fill-in)
+ItemAnalysis = namedtuple('ItemAnalysis', ['difficulty', 'discrimination', 'option_counts'])
+
+
+def normalize_answer(text):
+    """Lowercase, accent-free, punctuation-free text without a leading article"""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = " ".join(_NON_WORD.sub(" ", text).split())
+    return _ARTICLES.sub("", text)
+
+
+def answers_match(given, expected, threshold=FUZZY_THRESHOLD):
+    """Whether a normalized answer matches a normalized expected one, allowing small typos in words"""
+    if not given:
+        return False
+    if given == expected:
+        return True
+    if (threshold >= 1 or len(expected) < FUZZY_MIN_LENGTH
+            or any(ch.isdigit() for ch in given + expected)):
+        return False
+    return SequenceMatcher(None, given, expected).ratio() >= threshold
+
+
+def quiz_xp(correct, total):
+    """XP earned for a graded quiz"""
+    return correct * XP_PER_CORRECT + (PERFECT_SCORE_XP if total and correct == total else 0)
+
+
+class AnswerKey:
+    """The correct answers to one quiz, in the form the batch grader compares against.
+
+    Choice questions (multiple choice and true/false) keep the correct option index,
+    or 1/0, in an int8 array; fill-in-the-blank keeps each normalized answer.
+    """
+
+    def __init__(self, questions):
+        questions = list(questions)
+        self.size = len(questions)
+        self.text = bool(questions) and isinstance(questions[0], FillBlank)
+        if self.text:
+            self.expected = [normalize_answer(q.answer) for q in questions]
+            self.correct = None
+            self.num_options = None
+        else:
+            self.expected = None
+            self.correct = np.array([choice_answer(q) for q in questions], dtype=np.int8)
+            self.num_options = np.array([len(q.options) if isinstance(q, MultipleChoice) else 2
+                                         for q in questions], dtype=np.int8)
+
+    def responses(self, sheets):
+        """Stack AnswerSheets into a response matrix: int8 choices, or rows of text answers"""
+        if self.text:
+            return [list(sheet.texts) for sheet in sheets]
+        matrix = np.empty((len(sheets), self.size), dtype=np.int8)
+        for row, sheet in zip(matrix, sheets):
+            row[:] = np.frombuffer(sheet.choices, dtype=np.int8)
+        return matrix
+
+
+def choice_answer(q):
+    if isinstance(q, TrueFalse):
+        return int(q.answer)
+    return q.correct
+
+
+def grade_batch(key, responses, threshold=FUZZY_THRESHOLD):
+    """Grade a whole class at once; responses come from AnswerKey.responses or build the same shapes"""
+    if key.text:
+        marks, answered = _grade_text(key, responses, threshold)
+    else:
+        responses = np.asarray(responses, dtype=np.int8).reshape(len(responses), key.size)
+        marks = responses == key.correct
+        answered = (responses != UNANSWERED).sum(axis=1)
+    scores = marks.sum(axis=1)
+    percentages = scores * 100.0 / key.size if key.size else np.zeros(len(scores))
+    return BatchGrades(marks, scores, percentages, answered)
+
+
+def _grade_text(key, responses, threshold):
+    marks = np.zeros((len(responses), key.size), dtype=bool)
+    answered = np.zeros(len(responses), dtype=np.int64)
+    for col, expected in enumerate(key.expected):
+        # A class gives few distinct answers per blank; match each of them once
+        verdicts = {}
+        for row, answer in enumerate(responses):
+            given = answer[col]
+            if given is None or not str(given).strip():
+                continue
+            answered[row] += 1
+            if given not in verdicts:
+                verdicts[given] = answers_match(normalize_answer(given), expected, threshold)
+            marks[row, col] = verdicts[given]
+    return marks, answered
+
+
+def item_analysis(key, responses, grades):
+    """Per-question difficulty, discrimination and (for choice questions) how often each option was picked"""
+    marks = grades.marks.astype(np.float64).reshape(-1, key.size)
+    if not len(marks):
+        difficulty = discrimination = np.full(key.size, np.nan)
+    else:
+        difficulty = marks.mean(axis=0)
+        # Corrected item-total correlation: each question against the score on the others
+        rest = grades.scores[:, None] - marks
+        marks_dev = marks - difficulty
+        rest_dev = rest - rest.mean(axis=0)
+        spread = np.sqrt((marks_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            discrimination = np.where(spread > 0, (marks_dev * rest_dev).sum(axis=0) / spread, np.nan)
+
+    option_counts = None
+    if not key.text:
+        width = int(key.num_options.max()) + 1 if key.size else 1
+        responses = np.asarray(responses, dtype=np.int8).reshape(len(responses), key.size)
+        # Offset each question's options into its own block so one bincount counts them all;
+        # anything but a valid option index counts as a blank
+        picked = (responses >= 0) & (responses < key.num_options)
+        cells = np.where(picked, responses.astype(np.int64) + 1, 0) + np.arange(key.size) * width
+        option_counts = np.bincount(cells.ravel(), minlength=key.size * width).reshape(key.size, width)
+    return ItemAnalysis(difficulty, discrimination, option_counts)
@@ -0,0 +1,142 @@
+import re
+import threading
+
+OPTION_LETTERS = ("A", "B", "C", "D")
+BLANK = "_____"
+
+# Option keys like "A", "b)" or "(C)"
+_OPTION_KEY = re.compile(r"\(?([A-Da-d])[).:]?")
+# "A) " / "b. " prefixes models sometimes repeat inside list options
+_OPTION_PREFIX = re.compile(r"\(?[A-Da-d][).:]\s+")
+# A correct answer given as "B", "b)", "B. Paris" or "Option B"
+_CORRECT_LETTER = re.compile(r"(?:option\s+)?\(?([A-D])(?:[).:]|\s|$)", re.I)
+# Blank markers used instead of the five underscores the prompt asks for
+_BLANK_MARKER = re.compile(r"_{2,}|[\[({]\s*blank\s*[\])}]", re.I)
+_TRUE_FALSE_WORDS = {'true': True, 'false': False}
+
+
+def _text(value):
+    """Stripped text of a string (or number) field; "" for anything else"""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return ""
+
+
+def check_multiple_choice(item):
+    question = _text(item.get('question'))
+    options = item.get('options')
+    if isinstance(options, list) and len(options) == len(OPTION_LETTERS):
+        options = {letter: _OPTION_PREFIX.sub("", _text(text), count=1)
+                   for letter, text in zip(OPTION_LETTERS, options)}
+    elif isinstance(options, dict) and len(options) == len(OPTION_LETTERS):
+        keyed = {}
+        for key, text in options.items():
+            match = _OPTION_KEY.fullmatch(_text(key))
+            if match:
+                keyed[match.group(1).upper()] = _text(text)
+        options = {letter: keyed[letter] for letter in OPTION_LETTERS if letter in keyed}
+    else:
+        return None
+    if not question or len(options) != len(OPTION_LETTERS) or not all(options.values()):
+        return None
+    if len({text.lower() for text in options.values()}) != len(options):
+        return None
+
+    correct = _text(item.get('correct'))
+    # The answer's text instead of its letter, else a letter with some decoration
+    by_text = next((letter for letter, text in options.items() if text.lower() == correct.lower()), None)
+    match = _CORRECT_LETTER.match(correct)
+    correct = by_text or (match.group(1).upper() if match else None)
+    if correct not in options:
+        return None
+    return {'question': question, 'options': options, 'correct': correct}
+
+
+def check_true_false(item):
+    statement = _text(item.get('statement'))
+    answer = item.get('answer')
+    if isinstance(answer, str):
+        answer = _TRUE_FALSE_WORDS.get(answer.strip().lower())
+    elif answer in (0, 1) and not isinstance(answer, bool):
+        answer = bool(answer)
+    if not statement or not isinstance(answer, bool):
+        return None
+    return {'statement': statement, 'answer': answer}
+
+
+def check_fill_blank(item):
+    sentence = _text(item.get('sentence'))
+    answer = _text(item.get('answer'))
+    if not sentence or not answer:
+        return None
+    blanks = _BLANK_MARKER.findall(sentence)
+    if not blanks:
+        # The sentence gives the answer away; blank it out if it appears exactly once
+        answer_word = re.compile(rf"(?<!\w){re.escape(answer)}(?!\w)", re.I)
+        if len(answer_word.findall(sentence)) != 1:
+            return None
+        sentence = answer_word.sub(BLANK, sentence)
+    elif len(blanks) == 1:
+        sentence = _BLANK_MARKER.sub(BLANK, sentence)
+    else:
+        return None
+    return {'sentence': sentence, 'answer': answer}
+
+
+def check_flashcard(item):
+    front = _text(item.get('front')) or _text(item.get('term'))
+    back = _text(item.get('back')) or _text(item.get('definition'))
+    if not front or not back:
+        return None
+    return {'front': front, 'back': back}
+
+
+CHECKS = {
+    'multiple_choice': check_multiple_choice,
+    'true_false': check_true_false,
+    'fill_blank': check_fill_blank,
+    'flashcards': check_flashcard,
+}
+
+
+def validate_item(kind, item):
+    """(item, outcome) for one generated item: the item as is ("valid"), fixed up ("repaired") or None ("dropped")"""
+    checked = CHECKS[kind](item) if isinstance(item, dict) else None
+    if checked is None:
+        return None, "dropped"
+    # Compare types too: 1 == True, but an answer of 1 still had to be repaired
+    if any(type(item.get(field)) is not type(value) or item.get(field) != value
+           for field, value in checked.items()):
+        return checked, "repaired"
+    return item, "valid"
+
+
+class ItemStats:
+    """Thread-safe counts of generated items that were valid, repaired or dropped"""
+
+    OUTCOMES = ("valid", "repaired", "dropped")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.OUTCOMES, 0)
+        self.top_ups = 0
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def record_top_up(self):
+        """One extra request made to replace dropped or duplicate items"""
+        with self._lock:
+            self.top_ups += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = sum(self._counts.values())
+            snapshot = dict(self._counts)
+            snapshot['total'] = total
+            snapshot['top_ups'] = self.top_ups
+            snapshot['kept_rate'] = ((total - self._counts["dropped"]) / total) if total else 1.0
+            return snapshot
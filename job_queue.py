@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class QueueFullError(Exception):
+    """Raised by JobQueue.submit when the queue already holds max_queued jobs"""
+
+
+class Job:
+    """One submitted call and, once it has run, its result or error"""
+
+    __slots__ = ('id', 'label', 'func', 'args', 'kwargs', 'status', 'result', 'error',
+                 'submitted_at', 'started_at', 'finished_at', 'finished')
+
+    def __init__(self, label, func, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def snapshot(self):
+        """JSON-ready view of the job"""
+        snapshot = {'id': self.id, 'label': self.label, 'status': self.status,
+                    'submitted_at': self.submitted_at, 'started_at': self.started_at,
+                    'finished_at': self.finished_at}
+        if self.status == 'done':
+            snapshot['result'] = self.result
+        elif self.status == 'failed':
+            snapshot['error'] = self.error
+        return snapshot
+
+
+class JobQueue:
+    """Bounded FIFO of jobs run by a fixed pool of worker threads, with results kept for polling.
+
+    ``submit`` never blocks: once ``max_queued`` jobs are waiting it raises QueueFullError
+    so callers can push back instead of piling up work. The newest ``keep_finished``
+    finished jobs stay available to ``get``; older ones are forgotten.
+    """
+
+    def __init__(self, workers=4, max_queued=100, keep_finished=1000):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._counts = dict.fromkeys(STATUSES, 0)
+        self.rejected = 0
+        self._threads = [threading.Thread(target=self._run, name=f"studybuzz-job-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, label, func, *args, **kwargs):
+        """Queue func(*args, **kwargs); returns the Job"""
+        job = Job(label, func, args, kwargs)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise QueueFullError(f"{self.max_queued} jobs already queued") from None
+            self._jobs[job.id] = job
+            self._counts['queued'] += 1
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """Wait up to timeout seconds for a job to finish; returns whether it did"""
+        return job.finished.wait(timeout)
+
+    def stats(self):
+        """Jobs queued and running now, jobs done and failed so far, and submissions rejected"""
+        with self._lock:
+            stats = dict(self._counts)
+            stats.update(workers=self.workers, max_queued=self.max_queued, rejected=self.rejected)
+            return stats
+
+    def _set_status(self, job, status):
+        with self._lock:
+            self._counts[job.status] -= 1
+            self._counts[status] += 1
+            job.status = status
+            if status in ('done', 'failed'):
+                self._finished[job.id] = job
+                while len(self._finished) > self.keep_finished:
+                    old_id, _ = self._finished.popitem(last=False)
+                    self._jobs.pop(old_id, None)
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            self._set_status(job, 'running')
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+                status = 'done'
+            except Exception as exc:
+                job.error = f"{type(exc).__name__}: {exc}"
+                status = 'failed'
+            job.finished_at = time.time()
+            job.func = job.args = job.kwargs = None
+            self._set_status(job, status)
+            job.finished.set()
+            self._queue.task_done()
@@ -0,0 +1,131 @@
+import json
+import re
+import threading
+
+ITEM_KEYS = ("questions", "flashcards")
+
+
+class JsonItemStream:
+    """Incremental parser that yields each complete object of a streamed JSON item array.
+
+    The array is the value of the first of ``keys`` found in the stream (e.g.
+    ``{"questions": [...]}``), or a bare top-level array. Text before the array,
+    such as a ```json fence, is ignored.
+    """
+
+    def __init__(self, keys=ITEM_KEYS):
+        self._start_re = re.compile(r'"(?:%s)"\s*:\s*\[' % "|".join(re.escape(k) for k in keys))
+        self.key = None
+        self.count = 0
+        self.closed = False
+        self._buffer = ""
+        self._pos = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._item_start = None
+
+    def feed(self, text):
+        """Consume more text and return the list of items completed by it"""
+        self._buffer += text
+        if self._pos is None and not self._find_array():
+            return []
+
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer) and not self.closed:
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._item_start = i
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the item array itself
+                    self.closed = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0 and self._item_start is not None:
+                        item = self._decode(buffer[self._item_start:i + 1])
+                        if item is not None:
+                            items.append(item)
+                        self._item_start = None
+            i += 1
+
+        # Drop consumed text so long streams do not rescan from the start
+        keep_from = self._item_start if self._item_start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._item_start is not None:
+            self._item_start = 0
+        self._pos = i - keep_from
+        return items
+
+    def _find_array(self):
+        match = self._start_re.search(self._buffer)
+        if match:
+            self.key = match.group(0)[1:].split('"', 1)[0]
+            start = match.end()
+        else:
+            stripped = self._buffer.lstrip()
+            if stripped.startswith("```"):
+                stripped = stripped.split("\n", 1)[1].lstrip() if "\n" in stripped else ""
+            if not stripped.startswith("["):
+                return False
+            start = len(self._buffer) - len(stripped) + 1
+        self._buffer = self._buffer[start:]
+        self._pos = 0
+        return True
+
+    def _decode(self, text):
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        self.count += 1
+        return item
+
+
+def salvage_items(content, keys=ITEM_KEYS):
+    """Recover every complete item from a (possibly truncated) JSON item array.
+
+    Returns ``(key, items)``; ``key`` is None when no keyed array was found.
+    """
+    parser = JsonItemStream(keys)
+    items = parser.feed(content)
+    return parser.key, items
+
+
+class ParseStats:
+    """Thread-safe counts of how JSON completions were parsed (clean, salvaged, repaired, failed)"""
+
+    OUTCOMES = ("parsed", "salvaged", "repaired", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.OUTCOMES, 0)
+        self.truncated = 0
+
+    def record(self, outcome, truncated=False):
+        with self._lock:
+            self._counts[outcome] += 1
+            if truncated:
+                self.truncated += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = sum(self._counts.values())
+            snapshot = dict(self._counts)
+            snapshot['total'] = total
+            snapshot['truncated'] = self.truncated
+            snapshot['repair_rate'] = ((self._counts["salvaged"] + self._counts["repaired"]) / total) if total else 0.0
+            return snapshot
@@ -0,0 +1,134 @@
+import functools
+import random
+import re
+import threading
+import zlib
+
+# Mersenne prime larger than any 32-bit word hash, for the MinHash permutations
+_PRIME = (1 << 61) - 1
+
+
+STOPWORDS = frozenset("""
+a an the of in on at to for from by with about as into through during over under between
+and or but if then than so that this these those it its is are was were be been being
+do does did has have had can could will would should may might must shall
+what which who whom whose when where why how there here
+""".split())
+
+
+def content_words(text):
+    """Words that carry meaning, lowercased, with stopwords dropped and plurals folded"""
+    words = set()
+    for word in re.findall(r"[^\W_]+", str(text).lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.add(word)
+    return words
+
+
+@functools.lru_cache(maxsize=None)
+def _permutations(num_perm, seed):
+    rng = random.Random(seed)
+    return tuple((rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm))
+
+
+class NearDuplicateIndex:
+    """MinHash/LSH index that finds texts which are rewordings of ones already added.
+
+    Each text gets a ``num_perm`` MinHash signature over its content words. The
+    signature is split into ``bands`` buckets for locality-sensitive lookup, and
+    candidates count as duplicates when the Jaccard similarity of their content words
+    reaches ``threshold``. Texts that mention different numbers ("Chapter 3" vs "Chapter 4")
+    are never duplicates. When either text has fewer than ``min_words`` content words,
+    only the same words count: one extra word on a short flashcard front
+    ("Photosynthesis" vs "Photosynthesis equation") makes a different card, not a
+    rewording. Lookups touch only the matching buckets, so they stay fast no matter
+    how many texts are stored.
+    """
+
+    def __init__(self, threshold=0.5, num_perm=64, bands=32, seed=1, min_words=4):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.min_words = min_words
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._perms = _permutations(num_perm, seed)
+        self._lock = threading.Lock()
+        self._signatures = {}
+        self._words = {}
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def signature(self, text):
+        """(MinHash signature, content words) for a text, or None if it has no content words"""
+        words = frozenset(content_words(text))
+        if not words:
+            return None
+        hashes = [zlib.crc32(word.encode("utf-8")) for word in words]
+        return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in self._perms), words
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[i * rows:(i + 1) * rows] for i in range(self.bands)]
+
+    def _find(self, signature, words):
+        candidates = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(band.get(key, ()))
+        numbers = {word for word in words if word.isdigit()}
+        short = len(words) < self.min_words
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            other = self._words[candidate]
+            if numbers != {word for word in other if word.isdigit()}:
+                continue
+            if (short or len(other) < self.min_words) and words != other:
+                continue
+            score = len(words & other) / len(words | other)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def find(self, text):
+        """Key of the stored text most similar to ``text``, or None if nothing is close enough"""
+        signed = self.signature(text)
+        if signed is None:
+            return None
+        with self._lock:
+            return self._find(*signed)
+
+    def add(self, text, key=None):
+        """Store ``text`` unless it near-duplicates a stored text; returns True if it was stored.
+
+        Text with nothing to compare (empty or only stopwords) is never a duplicate.
+        """
+        signed = self.signature(text)
+        if signed is None:
+            return True
+        signature, words = signed
+        with self._lock:
+            if self._find(signature, words) is not None:
+                return False
+            key = key if key is not None else len(self._signatures)
+            self._signatures[key] = signature
+            self._words[key] = words
+            for band, band_key in zip(self._buckets, self._band_keys(signature)):
+                band.setdefault(band_key, []).append(key)
+            return True
+
+    def copy(self):
+        """Independent snapshot, e.g. to hand to a worker thread"""
+        clone = NearDuplicateIndex.__new__(NearDuplicateIndex)
+        with self._lock:
+            clone.__dict__.update(self.__dict__)
+            clone._lock = threading.Lock()
+            clone._signatures = dict(self._signatures)
+            clone._words = dict(self._words)
+            clone._buckets = [{key: list(keys) for key, keys in band.items()} for band in self._buckets]
+        return clone
@@ -0,0 +1,306 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+
+from quiz_stats import TREND_WEIGHT, Rollup, rollup_keys
+
+# Counters that only ever grow; concurrent sessions add to them instead of overwriting
+ADDITIVE_FIELDS = ('xp', 'total_quizzes', 'total_correct', 'total_questions')
+# Values where the latest write wins
+LATEST_FIELDS = ('study_streak', 'last_study_date')
+
+
+class ProgressStore:
+    """Durable per-user progress in a WAL-mode SQLite file, written behind a background buffer.
+
+    ``record`` only merges changes into an in-memory buffer; a daemon thread writes the
+    buffer in one transaction every ``flush_interval`` seconds or when ``request_flush``
+    is called. Counters are stored as deltas, so many sessions (even for the same
+    user) can write at once without losing updates.
+    """
+
+    def __init__(self, path, flush_interval=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._pending = {}
+        self._wake = threading.Event()
+        self.flushes = 0
+        self.rows_written = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                user_id TEXT PRIMARY KEY,
+                xp INTEGER NOT NULL DEFAULT 0,
+                total_quizzes INTEGER NOT NULL DEFAULT 0,
+                total_correct INTEGER NOT NULL DEFAULT 0,
+                total_questions INTEGER NOT NULL DEFAULT 0,
+                study_streak INTEGER NOT NULL DEFAULT 0,
+                last_study_date TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS achievements (
+                user_id TEXT NOT NULL,
+                achievement TEXT NOT NULL,
+                earned_at REAL NOT NULL,
+                PRIMARY KEY (user_id, achievement)
+            );
+            CREATE TABLE IF NOT EXISTS quiz_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                topic TEXT,
+                score INTEGER NOT NULL,
+                total INTEGER NOT NULL,
+                percentage REAL NOT NULL,
+                taken_at TEXT NOT NULL,
+                subject TEXT,
+                mode TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_quiz_history_user_date ON quiz_history(user_id, taken_at);
+            CREATE INDEX IF NOT EXISTS idx_quiz_history_date ON quiz_history(taken_at);
+            CREATE TABLE IF NOT EXISTS rollups (
+                user_id TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                correct INTEGER NOT NULL,
+                questions INTEGER NOT NULL,
+                best REAL NOT NULL,
+                recent REAL NOT NULL,
+                PRIMARY KEY (user_id, scope, key)
+            );
+            CREATE TABLE IF NOT EXISTS cards (
+                user_id TEXT NOT NULL,
+                card_key TEXT NOT NULL,
+                topic TEXT,
+                front TEXT NOT NULL,
+                back TEXT NOT NULL,
+                ease REAL NOT NULL,
+                interval REAL NOT NULL,
+                due REAL NOT NULL,
+                reps INTEGER NOT NULL,
+                lapses INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (user_id, card_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_cards_user_due ON cards(user_id, due);
+        """)
+        # Databases created before history kept subject and mode have no rollups yet
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(quiz_history)")}
+        if 'mode' not in columns:
+            self._conn.execute("ALTER TABLE quiz_history ADD COLUMN subject TEXT")
+            self._conn.execute("ALTER TABLE quiz_history ADD COLUMN mode TEXT")
+            self._backfill_rollups()
+
+        self._thread = threading.Thread(target=self._run, name="studybuzz-progress", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _backfill_rollups(self):
+        rollups = {}
+        for user_id, topic, score, total, taken_at in self._conn.execute(
+                "SELECT user_id, topic, score, total, taken_at FROM quiz_history ORDER BY id"):
+            entry = {'topic': topic, 'date': taken_at}
+            for scope, key in rollup_keys(entry):
+                rollups.setdefault((user_id, scope, key), Rollup()).add(score, total)
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO rollups (user_id, scope, key, attempts, correct, questions, best, recent) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [key + (r.attempts, r.correct, r.questions, r.best, r.recent) for key, r in rollups.items()],
+        )
+
+    def load(self, user_id, history_limit=None):
+        """Read a user's saved progress (empty progress for a new user)"""
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT xp, total_quizzes, total_correct, total_questions, study_streak, last_study_date "
+                "FROM profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            achievements = {a for (a,) in self._conn.execute(
+                "SELECT achievement FROM achievements WHERE user_id = ?", (user_id,))}
+            query = ("SELECT topic, score, total, percentage, taken_at, subject, mode FROM quiz_history "
+                     "WHERE user_id = ? ORDER BY taken_at DESC, id DESC")
+            params = (user_id,)
+            if history_limit:
+                query += " LIMIT ?"
+                params += (history_limit,)
+            history = [
+                {'topic': topic, 'score': score, 'total': total, 'percentage': percentage, 'date': taken_at,
+                 'subject': subject, 'mode': mode}
+                for topic, score, total, percentage, taken_at, subject, mode in self._conn.execute(query, params)
+            ]
+            rollups = {
+                (scope, key): Rollup(attempts, correct, questions, best, recent)
+                for scope, key, attempts, correct, questions, best, recent in self._conn.execute(
+                    "SELECT scope, key, attempts, correct, questions, best, recent FROM rollups WHERE user_id = ?",
+                    (user_id,))
+            }
+            cards = {
+                card_key: {'key': card_key, 'topic': topic, 'front': front, 'back': back, 'ease': ease,
+                           'interval': interval, 'due': due, 'reps': reps, 'lapses': lapses}
+                for card_key, topic, front, back, ease, interval, due, reps, lapses in self._conn.execute(
+                    "SELECT card_key, topic, front, back, ease, interval, due, reps, lapses FROM cards "
+                    "WHERE user_id = ? ORDER BY due", (user_id,))
+            }
+            # Changes still waiting in the write-behind buffer are part of the user's progress.
+            # Read under the DB lock so a concurrent flush cannot move them in between.
+            with self._lock:
+                pending = self._pending.get(user_id)
+                pending = {
+                    'deltas': dict(pending['deltas']),
+                    'fields': dict(pending['fields']),
+                    'achievements': set(pending['achievements']),
+                    'history': [dict(entry) for entry in pending['history']],
+                    'cards': {key: dict(card) for key, card in pending['cards'].items()},
+                } if pending else None
+        history.reverse()
+
+        progress = dict.fromkeys(ADDITIVE_FIELDS, 0)
+        progress.update({'study_streak': 0, 'last_study_date': None})
+        if row is not None:
+            progress.update(zip(ADDITIVE_FIELDS + LATEST_FIELDS, row))
+        progress['achievements'] = achievements
+        progress['quiz_history'] = history
+        progress['rollups'] = rollups
+        if pending:
+            cards.update(pending['cards'])
+            for field, delta in pending['deltas'].items():
+                progress[field] += delta
+            progress.update(pending['fields'])
+            progress['achievements'] |= pending['achievements']
+            progress['quiz_history'].extend(pending['history'])
+            for entry in pending['history']:
+                for scope_key in rollup_keys(entry):
+                    rollups.setdefault(scope_key, Rollup()).add(entry['score'], entry['total'])
+        progress['cards'] = list(cards.values())
+        return progress
+
+    def record(self, user_id, deltas=None, fields=None, achievements=(), history=(), cards=()):
+        """Buffer progress changes for the next flush; never touches the disk.
+
+        ``cards`` are flashcard review states keyed by ``card['key']``; repeated reviews of
+        a card before a flush collapse into one row.
+        """
+        with self._lock:
+            self._merge(user_id, deltas, fields, achievements, history, cards)
+
+    def _merge(self, user_id, deltas=None, fields=None, achievements=(), history=(), cards=()):
+        # Caller holds self._lock
+        pending = self._pending.setdefault(
+            user_id, {'deltas': {}, 'fields': {}, 'achievements': set(), 'history': [], 'cards': {}})
+        for field, delta in (deltas or {}).items():
+            pending['deltas'][field] = pending['deltas'].get(field, 0) + delta
+        pending['fields'].update(fields or {})
+        pending['achievements'].update(achievements)
+        pending['history'].extend(history)
+        cards = cards.values() if isinstance(cards, dict) else cards
+        pending['cards'].update((card['key'], card) for card in cards)
+
+    def _requeue(self, pending):
+        """Put changes a failed flush took back ahead of any recorded since, so the next flush retries them"""
+        with self._lock:
+            newer, self._pending = self._pending, pending
+            for user_id, changes in newer.items():
+                self._merge(user_id, **changes)
+
+    def request_flush(self):
+        """Ask the background writer to flush now without waiting for it"""
+        self._wake.set()
+
+    def flush(self):
+        """Write every buffered change in a single transaction"""
+        now = time.time()
+        rows = 0
+        with self._db_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                for user_id, changes in pending.items():
+                    deltas = changes['deltas']
+                    self._conn.execute(
+                        "INSERT INTO profiles (user_id, xp, total_quizzes, total_correct, total_questions, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(user_id) DO UPDATE SET "
+                        "xp = xp + excluded.xp, "
+                        "total_quizzes = total_quizzes + excluded.total_quizzes, "
+                        "total_correct = total_correct + excluded.total_correct, "
+                        "total_questions = total_questions + excluded.total_questions, "
+                        "updated_at = excluded.updated_at",
+                        (user_id,) + tuple(deltas.get(field, 0) for field in ADDITIVE_FIELDS) + (now,),
+                    )
+                    fields = {field: value for field, value in changes['fields'].items() if field in LATEST_FIELDS}
+                    if fields:
+                        assignments = ", ".join(f"{field} = ?" for field in fields)
+                        self._conn.execute(
+                            f"UPDATE profiles SET {assignments} WHERE user_id = ?",
+                            tuple(fields.values()) + (user_id,),
+                        )
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO achievements (user_id, achievement, earned_at) VALUES (?, ?, ?)",
+                        [(user_id, achievement, now) for achievement in changes['achievements']],
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO quiz_history (user_id, topic, score, total, percentage, taken_at, subject, mode) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(user_id, entry.get('topic'), entry['score'], entry['total'], entry['percentage'],
+                          entry['date'], entry.get('subject'), entry.get('mode')) for entry in changes['history']],
+                    )
+                    # Rollups are updated in place, in history order, so concurrent writers never clobber them
+                    rollup_rows = [
+                        (user_id, scope, key, entry['score'], entry['total'], entry['percentage'], entry['percentage'])
+                        for entry in changes['history'] for scope, key in rollup_keys(entry)
+                    ]
+                    self._conn.executemany(
+                        "INSERT INTO rollups (user_id, scope, key, attempts, correct, questions, best, recent) "
+                        "VALUES (?, ?, ?, 1, ?, ?, ?, ?) "
+                        "ON CONFLICT(user_id, scope, key) DO UPDATE SET "
+                        "attempts = attempts + 1, "
+                        "correct = correct + excluded.correct, "
+                        "questions = questions + excluded.questions, "
+                        "best = MAX(best, excluded.best), "
+                        f"recent = recent * {1 - TREND_WEIGHT!r} + excluded.recent * {TREND_WEIGHT!r}",
+                        rollup_rows,
+                    )
+                    self._conn.executemany(
+                        "INSERT INTO cards (user_id, card_key, topic, front, back, ease, interval, due, reps, lapses, "
+                        "updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(user_id, card_key) DO UPDATE SET "
+                        "ease = excluded.ease, interval = excluded.interval, due = excluded.due, "
+                        "reps = excluded.reps, lapses = excluded.lapses, updated_at = excluded.updated_at",
+                        [(user_id, card['key'], card.get('topic'), card['front'], card['back'], card['ease'],
+                          card['interval'], card['due'], card['reps'], card['lapses'], now)
+                         for card in changes['cards'].values()],
+                    )
+                    rows += (1 + len(changes['achievements']) + len(changes['history']) + len(rollup_rows)
+                             + len(changes['cards']))
+                self._conn.execute("COMMIT")
+            except Exception:
+                # Requeue before anything else can raise; BEGIN may have failed (another
+                # writer holds the lock), leaving no transaction to roll back
+                self._requeue(pending)
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        self.flushes += 1
+        self.rows_written += rows
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass
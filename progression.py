@@ -0,0 +1,54 @@
+from datetime import date, timedelta
+
+# XP to go from level 1 to 2; each later level needs LEVEL_GROWTH times the one before
+LEVEL_BASE_XP = 100
+LEVEL_GROWTH = 1.5
+
+ACHIEVEMENTS = {
+    'first_quiz': {'name': '🎯 First Quiz', 'desc': 'Complete your first quiz', 'xp': 50},
+    'perfect_score': {'name': '⭐ Perfect Score', 'desc': 'Get 100% on a quiz', 'xp': 100},
+    'quiz_master': {'name': '🏆 Quiz Master', 'desc': 'Complete 10 quizzes', 'xp': 200},
+    'streak_3': {'name': '🔥 On Fire', 'desc': '3 day study streak', 'xp': 150},
+    'streak_7': {'name': '💪 Dedicated', 'desc': '7 day study streak', 'xp': 300},
+    'flash_50': {'name': '🎴 Card Shark', 'desc': 'Flip 50 flashcards', 'xp': 100},
+    'speed_demon': {'name': '⚡ Speed Demon', 'desc': 'Complete timed quiz with 80%+', 'xp': 150},
+    'explorer': {'name': '🧭 Explorer', 'desc': 'Try all study modes', 'xp': 100},
+}
+
+# Achievements earned by reaching a count: (id, field of the progress, threshold), in award order
+MILESTONES = (
+    ('first_quiz', 'total_quizzes', 1),
+    ('quiz_master', 'total_quizzes', 10),
+    ('streak_3', 'study_streak', 3),
+    ('streak_7', 'study_streak', 7),
+)
+
+
+def level_for(xp):
+    """(level, XP into that level, XP the level needs) for a running XP total"""
+    level = 1
+    xp_needed = LEVEL_BASE_XP
+    while xp >= xp_needed:
+        xp -= xp_needed
+        level += 1
+        xp_needed = int(xp_needed * LEVEL_GROWTH)
+    return level, xp, xp_needed
+
+
+def milestone_achievements(progress, earned):
+    """Milestone achievements reached by progress (a mapping of counts) that are not in earned yet"""
+    return [achievement for achievement, field, threshold in MILESTONES
+            if progress[field] >= threshold and achievement not in earned]
+
+
+def next_streak(streak, last_study_date, today):
+    """The study streak after studying today, given the last study date (a date, ISO string or None)"""
+    if not last_study_date:
+        return 1
+    if isinstance(last_study_date, str):
+        last_study_date = date.fromisoformat(last_study_date[:10])
+    if today == last_study_date:
+        return streak
+    if today - last_study_date == timedelta(days=1):
+        return streak + 1
+    return 1
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from generation_cache import normalize_text
+from near_dup import NearDuplicateIndex
+
+ITEM_TEXT_FIELDS = ('question', 'statement', 'sentence', 'front')
+# Rows drawn per requested item when a student's seen items may filter some out
+SEEN_OVERSAMPLE = 3
+
+
+def item_text(item):
+    """The prompt text of a question or flashcard"""
+    if isinstance(item, dict):
+        for field in ITEM_TEXT_FIELDS:
+            if item.get(field):
+                return str(item[field])
+    return ""
+
+
+def item_fingerprint(item):
+    """Short stable id for an item, shared by rewordings that only differ in case or spacing"""
+    return hashlib.sha1(normalize_text(item_text(item)).encode("utf-8")).hexdigest()[:16]
+
+
+class QuestionBank:
+    """Pre-generated questions and flashcards in a WAL-mode SQLite file, stored one item per row.
+
+    Items are filed under (kind, topic, difficulty, subject context), all normalized,
+    and the unique index on those columns plus the item fingerprint serves lookups and
+    keeps each item in the bank once. Rewordings of a banked item are dropped on
+    ingest using a per-slot NearDuplicateIndex kept in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.near_duplicates = 0
+        self._indexes = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                difficulty TEXT NOT NULL,
+                context TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                UNIQUE (kind, topic, difficulty, context, fingerprint)
+            );
+        """)
+
+    @staticmethod
+    def _slot(kind, topic, difficulty, subject_context):
+        return (kind, normalize_text(topic), normalize_text(difficulty), normalize_text(subject_context))
+
+    def _slot_index(self, slot):
+        index = self._indexes.get(slot)
+        if index is None:
+            index = self._indexes[slot] = NearDuplicateIndex()
+            for (payload,) in self._conn.execute(
+                    "SELECT payload FROM items WHERE kind = ? AND topic = ? AND difficulty = ? AND context = ?", slot):
+                index.add(item_text(json.loads(payload)))
+        return index
+
+    def add(self, kind, topic, difficulty, subject_context, items):
+        """Store new items, skipping ones already banked or reworded; returns how many were added"""
+        slot = self._slot(kind, topic, difficulty, subject_context)
+        now = time.time()
+        with self._lock:
+            index = self._slot_index(slot)
+            rows = []
+            for item in items:
+                if not item_text(item):
+                    continue
+                if not index.add(item_text(item)):
+                    self.near_duplicates += 1
+                    continue
+                rows.append(slot + (item_fingerprint(item), json.dumps(item, separators=(",", ":")), now))
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO items (kind, topic, difficulty, context, fingerprint, payload, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                # The index now holds items that were never stored; rebuild it next time
+                self._indexes.pop(slot, None)
+                raise
+            return self._conn.total_changes - before
+
+    def count(self, kind, topic, difficulty, subject_context):
+        with self._lock:
+            (count,) = self._conn.execute(
+                "SELECT COUNT(*) FROM items WHERE kind = ? AND topic = ? AND difficulty = ? AND context = ?",
+                self._slot(kind, topic, difficulty, subject_context),
+            ).fetchone()
+        return count
+
+    def sample(self, kind, topic, difficulty, subject_context, count, seen=None):
+        """Random ``count`` items none of which near-duplicate one in ``seen``, or None if the bank has too few.
+
+        Ids are drawn from the slot's index first and only the drawn rows are read and
+        decoded, so a lookup costs the same however large the bank grows. With ``seen``,
+        SEEN_OVERSAMPLE times as many are drawn to leave room for the ones it filters out.
+        """
+        limit = count if seen is None else count * SEEN_OVERSAMPLE
+        payloads = {}
+        with self._lock:
+            ids = [row_id for (row_id,) in self._conn.execute(
+                "SELECT id FROM items WHERE kind = ? AND topic = ? AND difficulty = ? AND context = ? "
+                "ORDER BY RANDOM() LIMIT ?",
+                self._slot(kind, topic, difficulty, subject_context) + (limit,),
+            )]
+            if len(ids) >= count:
+                payloads = dict(self._conn.execute(
+                    f"SELECT id, payload FROM items WHERE id IN ({', '.join('?' * len(ids))})", ids))
+        items = []
+        for row_id in ids if payloads else ():
+            item = json.loads(payloads[row_id])
+            if seen is None or seen.find(item_text(item)) is None:
+                items.append(item)
+                if len(items) == count:
+                    break
+        with self._lock:
+            if len(items) < count:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return items
+
+    def stats(self):
+        with self._lock:
+            (items,) = self._conn.execute("SELECT COUNT(*) FROM items").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'items': items,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'near_duplicates': self.near_duplicates,
+            }
@@ -0,0 +1,150 @@
+from array import array
+from datetime import datetime
+
+MODES = ('multiple_choice', 'true_false', 'fill_blank')
+SCOPES = ('topic', 'subject', 'day')
+# Weight of the newest quiz in a rollup's recent accuracy; at 0.5 or more it never counts
+# for less than it does in the lifetime average, so the trend follows the latest result
+TREND_WEIGHT = 0.5
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def rollup_keys(entry):
+    """(scope, key) pairs of the rollups a history entry counts towards"""
+    return (
+        ('topic', entry.get('topic') or "Untitled"),
+        ('subject', entry.get('subject') or "General"),
+        ('day', entry['date'][:10]),
+    )
+
+
+class Rollup:
+    """Running attempts, accuracy, best score and recent trend for one topic, subject or day"""
+
+    __slots__ = ('attempts', 'correct', 'questions', 'best', 'recent')
+
+    def __init__(self, attempts=0, correct=0, questions=0, best=0.0, recent=0.0):
+        self.attempts = attempts
+        self.correct = correct
+        self.questions = questions
+        self.best = best
+        self.recent = recent
+
+    def add(self, score, total):
+        percentage = (score / total * 100) if total else 0.0
+        self.recent = percentage if self.attempts == 0 else (
+            self.recent * (1 - TREND_WEIGHT) + percentage * TREND_WEIGHT)
+        self.attempts += 1
+        self.correct += score
+        self.questions += total
+        self.best = max(self.best, percentage)
+
+    @property
+    def accuracy(self):
+        return (self.correct / self.questions * 100) if self.questions else 0.0
+
+    @property
+    def trend(self):
+        """Recent accuracy minus lifetime accuracy, in percentage points (positive means improving)"""
+        return self.recent - self.accuracy
+
+
+class QuizHistory:
+    """Fixed-capacity ring buffer of quiz results stored as typed columns.
+
+    Topics and subjects are interned to integer ids and timestamps kept as epoch
+    seconds, so an entry costs a few bytes instead of a dict of strings.
+    """
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self.topic_ids = array('I', [0] * capacity)
+        self.subject_ids = array('I', [0] * capacity)
+        self.scores = array('H', [0] * capacity)
+        self.totals = array('H', [0] * capacity)
+        self.timestamps = array('d', [0.0] * capacity)
+        self.modes = array('B', [0] * capacity)
+        self.labels = []
+        self._label_index = {}
+        # Entries ever appended; the newest lives at (appended - 1) % capacity
+        self.appended = 0
+
+    def __len__(self):
+        return min(self.appended, self.capacity)
+
+    def _intern(self, label):
+        label_id = self._label_index.get(label)
+        if label_id is None:
+            label_id = self._label_index[label] = len(self.labels)
+            self.labels.append(label)
+        return label_id
+
+    def append(self, topic, subject, score, total, timestamp, mode=MODES[0]):
+        slot = self.appended % self.capacity
+        self.topic_ids[slot] = self._intern(topic)
+        self.subject_ids[slot] = self._intern(subject)
+        self.scores[slot] = score
+        self.totals[slot] = total
+        self.timestamps[slot] = timestamp
+        self.modes[slot] = MODES.index(mode) if mode in MODES else 0
+        self.appended += 1
+
+    def entry(self, position):
+        """Entry number ``position`` (0-based over everything ever appended)"""
+        slot = position % self.capacity
+        score, total = self.scores[slot], self.totals[slot]
+        return {
+            'topic': self.labels[self.topic_ids[slot]],
+            'subject': self.labels[self.subject_ids[slot]],
+            'score': score,
+            'total': total,
+            'percentage': (score / total * 100) if total else 0.0,
+            'date': datetime.fromtimestamp(self.timestamps[slot]).strftime(DATE_FORMAT),
+            'mode': MODES[self.modes[slot]],
+        }
+
+    def recent(self, n):
+        """Newest ``n`` entries, newest first"""
+        stop = self.appended - min(n, len(self))
+        return [self.entry(position) for position in range(self.appended - 1, stop - 1, -1)]
+
+    def since(self, position):
+        """Entries appended after the first ``position``, oldest first (only those still buffered)"""
+        start = max(position, self.appended - len(self))
+        return [self.entry(p) for p in range(start, self.appended)]
+
+
+class StudyStats:
+    """Bounded quiz history plus rollups per topic, subject and day, all updated in O(1) per quiz"""
+
+    def __init__(self, capacity=500):
+        self.history = QuizHistory(capacity)
+        self.rollups = {scope: {} for scope in SCOPES}
+
+    def record(self, topic, subject, score, total, mode=MODES[0], timestamp=None):
+        """Add one graded quiz and return its history entry"""
+        timestamp = timestamp if timestamp is not None else datetime.now().timestamp()
+        self.history.append(topic, subject, score, total, timestamp, mode)
+        entry = self.history.entry(self.history.appended - 1)
+        for scope, key in rollup_keys(entry):
+            self.rollups[scope].setdefault(key, Rollup()).add(score, total)
+        return entry
+
+    def load(self, history, rollups):
+        """Fill from saved history (oldest first) and saved rollups without re-aggregating"""
+        for entry in history[-self.history.capacity:]:
+            timestamp = datetime.strptime(entry['date'], DATE_FORMAT).timestamp()
+            self.history.append(entry.get('topic') or "Untitled", entry.get('subject') or "General",
+                                entry['score'], entry['total'], timestamp, entry.get('mode') or MODES[0])
+        for (scope, key), rollup in rollups.items():
+            self.rollups[scope][key] = rollup
+
+    def breakdown(self, scope, limit=None):
+        """Rollups of one scope as rows, most attempted first"""
+        rows = [
+            {scope.title(): key, 'Attempts': r.attempts, 'Accuracy': round(r.accuracy, 1),
+             'Best': round(r.best, 1), 'Trend': round(r.trend, 1)}
+            for key, r in self.rollups[scope].items()
+        ]
+        rows.sort(key=lambda row: row['Attempts'], reverse=True)
+        return rows[:limit] if limit else rows
@@ -0,0 +1,28 @@
+import threading
+from collections import deque
+
+
+class RenderStats:
+    """Thread-safe recent server render times (ms) per kind of run, e.g. full page vs fragment"""
+
+    def __init__(self, window=500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._times = {}
+
+    def record(self, kind, elapsed_ms):
+        with self._lock:
+            self._times.setdefault(kind, deque(maxlen=self._window)).append(elapsed_ms)
+
+    def snapshot(self):
+        """{kind: {'runs', 'p50', 'p95'}} over the recent window"""
+        with self._lock:
+            times = {kind: sorted(values) for kind, values in self._times.items()}
+        return {
+            kind: {
+                'runs': len(values),
+                'p50': values[len(values) // 2],
+                'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+            }
+            for kind, values in times.items() if values
+        }
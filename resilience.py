@@ -0,0 +1,182 @@
+import random
+import threading
+import time
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the provider while the circuit breaker is open"""
+
+
+class RetryError(Exception):
+    """Raised when a call fails after exhausting its attempts or deadline"""
+
+    def __init__(self, attempts, last_error):
+        super().__init__(f"failed after {attempts} attempt(s): {last_error!r}")
+        self.attempts = attempts
+        self.last_error = last_error
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and an overall deadline"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, attempt_timeout=30.0, deadline=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """Delay before retrying after the given (1-based) failed attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """Process-wide breaker: opens after consecutive provider failures, probes after a cool-down"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        """Whether a call may go upstream now; only one probe is let through when half-open"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class CallStats:
+    """Thread-safe counters of calls, attempts and outcomes, with how many calls took each number of attempts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.failures = 0
+        self.short_circuited = 0
+        self.last_attempts = 0
+        self._attempt_counts = {}
+
+    def record(self, attempts, ok, short_circuited=False):
+        with self._lock:
+            self.calls += 1
+            self.attempts += attempts
+            self.last_attempts = attempts
+            self._attempt_counts[attempts] = self._attempt_counts.get(attempts, 0) + 1
+            if not ok:
+                self.failures += 1
+            if short_circuited:
+                self.short_circuited += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'attempts': self.attempts,
+                'failures': self.failures,
+                'short_circuited': self.short_circuited,
+                'avg_attempts': (self.attempts / self.calls) if self.calls else 0.0,
+                'last_attempts': self.last_attempts,
+                # {attempts: calls}; 0 attempts means the open circuit refused the call outright
+                'attempts_per_call': dict(sorted(self._attempt_counts.items())),
+            }
+
+
+def is_retryable_error(exc):
+    """Timeouts, connection errors, 408/409/429 and 5xx are transient; anything else is not"""
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in (408, 409, 429) or status >= 500
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    try:
+        import openai
+    except ImportError:
+        return False
+    return isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError))
+
+
+def _retry_after(exc):
+    """Seconds requested by a Retry-After header, if the error carries one"""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def call_with_retry(func, policy, breaker=None, stats=None, retry_on=()):
+    """Call ``func(timeout)`` under a retry policy and circuit breaker.
+
+    ``timeout`` is the time budget for that attempt, already capped by the
+    remaining deadline. Provider errors (see ``is_retryable_error``) are retried
+    and counted by the breaker; exceptions in ``retry_on`` (e.g. unparseable model
+    output) are retried without tripping it. Anything else fails immediately.
+    Returns ``(result, attempts)``; raises ``RetryError`` or ``CircuitOpenError``.
+    """
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        if breaker is not None and not breaker.allow():
+            if stats is not None:
+                stats.record(attempt, ok=False, short_circuited=True)
+            raise CircuitOpenError("AI provider circuit is open")
+
+        attempt += 1
+        remaining = policy.deadline - (time.monotonic() - started)
+        try:
+            result = func(min(policy.attempt_timeout, max(remaining, 0.1)))
+        except Exception as exc:
+            provider_error = is_retryable_error(exc)
+            if breaker is not None:
+                if provider_error:
+                    breaker.record_failure()
+                else:
+                    # The provider answered; the call itself was at fault
+                    breaker.record_success()
+            retryable = provider_error or isinstance(exc, retry_on)
+            delay = _retry_after(exc) or policy.backoff(attempt)
+            remaining = policy.deadline - (time.monotonic() - started)
+            if not retryable or attempt >= policy.max_attempts or delay >= remaining:
+                if stats is not None:
+                    stats.record(attempt, ok=False)
+                raise RetryError(attempt, exc) from exc
+            time.sleep(delay)
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        if stats is not None:
+            stats.record(attempt, ok=True)
+        return result, attempt
@@ -0,0 +1,380 @@
+"""Headless JSON API for generation, grading and progress, for LMS integrations and bulk tools.
+
+    python service.py --port 8502 --workers 4 --queue 100
+    STUDYBUZZ_AI_BASE_URL=http://127.0.0.1:8765/v1 python service.py   # against stub_llm.py
+
+Generations run as jobs on a bounded worker pool: submit one and poll it, or ask
+for the result and wait. Grading and progress reads answer directly. The service
+uses the app's generators and STUDYBUZZ_* settings, so it shares the generation
+cache, question bank and progress files with the app; with STUDYBUZZ_SERVICE_PORT
+set, the app runs it in its own process and shares its in-memory caches, AI
+client and connection pool too.
+
+    GET  /health
+    GET  /stats                 queue, AI call, cache, bank and item validation counters
+    POST /jobs                  {"kind", "topic", "count", "difficulty", "subject", "grade_level", "fresh"} -> 202
+    GET  /jobs/<id>             status ("queued", "running", "done", "failed") and the result once done
+    POST /generate              same body plus "wait" (seconds, default 60); 202 with the job if it takes longer
+    POST /grade                 {"kind", "questions", "submissions", "user_ids", "topic", "subject"}
+    GET  /progress/<user_id>    saved XP, totals, streak, achievements, rollups and recent quizzes
+
+Kinds are multiple_choice, true_false, fill_blank, flashcards and study_guide.
+Submissions hold one answer per question: a letter for multiple choice, true or
+false, or the text for a blank; null leaves it unanswered. With "user_ids" (the
+app's 32-hex-digit ids), each student's result is saved to their progress.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import streamlit.logger
+
+from grading import FUZZY_THRESHOLD, AnswerKey, grade_batch, item_analysis, quiz_xp
+from job_queue import JobQueue, QueueFullError
+from progress_store import ProgressStore
+from quiz_stats import DATE_FORMAT
+from study_ai import (
+    ITEM_KINDS, QUIZ_GENERATORS, MAX_FLASHCARDS, generate_kind, generate_study_guide, get_ai_call_stats,
+    get_generation_cache, get_item_stats, get_question_bank, subject_context_for,
+)
+from study_items import UNANSWERED, letter_index, normalize_items
+
+KINDS = ITEM_KINDS + ('study_guide',)
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+MAX_QUESTIONS = 30
+MAX_TOPIC_LENGTH = 200
+MAX_BODY_BYTES = 5 * 1024 * 1024
+DEFAULT_WAIT = 60.0
+USER_ID = re.compile(r"[0-9a-f]{32}")
+
+PROGRESS_PATH = os.environ.get("STUDYBUZZ_PROGRESS_PATH", os.path.join(".studybuzz", "progress.sqlite3"))
+PROGRESS_FLUSH_INTERVAL = float(os.environ.get("STUDYBUZZ_PROGRESS_FLUSH_INTERVAL", 5))
+FUZZY_MATCH = float(os.environ.get("STUDYBUZZ_FUZZY_MATCH", FUZZY_THRESHOLD))
+
+
+class RequestError(Exception):
+    """A request the service refuses, with the HTTP status to answer it with"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def generation_params(body):
+    """Checked generation settings from a request body, with the app's defaults filled in"""
+    kind = body.get('kind')
+    if kind not in KINDS:
+        raise RequestError(400, f"kind must be one of {', '.join(KINDS)}")
+    topic = body.get('topic')
+    if not isinstance(topic, str) or not topic.strip() or len(topic) > MAX_TOPIC_LENGTH:
+        raise RequestError(400, f"topic must be a non-empty string of at most {MAX_TOPIC_LENGTH} characters")
+    limit = MAX_FLASHCARDS if kind == 'flashcards' else MAX_QUESTIONS
+    count = body.get('count', 20 if kind == 'flashcards' else 10)
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= limit:
+        raise RequestError(400, f"count must be an integer from 1 to {limit}")
+    difficulty = body.get('difficulty', "Medium")
+    if difficulty not in DIFFICULTIES:
+        raise RequestError(400, f"difficulty must be one of {', '.join(DIFFICULTIES)}")
+    return {
+        'kind': kind,
+        'topic': topic.strip(),
+        'count': count,
+        'difficulty': difficulty,
+        'subject': str(body.get('subject') or "General"),
+        'grade_level': str(body.get('grade_level') or "High School"),
+        'fresh': bool(body.get('fresh', False)),
+    }
+
+
+def run_generation(kind, topic, count, difficulty, subject, grade_level, fresh):
+    """Job body: generate like the app does, through the same cache, bank and client"""
+    subject_context = subject_context_for(subject, grade_level)
+    if kind == 'study_guide':
+        guide = generate_study_guide(topic, subject_context, share=not fresh)
+        if not guide:
+            raise RuntimeError("study guide generation failed")
+        return {'kind': kind, 'study_guide': guide}
+    items = generate_kind(kind, topic, count, difficulty, subject_context, share=not fresh)
+    if not items:
+        raise RuntimeError(f"{kind} generation failed")
+    return {'kind': kind, 'items': items}
+
+
+def encode_answer(kind, answer):
+    """An answer from a request in the form the grader stores it"""
+    if answer is None:
+        return None if kind == 'fill_blank' else UNANSWERED
+    if kind == 'fill_blank':
+        return str(answer)
+    if kind == 'true_false':
+        if isinstance(answer, str):
+            answer = {'true': True, 'false': False}.get(answer.strip().lower())
+        if not isinstance(answer, bool):
+            raise RequestError(400, "true/false answers must be true, false or null")
+        return int(answer)
+    if not isinstance(answer, str) or letter_index(answer) == UNANSWERED:
+        raise RequestError(400, "multiple choice answers must be option letters or null")
+    return letter_index(answer)
+
+
+def finite(value):
+    """A NumPy number as a JSON-safe float (None for NaN)"""
+    value = float(value)
+    return None if math.isnan(value) else round(value, 4)
+
+
+class StudyService:
+    """Generation jobs, grading and progress behind the JSON endpoints"""
+
+    def __init__(self, progress_store, workers=4, max_queued=100):
+        self.jobs = JobQueue(workers=workers, max_queued=max_queued)
+        self.progress = progress_store
+
+    def submit_generation(self, body):
+        params = generation_params(body)
+        try:
+            return self.jobs.submit(f"{params['kind']}: {params['topic']}", run_generation, **params)
+        except QueueFullError as exc:
+            raise RequestError(503, str(exc)) from None
+
+    def grade(self, body):
+        """Grade a class's submissions to one quiz, saving results when user ids are given"""
+        kind = body.get('kind')
+        if kind not in QUIZ_GENERATORS:
+            raise RequestError(400, f"kind must be one of {', '.join(QUIZ_GENERATORS)}")
+        questions = body.get('questions')
+        submissions = body.get('submissions')
+        if not isinstance(questions, list) or not questions or not isinstance(submissions, list):
+            raise RequestError(400, "questions must be a non-empty list and submissions a list")
+        records = normalize_items(kind, questions)
+        if len(records) != len(questions):
+            raise RequestError(400, f"{len(questions) - len(records)} questions cannot be graded")
+        if not all(isinstance(answers, list) and len(answers) <= len(records) for answers in submissions):
+            raise RequestError(400, f"each submission must be a list of at most {len(records)} answers")
+        user_ids = body.get('user_ids')
+        if user_ids is not None and (not isinstance(user_ids, list) or len(user_ids) != len(submissions)
+                                     or not all(isinstance(u, str) and USER_ID.fullmatch(u) for u in user_ids)):
+            raise RequestError(400, "user_ids must hold one 32-hex-digit id per submission")
+
+        key = AnswerKey(records)
+        rows = [[encode_answer(kind, answer) for answer in answers] for answers in submissions]
+        blank = None if key.text else UNANSWERED
+        rows = [row + [blank] * (key.size - len(row)) for row in rows]
+        responses = rows if key.text else np.array(rows, dtype=np.int8).reshape(len(rows), key.size)
+        grades = grade_batch(key, responses, FUZZY_MATCH)
+        analysis = item_analysis(key, responses, grades)
+
+        results = [
+            {'score': int(score), 'total': key.size, 'percentage': finite(percentage),
+             'answered': int(answered), 'marks': [bool(mark) for mark in marks],
+             'xp': quiz_xp(int(score), key.size)}
+            for score, percentage, answered, marks in zip(grades.scores, grades.percentages,
+                                                          grades.answered, grades.marks)
+        ]
+        items = []
+        for index in range(key.size):
+            item = {'difficulty': finite(analysis.difficulty[index]),
+                    'discrimination': finite(analysis.discrimination[index])}
+            if analysis.option_counts is not None:
+                counts = analysis.option_counts[index]
+                labels = ['blank'] + ([chr(65 + i) for i in range(len(counts) - 1)] if kind == 'multiple_choice'
+                                      else ['false', 'true'])
+                item['option_counts'] = {label: int(count) for label, count in zip(labels, counts)}
+            items.append(item)
+
+        if user_ids:
+            self._save_results(user_ids, results, kind, body)
+        return {'kind': kind, 'results': results, 'items': items}
+
+    def _save_results(self, user_ids, results, kind, body):
+        topic = str(body.get('topic') or "Untitled")
+        subject = str(body.get('subject') or "General")
+        date = datetime.now().strftime(DATE_FORMAT)
+        for user_id, result in zip(user_ids, results):
+            entry = {'topic': topic, 'subject': subject, 'score': result['score'], 'total': result['total'],
+                     'percentage': result['percentage'], 'date': date, 'mode': kind}
+            deltas = {'xp': result['xp'], 'total_quizzes': 1, 'total_correct': result['score'],
+                      'total_questions': result['total']}
+            self.progress.record(user_id, deltas=deltas, history=[entry])
+        self.progress.request_flush()
+
+    def user_progress(self, user_id, history_limit=20):
+        if not USER_ID.fullmatch(user_id):
+            raise RequestError(404, "unknown user id")
+        progress = self.progress.load(user_id, history_limit=history_limit)
+        rollups = {}
+        for (scope, key), rollup in progress['rollups'].items():
+            rollups.setdefault(scope, {})[key] = {
+                'attempts': rollup.attempts, 'accuracy': round(rollup.accuracy, 1),
+                'best': round(rollup.best, 1), 'trend': round(rollup.trend, 1)}
+        progress['achievements'] = sorted(progress['achievements'])
+        progress['rollups'] = rollups
+        progress['cards'] = len(progress['cards'])
+        return progress
+
+    def stats(self):
+        return {
+            'jobs': self.jobs.stats(),
+            'ai_calls': get_ai_call_stats().snapshot(),
+            'cache': get_generation_cache().stats(),
+            'bank': get_question_bank().stats(),
+            'items': get_item_stats().snapshot(),
+        }
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    ROUTES = (
+        ("GET", re.compile(r"/health"), "health"),
+        ("GET", re.compile(r"/stats"), "stats"),
+        ("POST", re.compile(r"/jobs"), "submit_job"),
+        ("GET", re.compile(r"/jobs/([0-9a-f]{32})"), "get_job"),
+        ("POST", re.compile(r"/generate"), "generate"),
+        ("POST", re.compile(r"/grade"), "grade"),
+        ("GET", re.compile(r"/progress/([^/]+)"), "progress"),
+    )
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        self.query = parse_qs(url.query)
+        path = url.path.rstrip("/") or "/"
+        # Until _body reads it, a request body is still waiting on the connection
+        self.body_pending = (self.headers.get("Content-Length") or "0").strip() != "0"
+        try:
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.fullmatch(path)
+                if match:
+                    if route_method != method:
+                        raise RequestError(405, f"use {route_method} for {path}")
+                    status, payload = getattr(self, name)(*match.groups())
+                    break
+            else:
+                raise RequestError(404, f"no endpoint at {path}")
+        except RequestError as exc:
+            status, payload = exc.status, {'error': str(exc)}
+        except Exception as exc:
+            status, payload = 500, {'error': f"{type(exc).__name__}: {exc}"}
+        self._send_json(status, payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, f"request body over {MAX_BODY_BYTES} bytes")
+        try:
+            raw = self.rfile.read(length)
+            self.body_pending = False
+            body = json.loads(raw or b"{}")
+        except ValueError:
+            raise RequestError(400, "request body is not valid JSON") from None
+        if not isinstance(body, dict):
+            raise RequestError(400, "request body must be a JSON object")
+        return body
+
+    def health(self):
+        return 200, {'status': 'ok'}
+
+    def stats(self):
+        return 200, self.service.stats()
+
+    def submit_job(self):
+        job = self.service.submit_generation(self._body())
+        return 202, job.snapshot()
+
+    def get_job(self, job_id):
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            raise RequestError(404, "unknown or expired job")
+        return 200, job.snapshot()
+
+    def generate(self):
+        body = self._body()
+        wait = body.get('wait', DEFAULT_WAIT)
+        if not isinstance(wait, (int, float)) or isinstance(wait, bool) or wait < 0:
+            raise RequestError(400, "wait must be a number of seconds")
+        job = self.service.submit_generation(body)
+        if not self.service.jobs.wait(job, wait):
+            return 202, job.snapshot()
+        return (200 if job.status == 'done' else 502), job.snapshot()
+
+    def grade(self):
+        return 200, self.service.grade(self._body())
+
+    def progress(self, user_id):
+        limit = self.query.get('history', ["20"])[0]
+        if not limit.isdigit():
+            raise RequestError(400, "history must be a number of quizzes")
+        return 200, self.service.user_progress(user_id, int(limit))
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 503:
+            self.send_header("Retry-After", "5")
+        if self.body_pending:
+            # Answered without reading the body (404, 405, 413...), which would otherwise be
+            # parsed as the next request, so this connection cannot carry another one
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(service, host, port):
+    handler = type("BoundServiceHandler", (ServiceHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(progress_store, host="127.0.0.1", port=8502, workers=4, max_queued=100):
+    """Serve the API from a daemon thread of the calling process; returns the server"""
+    server = make_server(StudyService(progress_store, workers, max_queued), host, port)
+    threading.Thread(target=server.serve_forever, name="studybuzz-service", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless StudyBuzz generation, grading and progress API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--workers", type=int, default=4, help="generation jobs run at once")
+    parser.add_argument("--queue", type=int, default=100, help="jobs allowed to wait before submissions get 503")
+    args = parser.parse_args()
+    # Running outside `streamlit run`, so its bare-mode warnings are just noise here
+    streamlit.logger.set_log_level("error")
+
+    store = ProgressStore(PROGRESS_PATH, flush_interval=PROGRESS_FLUSH_INTERVAL)
+    server = make_server(StudyService(store, args.workers, args.queue), args.host, args.port)
+    print(f"StudyBuzz service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
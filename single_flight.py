@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one execution whose result all callers share"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, func):
+        """Run func() unless a call with this key is already in flight, then wait for that one.
+
+        Returns ``(result, shared)``; ``shared`` is True when the result came from
+        another caller's execution. Exceptions from the execution reach every caller.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._in_flight),
+            }
@@ -0,0 +1,175 @@
+import heapq
+import time
+from array import array
+
+GRADES = ('again', 'hard', 'good', 'easy')
+DAY = 24 * 3600
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+# A forgotten card comes back in the same session
+RELEARN_DELAY = 10 * 60
+
+
+def day_number(timestamp):
+    """Whole days since the epoch in local time, so "today" matches the student's calendar"""
+    return int((timestamp - time.timezone) // DAY)
+
+
+def schedule(grade, ease, interval, reps, lapses, now):
+    """SM-2 style next state for one review; returns (ease, interval_days, reps, lapses, due)"""
+    if grade == 'again':
+        return max(MIN_EASE, ease - 0.2), 0.0, 0, lapses + 1, now + RELEARN_DELAY
+    if grade == 'hard':
+        ease = max(MIN_EASE, ease - 0.15)
+        interval = max(1.0, interval * 1.2)
+    elif grade == 'good':
+        interval = 1.0 if reps == 0 else 6.0 if reps == 1 else interval * ease
+    elif grade == 'easy':
+        ease += 0.15
+        interval = 4.0 if reps == 0 else interval * ease * 1.3
+    else:
+        raise ValueError(f"unknown grade: {grade}")
+    return ease, interval, reps + 1, lapses, now + interval * DAY
+
+
+class DayCounter:
+    """Fenwick tree of how many cards fall due on each day, for O(log n) "due by day X" counts"""
+
+    def __init__(self, base_day, size=64):
+        self.base_day = base_day
+        self._tree = [0] * (size + 1)
+
+    def _index(self, day):
+        return max(day - self.base_day, 0) + 1
+
+    def add(self, day, delta):
+        index = self._index(day)
+        if index >= len(self._tree):
+            self._grow(index)
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _prefix(self, index):
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def count_through(self, day):
+        return self._prefix(min(self._index(day), len(self._tree) - 1))
+
+    def _grow(self, index):
+        size = len(self._tree) - 1
+        counts = [self._prefix(i) - self._prefix(i - 1) for i in range(1, size + 1)]
+        while size < index:
+            size *= 2
+        self._tree = [0] * (size + 1)
+        for offset, count in enumerate(counts):
+            if count:
+                self.add(self.base_day + offset, count)
+
+
+class ReviewDeck:
+    """Every flashcard a student is learning, with its SM-2 state in typed array columns.
+
+    A min-heap on due time (stale entries skipped lazily) gives the next due card and a
+    DayCounter gives due-by-day counts, both in O(log n) for tens of thousands of cards.
+    Changed cards are remembered until ``take_dirty`` hands them over for a bulk write.
+    """
+
+    def __init__(self, now=None):
+        now = time.time() if now is None else now
+        self.keys = []
+        self.topics = []
+        self.fronts = []
+        self.backs = []
+        self.ease = array('f')
+        self.interval = array('f')
+        self.due = array('d')
+        self.reps = array('H')
+        self.lapses = array('H')
+        self._rows = {}
+        self._heap = []
+        self._days = DayCounter(day_number(now))
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def add(self, key, topic, front, back, ease=DEFAULT_EASE, interval=0.0, due=None, reps=0, lapses=0, dirty=True):
+        """Add a card (new cards are due now); cards already in the deck are left alone"""
+        if key in self._rows:
+            return False
+        due = time.time() if due is None else due
+        row = self._rows[key] = len(self.keys)
+        self.keys.append(key)
+        self.topics.append(topic)
+        self.fronts.append(front)
+        self.backs.append(back)
+        self.ease.append(ease)
+        self.interval.append(interval)
+        self.due.append(due)
+        self.reps.append(min(reps, 0xFFFF))
+        self.lapses.append(min(lapses, 0xFFFF))
+        heapq.heappush(self._heap, (due, row))
+        self._days.add(day_number(due), 1)
+        if dirty:
+            self._dirty.add(row)
+        return True
+
+    def review(self, key, grade, now=None):
+        """Apply a grade (again/hard/good/easy) to a card and reschedule it"""
+        now = time.time() if now is None else now
+        row = self._rows[key]
+        ease, interval, reps, lapses, due = schedule(
+            grade, self.ease[row], self.interval[row], self.reps[row], self.lapses[row], now)
+        self._days.add(day_number(self.due[row]), -1)
+        self._days.add(day_number(due), 1)
+        self.ease[row] = ease
+        self.interval[row] = interval
+        self.reps[row] = min(reps, 0xFFFF)
+        self.lapses[row] = min(lapses, 0xFFFF)
+        self.due[row] = due
+        heapq.heappush(self._heap, (due, row))
+        self._dirty.add(row)
+        return due
+
+    def next_due(self, now=None):
+        """Key of the most overdue card that is due by the end of ``now``'s day, or None.
+
+        Uses the same cutoff as ``due_today``, so a card counted as due today can be reviewed today.
+        """
+        now = time.time() if now is None else now
+        today = day_number(now)
+        heap = self._heap
+        while heap:
+            due, row = heap[0]
+            if due != self.due[row]:
+                # Superseded by a later review of the same card
+                heapq.heappop(heap)
+                continue
+            return self.keys[row] if day_number(due) <= today else None
+        return None
+
+    def due_today(self, now=None):
+        """Cards due by the end of today, overdue ones included"""
+        now = time.time() if now is None else now
+        return self._days.count_through(day_number(now))
+
+    def card(self, key):
+        row = self._rows[key]
+        return {
+            'key': key, 'topic': self.topics[row], 'front': self.fronts[row], 'back': self.backs[row],
+            'ease': self.ease[row], 'interval': self.interval[row], 'due': self.due[row],
+            'reps': self.reps[row], 'lapses': self.lapses[row],
+        }
+
+    def take_dirty(self):
+        """Cards changed since the last call, as rows ready for a bulk write"""
+        rows, self._dirty = self._dirty, set()
+        return [self.card(self.keys[row]) for row in sorted(rows)]
@@ -0,0 +1,132 @@
+"""Minimal OpenAI-compatible chat completions server for local tests and load runs.
+
+Returns canned but well-formed quizzes, flashcards, hints and study guides, so the
+app can run without Pollinations:
+
+    python stub_llm.py --port 8765 --latency 0.5
+    STUDYBUZZ_AI_BASE_URL=http://127.0.0.1:8765/v1 streamlit run app.py
+
+``--bad-items 0.2`` breaks about a fifth of the generated items (a correct letter
+outside A-D, a non-boolean answer, no blank, no card front) to exercise validation.
+"""
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Ways to break each kind of generated item so it cannot be shown or graded
+BROKEN_ITEMS = {
+    'options': lambda item: dict(item, correct="E"),
+    'statement': lambda item: dict(item, answer="maybe"),
+    'sentence': lambda item: dict(item, sentence="A sentence without any gap."),
+    'flashcards': lambda item: {"back": item["back"]},
+}
+
+
+def break_some(items, kind, bad_items):
+    return [BROKEN_ITEMS[kind](item) if random.random() < bad_items else item for item in items]
+
+
+def fake_completion(messages, bad_items=0.0):
+    """Build response text shaped like what the app's prompt asks for"""
+    system_msg = messages[0]['content'] if messages else ""
+    prompt = messages[-1]['content'] if messages else ""
+    match = re.search(r"exactly (\d+)", prompt)
+    count = int(match.group(1)) if match else 5
+    focus = re.search(r"aspect of the topic: (.*)\.", prompt)
+    tag = f" ({focus.group(1)})" if focus else ""
+
+    if '"flashcards"' in system_msg:
+        return json.dumps({"flashcards": break_some([
+            {"front": f"Term {i + 1}{tag}", "back": f"Definition of term {i + 1}"} for i in range(count)
+        ], 'flashcards', bad_items)})
+    if '"options"' in system_msg:
+        return json.dumps({"questions": break_some([
+            {"question": f"Sample question {i + 1}{tag}?",
+             "options": {"A": "Option A", "B": "Option B", "C": "Option C", "D": "Option D"},
+             "correct": "ABCD"[i % 4]} for i in range(count)
+        ], 'options', bad_items)})
+    if '"statement"' in system_msg:
+        return json.dumps({"questions": break_some([
+            {"statement": f"Sample statement {i + 1}{tag}.", "answer": i % 2 == 0} for i in range(count)
+        ], 'statement', bad_items)})
+    if '"sentence"' in system_msg:
+        return json.dumps({"questions": break_some([
+            {"sentence": f"Sample sentence {i + 1}{tag} with a _____.", "answer": f"word{i + 1}"} for i in range(count)
+        ], 'sentence', bad_items)})
+    for key, field in (("hints", "hint"), ("explanations", "explanation")):
+        if f'"{key}"' in system_msg:
+            ids = [int(n) for n in re.findall(r"^(\d+)\.", prompt, re.M)]
+            return json.dumps({key: [{"id": n, field: f"Sample {field} {n}."} for n in ids]})
+    return "## Overview\nThis is a stub response.\n\n## Key Concepts\n- Concept one\n- Concept two\n"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency = 0.0
+    bad_items = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        time.sleep(self.latency)
+        text = fake_completion(body.get("messages", []), self.bad_items)
+        created = int(time.time())
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(text), 24):
+                chunk = {"id": "stub", "object": "chat.completion.chunk", "created": created, "model": "stub",
+                         "choices": [{"index": 0, "delta": {"content": text[start:start + 24]}, "finish_reason": None}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self._write_chunk("")
+            return
+
+        self._send_json(200, {
+            "id": "stub", "object": "chat.completion", "created": created, "model": "stub",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--bad-items", type=float, default=0.0, help="fraction of generated items to break")
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.bad_items = args.bad_items
+    server = ThreadingHTTPServer((args.host, args.port), StubHandler)
+    print(f"Stub LLM listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,916 @@
+"""AI layer shared by the Streamlit app and the command-line tools: the pooled
+provider client, resilient JSON/text calls, the generation cache and every
+study-material generator.
+"""
+import json
+import os
+import time
+import copy
+import functools
+import inspect
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import streamlit as st
+
+from generation_cache import GenerationCache, make_key
+from item_schema import ItemStats, validate_item
+from json_stream import JsonItemStream, ParseStats, salvage_items
+from near_dup import NearDuplicateIndex
+from question_bank import QuestionBank, item_text
+from resilience import CallStats, CircuitBreaker, CircuitOpenError, RetryError, RetryPolicy, call_with_retry
+from single_flight import SingleFlight
+
+# ============== API CLIENT SETUP ==============
+# openai and httpx (with transport.py) take longer to import than the rest of the app put together,
+# so they are imported on first use, or ahead of it on a background thread by start_prewarm()
+# Point STUDYBUZZ_AI_BASE_URL at a local stub (see stub_llm.py) for tests and load runs
+AI_BASE_URL = os.environ.get("STUDYBUZZ_AI_BASE_URL", "https://text.pollinations.ai/openai")
+AI_API_KEY = os.environ.get("STUDYBUZZ_AI_API_KEY", "pollinations")
+
+# HTTP transport shared by every session
+HTTP_MAX_CONNECTIONS = int(os.environ.get("STUDYBUZZ_HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("STUDYBUZZ_HTTP_MAX_KEEPALIVE", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("STUDYBUZZ_HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("STUDYBUZZ_HTTP_CONNECT_TIMEOUT", 10))
+HTTP_READ_TIMEOUT = float(os.environ.get("STUDYBUZZ_HTTP_READ_TIMEOUT", 60))
+HTTP2 = os.environ.get("STUDYBUZZ_HTTP2", "0").lower() in ("1", "true", "yes")
+HTTP_PROXY = os.environ.get("STUDYBUZZ_AI_PROXY") or os.environ.get("HTTPS_PROXY") or os.environ.get("https_proxy")
+
+@st.cache_resource
+def get_transport_stats():
+    """Process-wide HTTP request, connection reuse and pool saturation counters"""
+    from transport import TransportStats
+    return TransportStats(HTTP_MAX_CONNECTIONS)
+
+@st.cache_resource
+def get_http_client():
+    """Pooled HTTP client behind the AI client, shared by every session"""
+    from transport import build_http_client
+    return build_http_client(
+        get_transport_stats(),
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive=HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        connect_timeout=HTTP_CONNECT_TIMEOUT,
+        read_timeout=HTTP_READ_TIMEOUT,
+        http2=HTTP2,
+        proxy=HTTP_PROXY,
+    )
+
+@st.cache_resource
+def get_openai_client():
+    """Initialize OpenAI client for Pollinations API"""
+    from openai import OpenAI
+    return OpenAI(
+        api_key=AI_API_KEY,
+        base_url=AI_BASE_URL,
+        # Retries are owned by call_with_retry so they are not multiplied by the SDK's own
+        max_retries=0,
+        http_client=get_http_client(),
+    )
+
+def request_timeout(budget):
+    """Per-request timeout for an attempt with the given time budget (seconds)"""
+    import httpx
+    return httpx.Timeout(min(budget, HTTP_READ_TIMEOUT), connect=min(budget, HTTP_CONNECT_TIMEOUT))
+
+# Retry/backoff settings shared by every AI call
+AI_BASE_DELAY = float(os.environ.get("STUDYBUZZ_AI_BASE_DELAY", 0.5))
+AI_MAX_DELAY = float(os.environ.get("STUDYBUZZ_AI_MAX_DELAY", 8))
+AI_ATTEMPT_TIMEOUT = float(os.environ.get("STUDYBUZZ_AI_ATTEMPT_TIMEOUT", 45))
+AI_DEADLINE = float(os.environ.get("STUDYBUZZ_AI_DEADLINE", 90))
+
+def ai_retry_policy(max_attempts=3):
+    """Retry policy for one AI call"""
+    return RetryPolicy(max_attempts=max_attempts, base_delay=AI_BASE_DELAY, max_delay=AI_MAX_DELAY,
+                       attempt_timeout=AI_ATTEMPT_TIMEOUT, deadline=AI_DEADLINE)
+
+@st.cache_resource
+def get_circuit_breaker():
+    """Process-wide circuit breaker for the AI provider"""
+    return CircuitBreaker(
+        failure_threshold=int(os.environ.get("STUDYBUZZ_AI_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.environ.get("STUDYBUZZ_AI_BREAKER_RESET", 30)),
+    )
+
+@st.cache_resource
+def get_parse_stats():
+    """Process-wide counts of clean, salvaged, repaired and failed JSON completions"""
+    return ParseStats()
+
+@st.cache_resource
+def get_item_stats():
+    """Process-wide counts of generated items kept as is, repaired or dropped, and of top-up requests"""
+    return ItemStats()
+
+@st.cache_resource
+def get_ai_call_stats():
+    """Process-wide counters of AI calls and the attempts they consumed"""
+    return CallStats()
+
+# Upper bound on concurrent upstream generation calls across all sessions
+GENERATION_WORKERS = int(os.environ.get("STUDYBUZZ_GENERATION_WORKERS", 8))
+
+@st.cache_resource
+def get_generation_executor():
+    """Bounded thread pool shared by every session for generation stages"""
+    return ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="studybuzz-gen")
+
+# Sub-requests (e.g. flashcard batches) run on their own pool so a generation
+# stage waiting on its batches can never starve the pool it is running on
+SUBREQUEST_WORKERS = int(os.environ.get("STUDYBUZZ_SUBREQUEST_WORKERS", 8))
+
+@st.cache_resource
+def get_subrequest_executor():
+    """Bounded thread pool shared by every session for batched sub-requests"""
+    return ThreadPoolExecutor(max_workers=SUBREQUEST_WORKERS, thread_name_prefix="studybuzz-batch")
+
+# ============== PRE-WARMING ==============
+# Set STUDYBUZZ_PREWARM=0 to skip warming the AI client when the app starts
+PREWARM = os.environ.get("STUDYBUZZ_PREWARM", "1").lower() in ("1", "true", "yes")
+
+def prewarm():
+    """Import the AI client and open a pooled connection to the provider; returns timings in ms"""
+    started = time.perf_counter()
+    get_openai_client()
+    imported = time.perf_counter()
+    timings = {'import_ms': (imported - started) * 1000, 'connect_ms': None}
+    try:
+        # Any response will do: the point is the TCP/TLS handshake, and the connection stays in the pool
+        get_http_client().head(AI_BASE_URL, timeout=HTTP_CONNECT_TIMEOUT)
+        timings['connect_ms'] = (time.perf_counter() - imported) * 1000
+    except Exception:
+        pass
+    return timings
+
+@st.cache_resource(show_spinner=False)
+def start_prewarm():
+    """Run prewarm() once per process on a background thread, off every request path.
+
+    Returns a Future with its timings, or None when pre-warming is disabled.
+    """
+    if not PREWARM:
+        return None
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(prewarm())
+        except Exception as exc:
+            future.set_exception(exc)
+    
+    threading.Thread(target=run, name="studybuzz-prewarm", daemon=True).start()
+    return future
+
+# ============== AI API FUNCTIONS ==============
+def repair_truncated_json(content, expected_key="flashcards"):
+    """Attempt to repair truncated JSON by closing open structures"""
+    try:
+        # First try parsing as-is
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    
+    # Try to repair common truncation issues
+    repaired = content.strip()
+    
+    # Remove trailing incomplete strings (ending mid-quote)
+    if repaired.count('"') % 2 == 1:
+        # Odd number of quotes - find last complete entry
+        last_complete = repaired.rfind('"},')
+        if last_complete > 0:
+            repaired = repaired[:last_complete + 2]
+        else:
+            last_complete = repaired.rfind('"}')
+            if last_complete > 0:
+                repaired = repaired[:last_complete + 2]
+    
+    # Close open structures
+    open_braces = repaired.count('{') - repaired.count('}')
+    open_brackets = repaired.count('[') - repaired.count(']')
+    
+    # Remove any trailing comma
+    repaired = repaired.rstrip().rstrip(',')
+    
+    # Add closing brackets and braces
+    repaired += ']' * open_brackets
+    repaired += '}' * open_braces
+    
+    try:
+        return json.loads(repaired)
+    except json.JSONDecodeError:
+        return None
+
+def parse_ai_json(content, truncated=False):
+    """Parse a JSON completion, salvaging or repairing truncated output; raises JSONDecodeError if hopeless"""
+    # Clean up common JSON formatting issues
+    if content.startswith("```json"):
+        content = content[7:]
+    if content.startswith("```"):
+        content = content[3:]
+    if content.endswith("```"):
+        content = content[:-3]
+    content = content.strip()
+    
+    # Try to parse JSON
+    parse_stats = get_parse_stats()
+    try:
+        data = json.loads(content)
+        parse_stats.record("parsed", truncated)
+        return data
+    except json.JSONDecodeError:
+        # Keep every complete item of a truncated array
+        key, items = salvage_items(content)
+        if key and items:
+            parse_stats.record("salvaged", truncated)
+            return {key: items}
+        # Fall back to closing open structures
+        data = repair_truncated_json(content)
+        if data:
+            parse_stats.record("repaired", truncated)
+            return data
+        parse_stats.record("failed", truncated)
+        raise json.JSONDecodeError("Could not repair JSON", content, 0)
+
+def call_ai_json(prompt, system_msg, max_retries=3, max_tokens=2000, on_item=None):
+    """Call AI API and expect a JSON object response (None if the reply is anything else).
+    
+    With ``on_item`` the completion is streamed and ``on_item(index, item)`` is called
+    for each item of the questions/flashcards array as soon as it is complete.
+    """
+    client = get_openai_client()
+    messages = [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": prompt}
+    ]
+    
+    def attempt(timeout):
+        if on_item:
+            stream = client.chat.completions.create(
+                model="openai",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens,
+                stream=True,
+                timeout=request_timeout(timeout),
+            )
+            # The timeout above bounds each read; this bounds the whole stream
+            stream_deadline = time.monotonic() + timeout
+            parser = JsonItemStream()
+            parts = []
+            finish_reason = None
+            for chunk in stream:
+                if time.monotonic() > stream_deadline:
+                    raise TimeoutError("AI stream exceeded its deadline")
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    for item in parser.feed(delta):
+                        on_item(parser.count - 1, item)
+            content = "".join(parts).strip()
+        else:
+            response = client.chat.completions.create(
+                model="openai",
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens,
+                timeout=request_timeout(timeout),
+            )
+            content = response.choices[0].message.content.strip()
+            finish_reason = response.choices[0].finish_reason
+        return parse_ai_json(content, truncated=finish_reason == "length")
+    
+    try:
+        data, _ = call_with_retry(attempt, ai_retry_policy(max_retries), get_circuit_breaker(),
+                                  get_ai_call_stats(), retry_on=(json.JSONDecodeError,))
+        # Callers look up keys in the reply; a bare array or scalar has none to find
+        return data if isinstance(data, dict) else None
+    except (RetryError, CircuitOpenError):
+        return None
+
+def call_ai_text(prompt, system_msg="You are a helpful educational assistant."):
+    """Call AI API and expect text response"""
+    client = get_openai_client()
+    
+    def attempt(timeout):
+        response = client.chat.completions.create(
+            model="openai",
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            timeout=request_timeout(timeout),
+        )
+        return response.choices[0].message.content.strip()
+    
+    try:
+        content, _ = call_with_retry(attempt, ai_retry_policy(), get_circuit_breaker(), get_ai_call_stats())
+        return content
+    except (RetryError, CircuitOpenError):
+        return None
+
+class StreamInterrupted(Exception):
+    """Raised by stream_ai_text when a stream fails after some of its text was yielded"""
+
+def stream_ai_text(prompt, system_msg="You are a helpful educational assistant.", on_complete=None):
+    """Call AI API with streaming and yield text chunks as they arrive.
+    
+    Yields nothing if the stream cannot be opened; raises StreamInterrupted if it breaks
+    off partway, so the partial text is never mistaken for a complete answer.
+    """
+    client = get_openai_client()
+    
+    # Opening the stream is retried; once text has been shown it is not restarted
+    def open_stream(timeout):
+        # The attempt timeout bounds each read; this bounds the whole stream, as in call_ai_json
+        nonlocal stream_deadline
+        stream_deadline = time.monotonic() + timeout
+        return client.chat.completions.create(
+            model="openai",
+            messages=[
+                {"role": "system", "content": system_msg},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            stream=True,
+            timeout=request_timeout(timeout),
+        )
+    
+    stream_deadline = None
+    try:
+        stream, _ = call_with_retry(open_stream, ai_retry_policy(), get_circuit_breaker(), get_ai_call_stats())
+    except (RetryError, CircuitOpenError):
+        return
+    
+    try:
+        parts = []
+        for chunk in stream:
+            if time.monotonic() > stream_deadline:
+                raise TimeoutError("AI stream exceeded its deadline")
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                yield delta
+        
+        # Only a stream that finished cleanly is handed on (e.g. to the cache)
+        content = "".join(parts).strip()
+    except Exception as exc:
+        raise StreamInterrupted(f"AI stream broke off: {type(exc).__name__}: {exc}") from exc
+    if on_complete and content:
+        on_complete(content)
+
+# ============== GENERATION CACHE ==============
+# Bump whenever a generate_* prompt changes so stale cached output is not served
+PROMPT_VERSION = 2
+CACHE_PATH = os.environ.get("STUDYBUZZ_CACHE_PATH", os.path.join(".studybuzz", "cache.sqlite3"))
+
+@st.cache_resource
+def get_generation_cache():
+    """Open the on-disk generation cache shared by every session"""
+    return GenerationCache(
+        CACHE_PATH,
+        max_entries=int(os.environ.get("STUDYBUZZ_CACHE_MAX_ENTRIES", 5000)),
+        max_bytes=int(os.environ.get("STUDYBUZZ_CACHE_MAX_BYTES", 50 * 1024 * 1024)),
+        default_ttl=int(os.environ.get("STUDYBUZZ_CACHE_TTL", 7 * 24 * 3600)),
+    )
+
+def generation_key(generator, topic, difficulty=None, count=None, subject_context=None):
+    """Cache key for one generate_* request under the current prompt version"""
+    return make_key(generator, topic, difficulty, count, subject_context, PROMPT_VERSION)
+
+# "share": identical requests (same topic, settings and prompt) get the same cached or
+# in-flight result. "resample": every request gets a fresh generation of its own.
+GENERATION_SHARING = os.environ.get("STUDYBUZZ_GENERATION_SHARING", "share")
+
+@st.cache_resource
+def get_single_flight():
+    """Process-wide coalescing of identical in-flight generations"""
+    return SingleFlight()
+
+def cached_generation(generator, ttl=None):
+    """Serve a generate_* function from the generation cache, storing successful results.
+    
+    Concurrent identical requests share one upstream call. Pass ``share=False`` (or set
+    STUDYBUZZ_GENERATION_SHARING=resample) to always generate fresh content instead.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, share=None, **kwargs):
+            params = signature.bind(*args, **kwargs).arguments
+            count = params.get('num_questions', params.get('num_cards'))
+            key = generation_key(generator, params['topic'], params.get('difficulty'), count,
+                                 params.get('subject_context'))
+            cache = get_generation_cache()
+            if share is None:
+                share = GENERATION_SHARING != "resample"
+            if not share:
+                result = func(*args, **kwargs)
+                if result:
+                    cache.set(key, generator, result, ttl)
+                return result
+            
+            result = cache.get(key)
+            if result is not None:
+                return result
+            
+            def generate():
+                result = func(*args, **kwargs)
+                if result:
+                    cache.set(key, generator, result, ttl)
+                return result
+            
+            result, shared = get_single_flight().do(key, generate)
+            # Callers may mutate their copy (e.g. shuffling cards), so never hand out the same object
+            return copy.deepcopy(result) if shared else result
+        return wrapper
+    return decorator
+
+# ============== QUESTION BANK ==============
+BANK_PATH = os.environ.get("STUDYBUZZ_BANK_PATH", os.path.join(".studybuzz", "bank.sqlite3"))
+
+@st.cache_resource
+def get_question_bank():
+    """Open the pre-generated question bank shared by every session"""
+    return QuestionBank(BANK_PATH)
+
+def subject_context_for(subject, grade_level):
+    """Audience phrase used in prompts and as part of cache and bank keys"""
+    if subject != "General":
+        return f"for {grade_level} level {subject}"
+    return f"for {grade_level} students"
+
+def banked(kind):
+    """Serve a generate_* function from the question bank, sampling a fresh subset per call.
+    
+    Items that near-duplicate one in ``seen`` (a NearDuplicateIndex of what the student
+    has already been shown) are never served. On a miss the wrapped generator runs,
+    avoiding those items too, and its items are added to the bank. The generation is
+    shared (cached and coalesced) unless its result repeats items the student has
+    seen, in which case that student gets a fresh one.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, share=None, seen=None, **kwargs):
+            params = signature.bind(*args, **kwargs).arguments
+            count = params.get('num_questions', params.get('num_cards'))
+            slot = (kind, params['topic'], params.get('difficulty'), params.get('subject_context'))
+            bank = get_question_bank()
+            if share is None:
+                share = GENERATION_SHARING != "resample"
+            if share:
+                items = bank.sample(*slot, count, seen)
+                if items is not None:
+                    on_item = params.get('on_item')
+                    if on_item:
+                        for index, item in enumerate(items):
+                            on_item(index, item)
+                    return items
+            
+            result = func(*args, share=share, avoid=seen, **kwargs)
+            # The shared (cached or coalesced) result was made for whoever asked first;
+            # regenerate only if it repeats something this student has already seen
+            if share and result and seen and any(seen.find(item_text(item)) is not None for item in result):
+                result = func(*args, share=False, avoid=seen, **kwargs)
+            if result:
+                bank.add(*slot, result)
+            return result
+        return wrapper
+    return decorator
+
+# ============== TOKEN BUDGETING ==============
+# Rough output tokens per generated item, used to size max_tokens and to split large requests
+ITEM_TOKEN_ESTIMATES = {
+    'multiple_choice': 100,
+    'true_false': 40,
+    'fill_blank': 45,
+    'flashcards': 45,
+    'hints': 45,
+    'explanations': 120,
+}
+RESPONSE_OVERHEAD_TOKENS = 40
+TOKEN_HEADROOM = 1.3
+MIN_MAX_TOKENS = 256
+# Largest max_tokens one request may ask for; bigger requests are split into parts
+SAFE_MAX_TOKENS = int(os.environ.get("STUDYBUZZ_SAFE_MAX_TOKENS", 1200))
+
+def token_budget(generator, count):
+    """max_tokens for a request producing count items of the given generator"""
+    estimate = RESPONSE_OVERHEAD_TOKENS + ITEM_TOKEN_ESTIMATES[generator] * count
+    return max(MIN_MAX_TOKENS, int(estimate * TOKEN_HEADROOM))
+
+def max_items_per_request(generator):
+    """Most items of the given generator that fit in one request under SAFE_MAX_TOKENS"""
+    usable = SAFE_MAX_TOKENS / TOKEN_HEADROOM - RESPONSE_OVERHEAD_TOKENS
+    return max(1, int(usable // ITEM_TOKEN_ESTIMATES[generator]))
+
+# Each part of a split request is steered towards a different aspect of the topic
+SUBTOPIC_FOCUSES = [
+    "core vocabulary and definitions",
+    "key processes and how they work",
+    "important people, places, and dates",
+    "causes and effects",
+    "real-world examples and applications",
+    "rules, formulas, and principles",
+    "common misconceptions",
+    "comparisons and contrasts between related ideas",
+    "classifications, types, and categories",
+    "advanced details and edge cases",
+]
+
+def focus_instruction(focus):
+    """Prompt line restricting one part of a split request to a sub-focus"""
+    return f"\nOnly cover this aspect of the topic: {focus}." if focus else ""
+
+def shift_item_callback(on_item, offset):
+    """Wrap an on_item(index, item) callback so a part's items keep their place in the whole"""
+    return lambda index, item: on_item(offset + index, item)
+
+def split_sizes(count, per_request):
+    num_parts = -(-count // per_request)
+    return [count // num_parts + (1 if i < count % num_parts else 0) for i in range(num_parts)]
+
+# Extra rounds that re-request items lost to near-duplicates or failed parts
+SHORTFALL_ROUNDS = 2
+
+class DistinctItems:
+    """Up to count valid generated items with near-duplicates of each other dropped.
+    
+    Each item is checked against its generator's schema first; fixable ones are
+    repaired and the rest dropped, so only the shortfall has to be generated again.
+    Rewordings of something in ``avoid`` (items the student has already seen) are held
+    back and only used if fresh items run short, so a repeat beats a failed generation.
+    """
+    def __init__(self, generator, count, avoid=None):
+        self.generator = generator
+        self.count = count
+        self.items = []
+        self._repeats = []
+        self._index = NearDuplicateIndex()
+        self._avoid = avoid
+    
+    @property
+    def shortfall(self):
+        return self.count - len(self.items)
+    
+    def add(self, item):
+        """Keep item if it is valid and new; returns the (possibly repaired) item when it joined the result"""
+        if self.shortfall <= 0:
+            return None
+        item, outcome = validate_item(self.generator, item)
+        get_item_stats().record(outcome)
+        if item is None:
+            return None
+        text = item_text(item)
+        if not self._index.add(text):
+            return None
+        if self._avoid is not None and self._avoid.find(text) is not None:
+            self._repeats.append(item)
+            return None
+        self.items.append(item)
+        return item
+    
+    def result(self):
+        return (self.items + self._repeats[:self.shortfall]) or None
+
+def split_generation(generator, count, generate_part, on_item=None, avoid=None):
+    """Generate count distinct items in one request, or in parallel parts when one would exceed the token budget.
+    
+    ``generate_part(count, focus, max_tokens, on_item)`` makes one request. Parts are
+    merged in order; items that fail validation or near-duplicate an earlier one, or one
+    in ``avoid``, are dropped and only the shortfall is requested again with a new focus.
+    """
+    per_request = max_items_per_request(generator)
+    collected = DistinctItems(generator, count, avoid)
+    executor = get_subrequest_executor()
+    focus_index = 0
+    for round_number in range(1 + SHORTFALL_ROUNDS):
+        shortfall = collected.shortfall
+        if shortfall <= 0:
+            break
+        if round_number == 0 and shortfall <= per_request:
+            # Common case: one streamed request with no focus restriction
+            parts = [generate_part(shortfall, None, token_budget(generator, shortfall), on_item)]
+            sizes = [shortfall]
+        else:
+            sizes = split_sizes(shortfall, per_request)
+            if round_number:
+                get_item_stats().record_top_up()
+            futures = []
+            offset = 0
+            for size in sizes:
+                # Only the first round streams; later parts would land out of order
+                part_on_item = shift_item_callback(on_item, offset) if on_item and round_number == 0 else None
+                focus = SUBTOPIC_FOCUSES[focus_index % len(SUBTOPIC_FOCUSES)]
+                futures.append(executor.submit(generate_part, size, focus, token_budget(generator, size), part_on_item))
+                focus_index += 1
+                offset += size
+            parts = []
+            for future in futures:
+                try:
+                    parts.append(future.result())
+                except Exception:
+                    parts.append(None)
+        
+        if not any(parts):
+            # Nothing came back at all; retrying would only add load to a failing provider
+            break
+        for part, size in zip(parts, sizes):
+            for item in (part or [])[:size]:
+                collected.add(item)
+    return collected.result()
+
+# ============== QUIZ GENERATION FUNCTIONS ==============
+@banked("multiple_choice")
+@cached_generation("multiple_choice")
+def generate_multiple_choice_quiz(topic, num_questions, difficulty, subject_context, on_item=None, avoid=None):
+    """Generate multiple choice quiz with structured JSON"""
+    system_msg = """You are a quiz generator. Output ONLY a valid JSON object with no additional text.
+Format:
+{
+    "questions": [
+        {
+            "question": "Question text here",
+            "options": {
+                "A": "First option",
+                "B": "Second option", 
+                "C": "Third option",
+                "D": "Fourth option"
+            },
+            "correct": "A"
+        }
+    ]
+}
+Ensure all questions are educational and appropriate. The "correct" field must be A, B, C, or D."""
+
+    def generate_part(count, focus, max_tokens, on_item):
+        prompt = f"""Create a {difficulty} difficulty quiz about "{topic}" {subject_context} with exactly {count} multiple choice questions.
+Each question should have 4 options (A, B, C, D) with one correct answer.
+Make questions educational and engaging."""
+        prompt += focus_instruction(focus)
+
+        data = call_ai_json(prompt, system_msg, max_tokens=max_tokens, on_item=on_item)
+        
+        if data and isinstance(data.get("questions"), list):
+            return data["questions"]
+        return None
+
+    return split_generation("multiple_choice", num_questions, generate_part, on_item, avoid)
+
+@banked("true_false")
+@cached_generation("true_false")
+def generate_true_false_quiz(topic, num_questions, difficulty, subject_context, on_item=None, avoid=None):
+    """Generate true/false quiz with structured JSON"""
+    system_msg = """You are a quiz generator. Output ONLY a valid JSON object with no additional text.
+Format:
+{
+    "questions": [
+        {
+            "statement": "A statement that is either true or false",
+            "answer": true
+        }
+    ]
+}
+The "answer" field must be a boolean (true or false, not strings)."""
+
+    def generate_part(count, focus, max_tokens, on_item):
+        prompt = f"""Create a {difficulty} difficulty true/false quiz about "{topic}" {subject_context} with exactly {count} statements.
+Mix true and false statements roughly equally.
+Make statements clear and educational."""
+        prompt += focus_instruction(focus)
+
+        data = call_ai_json(prompt, system_msg, max_tokens=max_tokens, on_item=on_item)
+        
+        if data and isinstance(data.get("questions"), list):
+            return data["questions"]
+        return None
+
+    return split_generation("true_false", num_questions, generate_part, on_item, avoid)
+
+@banked("fill_blank")
+@cached_generation("fill_blank")
+def generate_fill_blank_quiz(topic, num_questions, difficulty, subject_context, on_item=None, avoid=None):
+    """Generate fill-in-the-blank quiz with structured JSON"""
+    system_msg = """You are a quiz generator. Output ONLY a valid JSON object with no additional text.
+Format:
+{
+    "questions": [
+        {
+            "sentence": "The process of _____ converts sunlight into energy.",
+            "answer": "photosynthesis"
+        }
+    ]
+}
+Use _____ (5 underscores) to mark the blank. Keep answers to 1-3 words."""
+
+    def generate_part(count, focus, max_tokens, on_item):
+        prompt = f"""Create a {difficulty} difficulty fill-in-the-blank quiz about "{topic}" {subject_context} with exactly {count} sentences.
+Each sentence should have exactly one blank marked with _____.
+Keep answers concise (1-3 words)."""
+        prompt += focus_instruction(focus)
+
+        data = call_ai_json(prompt, system_msg, max_tokens=max_tokens, on_item=on_item)
+        
+        if data and isinstance(data.get("questions"), list):
+            return data["questions"]
+        return None
+
+    return split_generation("fill_blank", num_questions, generate_part, on_item, avoid)
+
+# Cards per request; larger decks are split into parallel batches of this size
+FLASHCARD_BATCH_SIZE = 8
+MAX_FLASHCARDS = 200
+
+def generate_flashcard_batch(topic, num_cards, subject_context, focus=None, on_item=None):
+    """Generate one small batch of flashcards with structured JSON"""
+    system_msg = """You are a flashcard generator. Output ONLY valid JSON, no other text.
+CRITICAL: Keep responses SHORT to avoid truncation.
+- Front: Maximum 8 words
+- Back: Maximum 15 words
+
+Format:
+{"flashcards":[{"front":"Term","back":"Short definition"}]}"""
+
+    prompt = f"""Create exactly {num_cards} flashcards about "{topic}" {subject_context}.
+IMPORTANT: Keep each card very brief!
+- Front: 1-8 words only
+- Back: 1-15 words only
+Output valid JSON only."""
+    prompt += focus_instruction(focus)
+
+    data = call_ai_json(prompt, system_msg, max_tokens=token_budget("flashcards", num_cards), on_item=on_item)
+    
+    if data and isinstance(data.get("flashcards"), list):
+        return data["flashcards"]
+    return None
+
+@banked("flashcards")
+@cached_generation("flashcards")
+def generate_flashcards(topic, num_cards, subject_context, on_item=None, avoid=None):
+    """Generate flashcards, splitting large decks into parallel batches"""
+    num_cards = min(num_cards, MAX_FLASHCARDS)
+    deck = DistinctItems("flashcards", num_cards, avoid)
+    rounds = range(1 + SHORTFALL_ROUNDS)
+    if num_cards <= FLASHCARD_BATCH_SIZE and not avoid:
+        # Common case: one streamed batch, topped up below only if some of its cards were dropped
+        batch = generate_flashcard_batch(topic, num_cards, subject_context, on_item=on_item)
+        if not batch:
+            return None
+        for card in batch:
+            deck.add(card)
+        rounds = range(1, 1 + SHORTFALL_ROUNDS)
+    
+    executor = get_subrequest_executor()
+    batch_index = 0
+    # Later rounds top up cards lost to validation, near-duplicates or failed batches
+    for round_number in rounds:
+        shortfall = deck.shortfall
+        if shortfall <= 0:
+            break
+        if round_number:
+            get_item_stats().record_top_up()
+        futures = []
+        for start in range(0, shortfall, FLASHCARD_BATCH_SIZE):
+            cycle, slot = divmod(batch_index, len(SUBTOPIC_FOCUSES))
+            focus = SUBTOPIC_FOCUSES[slot]
+            if cycle:
+                # Repeated focuses would otherwise return the same well-known cards
+                focus += f" (set {cycle + 1}: skip the most common cards and go deeper)"
+            size = min(FLASHCARD_BATCH_SIZE, shortfall - start)
+            futures.append(executor.submit(generate_flashcard_batch, topic, size, subject_context, focus))
+            batch_index += 1
+        
+        received = False
+        for future in as_completed(futures):
+            try:
+                batch = future.result() or []
+            except Exception:
+                batch = []
+            received = received or bool(batch)
+            for card in batch:
+                card = deck.add(card)
+                if card and on_item:
+                    on_item(len(deck.items) - 1, card)
+        if not received:
+            break
+    
+    return deck.result()
+
+QUIZ_GENERATORS = {
+    'multiple_choice': generate_multiple_choice_quiz,
+    'true_false': generate_true_false_quiz,
+    'fill_blank': generate_fill_blank_quiz,
+}
+ITEM_KINDS = tuple(QUIZ_GENERATORS) + ('flashcards',)
+
+def generate_kind(kind, topic, count, difficulty, subject_context, **kwargs):
+    """Run the generator for one kind of item; kwargs (share, seen, on_item) pass through"""
+    if kind == 'flashcards':
+        return generate_flashcards(topic, count, subject_context, **kwargs)
+    return QUIZ_GENERATORS[kind](topic, count, difficulty, subject_context, **kwargs)
+
+def study_guide_prompt(topic, subject_context):
+    """Build the (prompt, system message) pair for a study guide"""
+    system_msg = """You are an educational content creator. Create comprehensive, well-organized study guides.
+Use clear headings, bullet points, and organized sections.
+Make content engaging and easy to understand."""
+
+    prompt = f"""Create a comprehensive study guide about "{topic}" {subject_context}.
+
+Include these sections:
+1. **Overview** - A brief 2-3 sentence introduction
+2. **Key Concepts** - 5 main ideas with clear explanations
+3. **Important Terms** - Definitions of key vocabulary
+4. **Common Misconceptions** - What people often get wrong
+5. **Study Tips** - How to effectively learn this material
+6. **Related Topics** - What to explore next
+
+Make it engaging and suitable for students."""
+
+    return prompt, system_msg
+
+@cached_generation("study_guide")
+def generate_study_guide(topic, subject_context):
+    """Generate comprehensive study guide as text"""
+    prompt, system_msg = study_guide_prompt(topic, subject_context)
+    return call_ai_text(prompt, system_msg)
+
+def stream_study_guide(topic, subject_context):
+    """Stream a study guide, serving a cached guide whole and caching a fresh one once complete"""
+    key = generation_key("study_guide", topic, subject_context=subject_context)
+    cache = get_generation_cache()
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    prompt, system_msg = study_guide_prompt(topic, subject_context)
+    yield from stream_ai_text(prompt, system_msg,
+                              on_complete=lambda guide: cache.set(key, "study_guide", guide))
+
+# ============== HINTS & EXPLANATIONS ==============
+def generate_hints(questions):
+    """Generate a one-sentence hint for every multiple choice question in one JSON call"""
+    system_msg = """You are a helpful tutor. Output ONLY a valid JSON object with no additional text.
+Format:
+{"hints": [{"id": 1, "hint": "One sentence hint"}]}
+Give exactly one hint per question, using the question's number as "id". Never reveal the answer."""
+
+    numbered = "\n".join(f"{i + 1}. {q.question}" for i, q in enumerate(questions))
+    prompt = f"""Give a brief hint (1 sentence) for each of these questions without revealing the answers:
+{numbered}"""
+
+    data = call_ai_json(prompt, system_msg, max_tokens=token_budget("hints", len(questions)))
+    return _numbered_items(data, "hints", "hint")
+
+def generate_explanations(questions, answers, marks):
+    """Explain every wrong multiple choice answer in one JSON call, keyed by question index.
+    
+    ``answers`` is the student's AnswerSheet and ``marks`` the graded result per question.
+    """
+    wrong = [(i, q) for i, q in enumerate(questions) if not marks[i]]
+    if not wrong:
+        return {}
+    
+    system_msg = """You are a helpful tutor. Output ONLY a valid JSON object with no additional text.
+Format:
+{"explanations": [{"id": 1, "explanation": "Two or three sentences"}]}
+Give exactly one explanation per question, using the question's number as "id"."""
+
+    numbered = "\n".join(
+        f"{i + 1}. Question: {q.question} | Correct answer: {q.options[q.correct]} | "
+        f"Student's answer: {q.option_text(answers.get(i), 'not answered')}"
+        for i, q in wrong
+    )
+    prompt = f"""For each question, explain why the correct answer is right and the student's answer is not. Keep each explanation brief (2-3 sentences).
+{numbered}"""
+
+    data = call_ai_json(prompt, system_msg, max_tokens=token_budget("explanations", len(wrong)))
+    return _numbered_items(data, "explanations", "explanation")
+
+def _numbered_items(data, list_key, text_key):
+    """Map a batched {"id": n, text_key: ...} response to {question index: text}"""
+    results = {}
+    if not isinstance(data, dict) or not isinstance(data.get(list_key), list):
+        return results
+    for entry in data[list_key]:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            index = int(entry.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        text = entry.get(text_key)
+        if index >= 0 and isinstance(text, str) and text.strip():
+            results[index] = text.strip()
+    return results
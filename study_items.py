@@ -0,0 +1,172 @@
+from array import array
+
+from question_bank import item_fingerprint
+
+LETTERS = "ABCDEFGH"
+# Stored in an AnswerSheet's choice column for a question with no answer yet
+UNANSWERED = -1
+
+
+def letter_index(letter):
+    """0-based index of an option letter ("B" or "b) ..." -> 1), or UNANSWERED"""
+    letter = str(letter or "").strip()[:1].upper()
+    index = LETTERS.find(letter) if letter else -1
+    return index if index >= 0 else UNANSWERED
+
+
+class MultipleChoice:
+    """A multiple choice question with its options in letter order and the correct option's index"""
+
+    __slots__ = ('question', 'options', 'correct')
+
+    def __init__(self, question, options, correct):
+        self.question = question
+        self.options = options
+        self.correct = correct
+
+    @classmethod
+    def from_item(cls, item):
+        options = item.get('options')
+        if isinstance(options, dict):
+            # {"A": ..., "B": ...}; the correct letter is looked up among the sorted keys
+            letters = sorted(options)
+            texts = tuple(str(options[letter]) for letter in letters)
+            letters = [letter_index(letter) for letter in letters]
+            correct = letter_index(item.get('correct'))
+            correct = letters.index(correct) if correct in letters else UNANSWERED
+        elif isinstance(options, list):
+            texts = tuple(str(option) for option in options)
+            correct = letter_index(item.get('correct'))
+        else:
+            return None
+        if not item.get('question') or not 0 <= correct < len(texts) or len(texts) > len(LETTERS):
+            return None
+        return cls(str(item['question']), texts, correct)
+
+    def label(self, index):
+        return f"{LETTERS[index]}) {self.options[index]}"
+
+    def option_text(self, index, default):
+        return self.options[index] if index is not None and 0 <= index < len(self.options) else default
+
+
+class TrueFalse:
+    """A true/false statement; answers are encoded 1 for true and 0 for false"""
+
+    __slots__ = ('statement', 'answer')
+
+    def __init__(self, statement, answer):
+        self.statement = statement
+        self.answer = answer
+
+    @classmethod
+    def from_item(cls, item):
+        answer = item.get('answer')
+        if isinstance(answer, str):
+            answer = {'true': True, 'false': False}.get(answer.strip().lower())
+        if not item.get('statement') or not isinstance(answer, bool):
+            return None
+        return cls(str(item['statement']), answer)
+
+
+class FillBlank:
+    """A fill-in-the-blank sentence and the word or phrase that goes in the blank"""
+
+    __slots__ = ('sentence', 'answer')
+
+    def __init__(self, sentence, answer):
+        self.sentence = sentence
+        self.answer = answer
+
+    @classmethod
+    def from_item(cls, item):
+        if not item.get('sentence') or not item.get('answer'):
+            return None
+        return cls(str(item['sentence']), str(item['answer']))
+
+
+class Flashcard:
+    """A flashcard, with the fingerprint it is filed under in the review deck"""
+
+    __slots__ = ('front', 'back', 'key')
+
+    def __init__(self, front, back, key):
+        self.front = front
+        self.back = back
+        self.key = key
+
+    @classmethod
+    def from_item(cls, item):
+        if not item.get('front') or not item.get('back'):
+            return None
+        return cls(str(item['front']), str(item['back']), item_fingerprint(item))
+
+
+RECORDS = {
+    'multiple_choice': MultipleChoice,
+    'true_false': TrueFalse,
+    'fill_blank': FillBlank,
+    'flashcards': Flashcard,
+}
+
+
+def normalize_items(kind, items):
+    """Generated dicts of one kind as records, dropping any that cannot be shown or graded"""
+    record = RECORDS[kind]
+    records = (record.from_item(item) for item in items or () if isinstance(item, dict))
+    return [item for item in records if item is not None]
+
+
+class AnswerSheet:
+    """A student's answers to one quiz and when each last changed.
+
+    Choices (an option index, or 1/0 for true/false) sit in a byte array with
+    UNANSWERED for blanks; fill-in-the-blank answers are kept as text instead.
+    """
+
+    __slots__ = ('choices', 'texts', 'changed_at')
+
+    def __init__(self, size, text=False):
+        self.choices = None if text else array('b', [UNANSWERED] * size)
+        self.texts = [None] * size if text else None
+        self.changed_at = array('d', [0.0] * size)
+
+    def __len__(self):
+        return len(self.changed_at)
+
+    def get(self, i):
+        """The answer to question i, or None if it has none"""
+        if self.texts is not None:
+            return self.texts[i]
+        choice = self.choices[i]
+        return None if choice == UNANSWERED else choice
+
+    def set(self, i, value, now):
+        """Store an answer (None or "" clears it), noting when it changed"""
+        if self.texts is None:
+            value = UNANSWERED if value is None else int(value)
+            if self.choices[i] == value:
+                return
+            self.choices[i] = value
+        else:
+            value = value or None
+            if self.texts[i] == value:
+                return
+            self.texts[i] = value
+        self.changed_at[i] = now
+
+    def answered(self):
+        if self.texts is not None:
+            return sum(1 for text in self.texts if text is not None)
+        return len(self.choices) - self.choices.count(UNANSWERED)
+
+    def on_time(self, cutoff):
+        """(copy without the answers changed after cutoff, how many answers that dropped)"""
+        kept = AnswerSheet(len(self), text=self.texts is not None)
+        late = 0
+        for i, changed in enumerate(self.changed_at):
+            if changed <= cutoff:
+                kept.set(i, self.get(i), changed)
+            elif self.get(i) is not None:
+                late += 1
+        return kept, late
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import re
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+# Where Streamlit serves STATIC_DIR when server.enableStaticServing is on
+STATIC_URL = "app/static"
+THEMES = ('dark', 'light')
+# Self-hosted font files (fetched by fetch_fonts.py into static/fonts), by font family
+FONT_FILES = {'Space Grotesk': "SpaceGrotesk.ttf"}
+
+
+def minify_css(css):
+    """Drop comments and every bit of whitespace CSS does not need"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def self_hosted_fonts(css, static_dir):
+    """fonts.css with a url() source added for each font file actually present in static/fonts"""
+    for family, name in FONT_FILES.items():
+        if os.path.exists(os.path.join(static_dir, "fonts", name)):
+            css = css.replace(f"src: local('{family}');",
+                              f"src: local('{family}'), url('../fonts/{name}') format('truetype');")
+    return css
+
+
+class ThemeAssets:
+    """Theme stylesheets minified once per process and published as static files.
+
+    Each theme is fonts.css plus theme-<name>.css from static/css, minified and written
+    to static/build under a content hash. A page then only needs a short <link> to the
+    file, which the browser fetches once and caches, instead of the whole stylesheet
+    on every rerun. Without static serving (or a writable static folder) the minified
+    CSS is inlined instead. Only the published files point at a self-hosted font, and
+    only when the font file is there, so no page ever requests a font that 404s.
+    """
+
+    def __init__(self, static_serving=True, static_dir=STATIC_DIR):
+        css_dir = os.path.join(static_dir, "css")
+        with open(os.path.join(css_dir, "fonts.css"), encoding="utf-8") as f:
+            fonts = f.read()
+        self.styles = {}
+        self.links = {}
+        published_fonts = self_hosted_fonts(fonts, static_dir)
+        for theme in THEMES:
+            with open(os.path.join(css_dir, f"theme-{theme}.css"), encoding="utf-8") as f:
+                theme_css = f.read()
+            self.styles[theme] = minify_css(fonts + theme_css)
+            if static_serving:
+                try:
+                    self.links[theme] = self._publish(static_dir, theme, minify_css(published_fonts + theme_css))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _publish(static_dir, theme, css):
+        name = f"theme-{theme}-{hashlib.sha1(css.encode('utf-8')).hexdigest()[:10]}.min.css"
+        build_dir = os.path.join(static_dir, "build")
+        path = os.path.join(build_dir, name)
+        if not os.path.exists(path):
+            os.makedirs(build_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(css)
+            os.replace(tmp_path, path)
+        return f"{STATIC_URL}/build/{name}"
+
+    def tag(self, theme):
+        """HTML that applies a theme: a link to its cached stylesheet, or the stylesheet inline"""
+        href = self.links.get(theme)
+        if href:
+            return f'<link rel="stylesheet" href="{href}">'
+        return f"<style>{self.styles[theme]}</style>"
@@ -0,0 +1,125 @@
+import threading
+
+import httpx
+
+
+class TransportStats:
+    """Thread-safe counters for HTTP requests, connection reuse and pool saturation"""
+
+    def __init__(self, max_connections):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.saturated_requests = 0
+
+    def request_started(self):
+        with self._lock:
+            self.requests += 1
+            if self.max_connections and self.in_flight >= self.max_connections:
+                # Every pooled connection is busy, so this request queues for one
+                self.saturated_requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def connection_opened(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def snapshot(self):
+        with self._lock:
+            reused = max(self.requests - self.connections_opened, 0)
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'reuse_rate': (reused / self.requests) if self.requests else 0.0,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'max_connections': self.max_connections,
+                'saturation': (self.in_flight / self.max_connections) if self.max_connections else 0.0,
+                'saturated_requests': self.saturated_requests,
+            }
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    """Response body wrapper that reports when the connection is handed back"""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+class ObservedTransport(httpx.BaseTransport):
+    """HTTP transport that records request, connection and in-flight counts in TransportStats.
+
+    A request counts as in flight from when it is sent until its response body is
+    closed, which for streamed completions is when the last chunk has been read.
+    """
+
+    def __init__(self, stats, **transport_kwargs):
+        self.stats = stats
+        self._transport = httpx.HTTPTransport(**transport_kwargs)
+
+    def handle_request(self, request):
+        upstream_trace = request.extensions.get("trace")
+
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                self.stats.connection_opened()
+            if upstream_trace is not None:
+                upstream_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        self.stats.request_started()
+        try:
+            response = self._transport.handle_request(request)
+        except BaseException:
+            self.stats.request_finished()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_TrackedStream(response.stream, self.stats.request_finished),
+            extensions=response.extensions,
+        )
+
+    def close(self):
+        self._transport.close()
+
+
+def build_http_client(stats, max_connections=20, max_keepalive=10, keepalive_expiry=30.0,
+                      connect_timeout=10.0, read_timeout=60.0, http2=False, proxy=None):
+    """Pooled httpx client for the AI provider, instrumented with TransportStats"""
+    transport = ObservedTransport(
+        stats,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        http2=http2,
+        proxy=proxy,
+    )
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+        follow_redirects=True,
+    )